@@ -1,22 +1,144 @@
+import base64
+import json
 import logging
-from typing import Dict, List, Optional, Tuple, Union
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from fastapi import Query
+import sqlalchemy as sa
+import starlette.status as codes
+from fastapi import HTTPException, Query
 from pydantic import BaseModel as PydanticModel
+from sqlalchemy.schema import Column
 from sqlalchemy.sql.elements import TextClause
 from starlette.requests import Request
 from starlette.responses import Response
 
-from db import db
+import config as conf
+from const import CountMode
+from db import db, querylog
 from db.models import Model
 
 logger = logging.getLogger(__name__)
 
 LINK_TEMPLATE = '<{url}>; rel="{rel}"'
 
+# reltuples of a table and its partitions (-1 for a partitioned parent or a table
+# that has never been analyzed)
+ESTIMATE_SQL = sa.text(
+    """
+    SELECT CAST(sum(greatest(c.reltuples, 0)) AS bigint) FROM pg_class c
+    WHERE c.oid = CAST(:table AS regclass) OR c.oid IN (
+        SELECT inhrelid FROM pg_inherits WHERE inhparent = CAST(:table AS regclass)
+    )
+    """
+)
+
+
+def sortable_columns(model: Model) -> List[str]:
+    """ Columns a model's pages can be sorted by: those leading an index, so
+        keyset pages are read with an index scan """
+    table = model.__table__
+    names = [c.name for c in table.columns if c.index]
+    names += [list(x.columns)[0].name for x in table.indexes if x.columns]
+    names += [c.name for c in list(table.primary_key.columns)[:1]]
+    return sorted(set(names))
+
+
+def encode_cursor(direction: str, values: List[Any]) -> str:
+    """ Opaque cursor for the page before or after a row's key values """
+
+    def dump(value: Any) -> Any:
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    payload = json.dumps([direction, [dump(x) for x in values]]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor: str, columns: List[Column]) -> Tuple[str, List[Any]]:
+    """ Direction and key values of a cursor, typed by the key columns """
+
+    def load(value: Any, column: Column) -> Any:
+        pytype = column.type.python_type
+        if value is None:
+            return None
+        if pytype in (date, datetime):
+            return pytype.fromisoformat(value)
+        if pytype is Decimal:
+            return Decimal(value)
+        return value
+
+    try:
+        direction, values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if direction not in ("next", "prev") or len(values) != len(columns):
+            raise ValueError(direction)
+        return direction, [load(v, c) for v, c in zip(values, columns)]
+    except Exception:
+        raise HTTPException(
+            status_code=codes.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+class CountCache:
+    """ Exact counts of filtered models, kept for a few seconds so that clients
+        paging through a result don't recount it for every page """
+
+    def __init__(self, ttl: float = None, size: int = None):
+        self.ttl = conf.PAGINATION_COUNT_CACHE_SECONDS if ttl is None else ttl
+        self.size = conf.PAGINATION_COUNT_CACHE_SIZE if size is None else size
+        self.counts: Dict[Tuple[str, Optional[str]], Tuple[float, int]] = {}
+
+    def get(self, model: Model, filter: Optional[str]) -> Optional[int]:
+        key = (model.__table__.name, filter)
+        if key in self.counts:
+            expires_at, count = self.counts[key]
+            if time.monotonic() < expires_at:
+                return count
+            del self.counts[key]
+        return None
+
+    def set(self, model: Model, filter: Optional[str], count: int):
+        if self.ttl <= 0:
+            return
+        if len(self.counts) >= self.size:
+            now = time.monotonic()
+            self.counts = {k: v for k, v in self.counts.items() if v[0] > now}
+            if len(self.counts) >= self.size:  # evict the oldest
+                self.counts.pop(min(self.counts, key=lambda k: self.counts[k][0]))
+        self.counts[(model.__table__.name, filter)] = (
+            time.monotonic() + self.ttl,
+            count,
+        )
+
+    def clear(self):
+        self.counts = {}
+
+
+count_cache = CountCache()  # process-wide
+
 
 class Pagination:
-    """ Paging dependency for endpoints"""
+    """ Paging dependency for endpoints
+
+        Pages are ordered by the sort column, then the primary key. The next page
+        is fetched by keyset: the next link carries a cursor holding the key
+        values of the page's last row, and the page after it is read from the
+        index, starting at those values, instead of scanning and discarding the
+        rows before an offset. Pages reached by cursor link to the previous page
+        with a cursor as well. Offsets are still accepted.
+
+        Rows with a null sort value are ordered after all others, whether the
+        pages are sorted ascending or descending.
+
+        The total count is counted exactly by default, reusing an exact count of
+        the same filter made in the last few seconds. Clients can instead ask
+        for the planner's estimate (count=estimated) or skip counting
+        (count=none). """
 
     default_offset = 0
     default_limit = 25
@@ -32,6 +154,8 @@ class Pagination:
         # multiple: bool = Query(default=False),
         sort: str = Query(default=""),
         desc: bool = Query(default=True),
+        cursor: str = None,
+        count: CountMode = CountMode.EXACT,
     ):
         self.request = request
         self.offset = offset
@@ -40,28 +164,81 @@ class Pagination:
         self.sort = sort
         self.desc = desc
         self.sort_direction = "desc" if desc else "asc"
+        self.cursor = cursor
+        self.count_mode = CountMode(count)
+        self.next_cursor: Optional[str] = None
+        self.prev_cursor: Optional[str] = None
         self.model: Model = None
 
-    async def count(self, filter: Optional[Union[str, TextClause]] = None) -> int:
-        q = db.select([db.func.count([x for x in self.model.pk][0])])
+    @property
+    def keys(self) -> List[Column]:
+        """ Columns the pages are ordered by """
+        table = self.model.__table__
+        pk = list(table.primary_key.columns)
+        if not self.sort:
+            return pk
+        if self.sort not in sortable_columns(self.model):
+            raise HTTPException(
+                status_code=codes.HTTP_400_BAD_REQUEST,
+                detail=f"Can't sort by {self.sort}: must be one of {sortable_columns(self.model)}",  # noqa
+            )
+        return [table.c[self.sort]] + [c for c in pk if c.name != self.sort]
+
+    async def count(
+        self, filter: Optional[Union[str, TextClause]] = None
+    ) -> Optional[int]:
+        """ Total number of rows matching the filter, as requested by the count
+            mode: counted (reusing a recent count of the same filter), estimated
+            by the planner, or not at all (None) """
         filter = filter if filter is not None else self.filter
-        if filter is not None:
-            if not isinstance(filter, TextClause):
-                filter = db.text(filter)
-            q = q.where(filter)
-        return await q.gino.scalar() or 0
+        if isinstance(filter, TextClause):
+            filter = filter.text
+        filter = filter or None
 
-    def get_next_url(self, count: int) -> Optional[str]:
-        if self.offset + self.limit >= count or self.limit <= 0:
+        if self.count_mode == CountMode.NONE:
             return None
-        return str(
-            self.request.url.include_query_params(
-                limit=self.limit, offset=self.offset + self.limit
-            )
-        )
+        if self.count_mode == CountMode.ESTIMATED:
+            return await self.estimate(filter)
+
+        count = count_cache.get(self.model, filter)
+        if count is None:
+            q = db.select([db.func.count([x for x in self.model.pk][0])])
+            if filter is not None:
+                q = q.where(db.text(filter))
+            with querylog.tagged(model=self.model.__name__, operation="count"):
+                count = await q.gino.scalar() or 0
+            count_cache.set(self.model, filter, count)
+        return count
+
+    async def estimate(self, filter: Optional[str] = None) -> int:
+        """ Row count estimated by the planner. Without a filter, the row counts
+            in the table's statistics (summed over its partitions) are used """
+        table = self.model.__table__.name
+        with querylog.tagged(model=self.model.__name__, operation="estimate"):
+            if filter is None:
+                count = await db.scalar(ESTIMATE_SQL, table=table)
+            else:
+                plan = await db.scalar(
+                    f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table} WHERE {filter}"
+                )
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                count = plan[0]["Plan"]["Plan Rows"]
+        return max(int(count or 0), 0)
+
+    def page_url(self, **params) -> str:
+        url = self.request.url.remove_query_params(keys=["offset", "cursor"])
+        return str(url.include_query_params(limit=self.limit, **params))
+
+    def get_next_url(self) -> Optional[str]:
+        if self.next_cursor is None:
+            return None
+        return self.page_url(cursor=self.next_cursor)
 
     def get_previous_url(self) -> Optional[str]:
-        if self.offset <= 0:
+        if self.prev_cursor is not None:
+            return self.page_url(cursor=self.prev_cursor)
+
+        if self.cursor or self.offset <= 0:
             return None
 
         if self.offset - self.limit <= 0:
@@ -73,25 +250,93 @@ class Pagination:
             )
         )
 
+    @staticmethod
+    def nullable_sort(keys: List[Column]) -> bool:
+        """ Whether the leading key is a sort column that can be null """
+        return len(keys) > 1 and keys[0].nullable and not keys[0].primary_key
+
+    def ordering(self, keys: List[Column], descending: bool, backward: bool) -> List:
+        """ Order of the rows as read. Rows with a null sort value come after all
+            others in either direction, so they are last when read forward and
+            first when a previous page is read backward. """
+        ordering = [k.desc() if descending else k.asc() for k in keys]
+        if self.nullable_sort(keys):
+            ordering[0] = (
+                ordering[0].nullsfirst() if backward else ordering[0].nullslast()
+            )
+        return ordering
+
+    def after(
+        self, keys: List[Column], values: List[Any], descending: bool, backward: bool
+    ) -> Any:
+        """ Condition selecting the rows after a cursor's key values, in the order
+            the rows are read (see ordering()) """
+
+        def beyond(columns: List[Column], bounds: List[Any]) -> Any:
+            columns, bounds = sa.tuple_(*columns), sa.tuple_(*bounds)
+            return columns < bounds if descending else columns > bounds
+
+        if not self.nullable_sort(keys):
+            return beyond(keys, values)
+
+        sort, pk, pk_values = keys[0], keys[1:], values[1:]
+        if backward:  # null sort values are read first
+            if values[0] is None:
+                return sa.or_(sort.isnot(None), beyond(pk, pk_values))
+            return sa.and_(sort.isnot(None), beyond(keys, values))
+        # null sort values are read last
+        if values[0] is None:
+            return sa.and_(sort.is_(None), beyond(pk, pk_values))
+        return sa.or_(sort.is_(None), beyond(keys, values))
+
     async def get(
         self,
         filter: Optional[Union[str, TextClause]] = None,
         serializer: Optional[PydanticModel] = None,
     ) -> list:
         """ Build and execute the paged sql query, returning the results as a list of Pydantic
-            model instances (if serializer is specified) or dicts (if serializer is NOT specified)
+            model instances (if serializer is specified) or dicts (if serializer is NOT specified).
+            Sets the cursors of the adjacent pages.
         """
+        keys = self.keys
         q = self.model.query
         filter = filter if filter is not None else self.filter
         if filter is not None:
             if not isinstance(filter, TextClause):
                 filter = db.text(filter)
             q = q.where(filter)
+
+        backward = False
+        if self.cursor:
+            direction, values = decode_cursor(self.cursor, keys)
+            backward = direction == "prev"
+
+        # a previous page is read in reverse, from the cursor toward the start
+        descending = self.desc != backward
+        if self.cursor:
+            q = q.where(self.after(keys, values, descending, backward))
+        elif self.offset:
+            q = q.offset(self.offset)
+        q = q.order_by(*self.ordering(keys, descending, backward))
         if self.limit > 0:
-            q = q.limit(self.limit)
-        if self.sort:
-            q = q.order_by(db.text(f"{self.sort} {self.sort_direction}"))
-        result = await q.offset(self.offset).gino.all()
+            q = q.limit(self.limit + 1)  # the extra row tells if there's more
+
+        with querylog.tagged(model=self.model.__name__, operation="paginate"):
+            result = await q.gino.all()
+
+        more = self.limit > 0 and len(result) > self.limit
+        if more:
+            result = result[: self.limit]
+        if backward:
+            result.reverse()
+
+        if result:
+            first = [getattr(result[0], k.name) for k in keys]
+            last = [getattr(result[-1], k.name) for k in keys]
+            if more or backward:
+                self.next_cursor = encode_cursor("next", last)
+            if (more and backward) or (self.cursor and not backward):
+                self.prev_cursor = encode_cursor("prev", first)
 
         if serializer:
             return [serializer.from_orm(x) for x in result]
@@ -105,12 +350,14 @@ class Pagination:
         filter: Optional[str] = None,
     ) -> dict:
         self.model = model
+        data = await self.get(filter, serializer=serializer)
         count = await self.count(filter)
         return {
             "count": count,
-            "next": self.get_next_url(count),
+            "count_mode": self.count_mode.value,
+            "next": self.get_next_url(),
             "prev": self.get_previous_url(),
-            "data": await self.get(filter, serializer=serializer),
+            "data": data,
         }
 
     async def paginate_links(
@@ -122,6 +369,7 @@ class Pagination:
         p = await self.paginate(model=model, serializer=serializer, filter=filter)
         headers = {
             "x-total-count": p["count"],
+            "x-total-count-mode": p["count_mode"],
             "link": [],
         }
 
@@ -134,7 +382,12 @@ class Pagination:
         return p["data"], headers
 
     def set_headers(self, response: Response, headers: Dict):
-        response.headers["x-total-count"] = str(headers["x-total-count"])
+        """ Set the total count and link headers. The total count is omitted when
+            it wasn't counted, and its mode is reported when it is an estimate. """
+        if headers["x-total-count"] is not None:
+            response.headers["x-total-count"] = str(headers["x-total-count"])
+        if headers.get("x-total-count-mode", CountMode.EXACT) != CountMode.EXACT:
+            response.headers["x-total-count-mode"] = headers["x-total-count-mode"]
         response.headers["link"] = ",".join(
             [x for x in headers["link"] if x is not None]
         )
@@ -1,6 +1,21 @@
-from typing import Dict, no_type_check
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Tuple, Type, no_type_check
 
-from fastapi import APIRouter
+import orjson
+import starlette.status as codes
+from fastapi import APIRouter, HTTPException
+from sqlalchemy.sql import Select
+from starlette.responses import StreamingResponse
+
+import config as conf
+from const import StreamFormat
+from db.models import Model
+from schemas.prod import WellIds
+
+MEDIA_TYPES: Dict[StreamFormat, str] = {
+    StreamFormat.NDJSON: "application/x-ndjson",
+    StreamFormat.JSON: "application/json",
+}
 
 
 @no_type_check
@@ -10,3 +25,65 @@ def list_routes(router: APIRouter) -> Dict[str, Dict]:
         routes[route.path] = {"name": route.name, "method": route.methods}
 
     return routes
+
+
+def lookup_api10s(body: WellIds) -> List[str]:
+    """ The api10s of a request, rejecting requests for too many wells """
+    n = len(body.api10s) + len(body.api14s)
+    if n > conf.API_LOOKUP_MAX_IDS:
+        raise HTTPException(
+            status_code=codes.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"{n} ids requested: at most {conf.API_LOOKUP_MAX_IDS} api10s and api14s can be requested at once",  # noqa
+        )
+    return body.all_api10s
+
+
+def json_default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+
+async def encode_rows(
+    batches: AsyncIterator[List[Tuple]], columns: List[str], format: StreamFormat
+) -> AsyncIterator[bytes]:
+    """ Encode batches of rows as json objects keyed by column name, one chunk of
+        output per batch """
+    if format == StreamFormat.JSON:
+        yield b"["
+
+    first = True
+    async for rows in batches:
+        lines = [
+            orjson.dumps(
+                dict(zip(columns, row)),
+                default=json_default,
+                option=orjson.OPT_NAIVE_UTC,
+            )
+            for row in rows
+        ]
+        if format == StreamFormat.NDJSON:
+            yield b"\n".join(lines) + b"\n"
+        else:
+            yield (b"" if first else b",") + b",".join(lines)
+        first = False
+
+    if format == StreamFormat.JSON:
+        yield b"]"
+
+
+def stream_select(
+    model: Type[Model],
+    stmt: Select,
+    format: StreamFormat = StreamFormat.NDJSON,
+    chunk_size: int = None,
+) -> StreamingResponse:
+    """ Respond with the rows of a select statement, encoded as they are read from
+        a server-side cursor, so only one chunk of rows is held in memory at a
+        time. The status and headers are sent before the first row is read: an
+        error while streaming ends the response early. """
+    columns = [x.name for x in stmt.columns]
+    batches = model.iter_rows(stmt, chunk_size=chunk_size or conf.API_STREAM_CHUNK_SIZE)
+    return StreamingResponse(
+        encode_rows(batches, columns, format), media_type=MEDIA_TYPES[format]
+    )
@@ -1,10 +1,16 @@
 from fastapi import APIRouter
 
+from api.v1.endpoints.export import router as export_router
 from api.v1.endpoints.health import router as health_router
+from api.v1.endpoints.prodstats import router as prodstats_router
+from api.v1.endpoints.production import router as production_router
 from api.v1.endpoints.tasks import router as task_router
 
 __all__ = ["api_router"]
 
 api_router = APIRouter()
 api_router.include_router(health_router, prefix="/health", tags=["health"])
+api_router.include_router(production_router, prefix="/production", tags=["production"])
+api_router.include_router(prodstats_router, prefix="/prodstats", tags=["prodstats"])
+api_router.include_router(export_router, prefix="/export", tags=["export"])
 api_router.include_router(task_router, prefix="/tasks", tags=["tasks"])
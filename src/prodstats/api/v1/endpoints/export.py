@@ -0,0 +1,48 @@
+import logging
+
+import starlette.status as codes
+from fastapi import APIRouter, HTTPException
+from starlette.responses import StreamingResponse
+
+from api.helpers import lookup_api10s
+from const import ExportDataset, ExportFormat
+from db.export import Export
+from schemas import ExportRequest
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post("/{dataset}")
+async def export_dataset(
+    dataset: ExportDataset,
+    body: ExportRequest = None,
+    format: ExportFormat = ExportFormat.PARQUET,
+):
+    """ Stream a dataset as an Arrow IPC stream or a Parquet file, written a
+        record batch (or row group) at a time as rows are read from the
+        database. The body selects the columns and filters the wells, dates and,
+        for prodstats, the stat names; every row is exported without one. """
+    body = body or ExportRequest()
+    try:
+        export = Export(
+            dataset,
+            format,
+            columns=body.columns,
+            api10s=lookup_api10s(body) or None,
+            basin=body.basin,
+            names=body.names,
+            start_date=body.start_date,
+            end_date=body.end_date,
+        )
+    except ImportError as e:
+        raise HTTPException(status_code=codes.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=codes.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return StreamingResponse(
+        export.iter_chunks(),
+        media_type=export.media_type,
+        headers={"content-disposition": f'attachment; filename="{export.filename}"'},
+    )
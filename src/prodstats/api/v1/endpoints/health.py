@@ -1,6 +1,8 @@
 from typing import Dict
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
+
+from db import db, pool, querylog
 
 router = APIRouter()
 
@@ -8,3 +10,22 @@ router = APIRouter()
 @router.get("/", response_model=Dict)
 def health():
     return {"status": "ok"}
+
+
+@router.get("/db", response_model=Dict)
+async def db_health():
+    """ Connection pool state and the acquire waits recorded since the last time
+        pool metrics were exported. Runs on the event loop, which owns the pool
+        and its stats, rather than in the threadpool. """
+    return {"pool": db.pool_status(), "acquire": pool.pool_stats.to_dict()}
+
+
+@router.get("/db/queries", response_model=Dict)
+async def db_queries(limit: int = Query(default=None, ge=1), reset: bool = False):
+    """ Statement timings by model and operation, and the slowest statements with
+        their captured plans, slowest first. Runs on the event loop, which owns the
+        query log, rather than in the threadpool. """
+    result = querylog.query_log.to_dict(n=limit)
+    if reset:
+        querylog.query_log.reset()
+    return result
@@ -0,0 +1,32 @@
+import logging
+
+from fastapi import APIRouter
+
+from api.helpers import lookup_api10s, stream_select
+from const import StreamFormat
+from db.models import ProdHeader, ProdMonthly
+from schemas import WellLookup
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post("/headers/lookup")
+async def lookup_headers(body: WellLookup, format: StreamFormat = StreamFormat.NDJSON):
+    """ Stream the production headers of the requested wells. A date range limits
+        the headers to wells that produced within it. """
+    stmt = ProdHeader.lookup(
+        api10s=lookup_api10s(body), start_date=body.start_date, end_date=body.end_date
+    )
+    return stream_select(ProdHeader, stmt, format)
+
+
+@router.post("/monthly/lookup")
+async def lookup_monthly(body: WellLookup, format: StreamFormat = StreamFormat.NDJSON):
+    """ Stream the monthly production of the requested wells, with the normalized
+        columns, optionally limited to the production dates of a date range """
+    stmt = ProdMonthly.lookup(
+        api10s=lookup_api10s(body), start_date=body.start_date, end_date=body.end_date
+    )
+    return stream_select(ProdMonthly, stmt, format)
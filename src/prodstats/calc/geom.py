@@ -7,12 +7,14 @@ import numpy as np
 import pandas as pd
 from shapely.geometry import LineString, Point
 
+import config as conf
 import schemas as sch
 import util
 import util.geo as geo
 from calc.sets import WellGeometrySet
 from collector import IHSClient, IHSPath
 from const import LATERAL_DIP_THRESHOLD
+from schemas.bases import PartsBuilder
 from util.pd import validate_required_columns
 from util.types import PandasObject
 
@@ -31,27 +33,49 @@ class Shapes:
         api14s: Union[str, List[str]] = None,
         api10s: Union[str, List[str]] = None,
         create_index: bool = True,
+        stream: bool = None,
         **kwargs,
     ) -> WellGeometrySet:
+        """ Fetch well geometries from the internal IHS service.
 
-        data = await IHSClient.get_wells(
-            api14s=api14s, api10s=api10s, path=path, **kwargs
-        )
+        Keyword Arguments:
+            stream {bool} -- decode each response as it arrives and feed it directly
+                into the set builders, instead of collecting all responses before
+                parsing (default: conf.IHS_STREAM_RESPONSES)
+        """
+        if stream is None:
+            stream = conf.IHS_STREAM_RESPONSES
+
+        if stream:
+            builder = sch.WellGeometryParts.builder()
+            async for data in IHSClient.iter_wells(
+                api14s=api14s, api10s=api10s, path=path, **kwargs
+            ):
+                builder.extend(data)
+            geomset = cls._to_geomset(builder, create_index)
+        else:
+            data = await IHSClient.get_wells(
+                api14s=api14s, api10s=api10s, path=path, **kwargs
+            )
+            geomset = cls._to_geomset(data, create_index)
 
-        locations = sch.WellLocationSet(wells=data).df()
-        surveys = sch.WellSurveySet(wells=data).df()
-        points = sch.WellSurveyPointSet(wells=data).df()
-        points = points.loc[~points.index.duplicated()]
-        return WellGeometrySet(locations=locations, surveys=surveys, points=points)
+        points = geomset.points
+        geomset.points = points.loc[~points.index.duplicated()]
+        return geomset
 
     @staticmethod
-    def _to_geomset(data: List[Dict[str, Any]], create_index: bool) -> WellGeometrySet:
-        locations = sch.WellLocationSet(wells=data).df()
-        surveys = sch.WellSurveySet(wells=data).df()
-        points = sch.WellSurveyPointSet(wells=data).df()
-
-        geomset = WellGeometrySet(locations=locations, surveys=surveys, points=points)
-        return geomset
+    def _to_geomset(
+        data: Union[PartsBuilder, List[Dict[str, Any]]], create_index: bool
+    ) -> WellGeometrySet:
+        """ Build the geometry set from raw wells, parsing each well once for all of
+            its locations, survey and points, or from a builder that has already
+            parsed them """
+        if not isinstance(data, PartsBuilder):
+            builder = sch.WellGeometryParts.builder()
+            builder.extend(data)
+            data = builder
+
+        return WellGeometrySet(**data.dfs(create_index=create_index))
 
     @classmethod
     def from_records(
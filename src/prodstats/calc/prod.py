@@ -4,6 +4,7 @@ from typing import Any, Dict, Iterable, List, Union
 import numpy as np
 import pandas as pd
 
+import config as conf
 import const
 import util
 from calc.sets import ProdSet
@@ -34,6 +35,7 @@ class ProdStats:
         api10s: Union[str, List[str]] = None,
         entity12s: Union[str, List[str]] = None,
         create_index: bool = True,
+        stream: bool = None,
         **kwargs,
     ) -> ProdSet:
         """Fetch production records from the internal IHS service.
@@ -49,10 +51,29 @@ class ProdStats:
                 producing entity numbers
             create_index {bool} -- attempt to return the dataframe with the default
                 index applied [api10, prod_date] (default: True)
+            stream {bool} -- decode each response as it arrives and feed its records
+                directly into a set builder (default: conf.IHS_STREAM_RESPONSES)
 
         Returns:
             ProdSet
         """
+        if stream is None:
+            stream = conf.IHS_STREAM_RESPONSES
+
+        if stream:
+            builder = ProductionWellSet.builder()
+            async for data in IHSClient.iter_production(
+                entities=entities,
+                api14s=api14s,
+                api10s=api10s,
+                entity12s=entity12s,
+                path=path,
+                **kwargs,
+            ):
+                builder.extend(data)
+
+            df = builder.df(create_index=create_index)
+            return df.prodstats.to_prodset()
 
         data = await IHSClient.get_production(
             entities=entities,
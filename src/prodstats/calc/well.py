@@ -5,11 +5,14 @@ from typing import Any, Coroutine, Dict, List, Union
 import numpy as np
 import pandas as pd
 
+import config as conf
 import schemas as sch
+import util
 from calc.sets import WellSet
 from collector import FracFocusClient, IHSClient, IHSPath
 from const import HoleDirection
-from db.models import ProdHeader
+from db.models import FracFocusJob, ProdHeader
+from schemas.bases import PartsBuilder
 from util.pd import validate_required_columns, x_months_ago
 from util.types import PandasObject
 
@@ -44,13 +47,18 @@ class Well:
         self._obj: PandasObject = obj
 
     @staticmethod
-    def _to_wellset(data: List[Dict[str, Any]], create_index: bool) -> WellSet:
-        wells = sch.WellRecordSet(wells=data).df(create_index=create_index)
-        depths = sch.WellDepthSet(wells=data).df(create_index=create_index)
-        fracs = sch.FracParameterSet(wells=data).df(create_index=create_index)
-        ips = sch.IPTestSet(wells=data).df(create_index=create_index)
+    def _to_wellset(
+        data: Union[PartsBuilder, List[Dict[str, Any]]], create_index: bool
+    ) -> WellSet:
+        """ Build the well set from raw wells, parsing each well once for its record,
+            depths, frac parameters and ip tests, or from a builder that has already
+            parsed them """
+        if not isinstance(data, PartsBuilder):
+            builder = sch.WellParts.builder()
+            builder.extend(data)
+            data = builder
 
-        return WellSet(wells=wells, depths=depths, fracs=fracs, ips=ips)
+        return WellSet(**data.dfs(create_index=create_index))
 
     @classmethod
     async def from_ihs(
@@ -59,8 +67,26 @@ class Well:
         api14s: Union[str, List[str]] = None,
         api10s: Union[str, List[str]] = None,
         create_index: bool = True,
+        stream: bool = None,
         **kwargs,
     ) -> WellSet:
+        """ Fetch well records from the internal IHS service.
+
+        Keyword Arguments:
+            stream {bool} -- decode each response as it arrives and feed it directly
+                into the set builders, instead of collecting all responses before
+                parsing (default: conf.IHS_STREAM_RESPONSES)
+        """
+        if stream is None:
+            stream = conf.IHS_STREAM_RESPONSES
+
+        if stream:
+            builder = sch.WellParts.builder()
+            async for data in IHSClient.iter_wells(
+                api14s=api14s, api10s=api10s, path=path, **kwargs
+            ):
+                builder.extend(data)
+            return cls._to_wellset(builder, create_index)
 
         data: List[Dict[str, Any]] = await IHSClient.get_wells(
             api14s=api14s, api10s=api10s, path=path, **kwargs
@@ -79,16 +105,24 @@ class Well:
         api14s: Union[str, List[str]] = None,
         api10s: Union[str, List[str]] = None,
         create_index: bool = True,
+        use_registry: bool = None,
         **kwargs,
     ) -> WellSet:
-        """ Get frac job data for the given api14s/api10s from the Frac Focus service """
+        """ Get frac job data for the given api14s/api10s from the Frac Focus service,
+            or from the locally synced job registry if use_registry is enabled """
 
         fracs = None
 
+        if use_registry is None:
+            use_registry = conf.FRACFOCUS_USE_REGISTRY
+
         try:
-            data = await FracFocusClient.get_jobs(
-                api14s=api14s, api10s=api10s, **kwargs
-            )
+            if use_registry:
+                data = await cls._get_registered_jobs(api14s=api14s, api10s=api10s)
+            else:
+                data = await FracFocusClient.get_jobs(
+                    api14s=api14s, api10s=api10s, **kwargs
+                )
 
             df = sch.FracParameterSet(wells=data).df(create_index=create_index)
             if not df.empty:
@@ -98,6 +132,25 @@ class Well:
 
         return WellSet(fracs=fracs)
 
+    @staticmethod
+    async def _get_registered_jobs(
+        api14s: Union[str, List[str]] = None, api10s: Union[str, List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """ Look up frac jobs for a batch of wells in the local FracFocus registry """
+
+        if api14s and api10s:
+            raise ValueError("Exactly one of [api14s, api10s] can be specified")
+
+        if api14s:
+            where = FracFocusJob.api14.in_(util.ensure_list(api14s))
+        elif api10s:
+            where = FracFocusJob.api10.in_(util.ensure_list(api10s))
+        else:
+            raise ValueError("One of [api14s, api10s] must be specified")
+
+        jobs: List[FracFocusJob] = await FracFocusJob.query.where(where).gino.all()
+        return [x.to_dict() for x in jobs]
+
     @classmethod
     async def from_multiple(
         cls,
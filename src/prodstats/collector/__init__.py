@@ -1,4 +1,6 @@
 # flake8: noqa
+from collector.throttle import *
+from collector.instrumentation import *
 from collector.client import *
 from collector.frac_focus_client import *
 from collector.ihs_client import *
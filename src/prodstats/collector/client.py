@@ -1,17 +1,29 @@
 from __future__ import annotations
 
+import asyncio
 import copy
 import functools
 import inspect
 import logging
-from typing import Dict, List, Optional, Union
+from timeit import default_timer as timer
+from typing import Dict, List, Optional, Type, Union
 
 import httpx
 import orjson
 from async_generator import async_generator, yield_
 
+import config as conf
 import util
+from collector import instrumentation
+from collector.throttle import (
+    CircuitBreaker,
+    TokenBucket,
+    get_circuit_breaker,
+    get_rate_limiter,
+)
+from const import Provider
 from schemas.credentials import HTTPAuth
+from util.enums import Enum
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +35,8 @@ class AsyncClient(httpx.AsyncClient):
         for bulk sourcing data from external systems """
 
     _credentials = None
+    provider: Optional[Provider] = None
+    paths: Optional[Type[Enum]] = None
 
     def __init__(
         self,
@@ -31,6 +45,8 @@ class AsyncClient(httpx.AsyncClient):
         params: Optional[Dict] = None,
         credentials: Optional[Union[HTTPAuth, Dict, str]] = None,
         auth_url: Optional[Union[str, httpx.URL]] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
         **kwargs,
     ):
 
@@ -47,6 +63,10 @@ class AsyncClient(httpx.AsyncClient):
             auth_url
         ) if auth_url is not None else None
 
+        # fall back to the configured throttling for the client's provider, if any
+        self.rate_limiter = rate_limiter or get_rate_limiter(self.provider)
+        self.circuit_breaker = circuit_breaker or get_circuit_breaker(self.provider)
+
     def __repr__(self):
         return f"<Requestor: {self.base_url} headers={len(self.headers)} params={len(self.params)}>"
 
@@ -173,7 +193,7 @@ class AsyncClient(httpx.AsyncClient):
                     url_or_path = next  # client will handle absolute or relative
                     has_next_url = True
 
-            logger.warning(
+            logger.debug(
                 f"{response.url} - {record_count=}, {total_count=}, {total_pages=}, {next=}, {remaining_count=}, {remaining_pages=}"  # noqa
             )
             await yield_(response)
@@ -211,19 +231,93 @@ class AsyncClient(httpx.AsyncClient):
 
             self._credentials = credentials
 
+    def path_name(self, url: Union[httpx.URL, str]) -> str:
+        """ Get the name of the member of the client's paths enum that the url
+            targets, using the longest matching path. """
+        path = str(url)
+        base = str(self.base_url)
+        if path.startswith(base):
+            path = path[len(base) :]
+        path = path.split("?")[0].strip("/")
+
+        if self.paths:
+            matches = [
+                p
+                for p in self.paths  # type: ignore
+                if path == p.value or path.startswith(f"{p.value}/")
+            ]
+            if matches:
+                return max(matches, key=lambda p: len(p.value)).name
+        return "other"
+
+    @staticmethod
+    def is_retryable(response: httpx.Response) -> bool:
+        return response.status_code == 429 or response.status_code >= 500
+
     async def get(self, *args, **kwargs) -> httpx.Response:
         logger.debug(f"GET {self.base_url}: {args=} {kwargs=}")
-        response = await super().get(*args, **kwargs)
+        provider = Provider(self.provider).value if self.provider else "other"
+        path = self.path_name(args[0] if args else kwargs.get("url", ""))
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._get(provider, path, *args, **kwargs)
+                if attempt >= conf.HTTP_MAX_RETRIES or not self.is_retryable(response):
+                    break
+            except httpx.HTTPError:
+                if attempt >= conf.HTTP_MAX_RETRIES:
+                    raise
+
+            attempt += 1
+            instrumentation.record_retry(provider, path)
+            await asyncio.sleep(conf.HTTP_RETRY_BACKOFF * 2 ** (attempt - 1))
 
         # patch json loader to use orjson and return empty dict when content is empty
         if response.content and not response.is_error:
             response.json = functools.partial(orjson.loads, response.content or {})  # type: ignore
         return response
 
+    async def _get(self, provider: str, path: str, *args, **kwargs) -> httpx.Response:
+        trial = False
+        if self.circuit_breaker:
+            trial = await self.circuit_breaker.before_request()
+
+        throttled = 0.0
+        if self.rate_limiter:
+            throttled = await self.rate_limiter.acquire()
+
+        with instrumentation.track(provider, path):
+            ts = timer()
+            try:
+                response = await super().get(*args, **kwargs)
+            except httpx.HTTPError:
+                instrumentation.record_response(
+                    provider, path, timer() - ts, throttled_seconds=throttled
+                )
+                if self.circuit_breaker:
+                    await self.circuit_breaker.record_failure(trial)
+                raise
+
+        instrumentation.record_response(
+            provider,
+            path,
+            timer() - ts,
+            status_code=response.status_code,
+            nbytes=len(response.content),
+            throttled_seconds=throttled,
+        )
+
+        if self.circuit_breaker:
+            if self.is_retryable(response):
+                await self.circuit_breaker.record_failure(trial)
+            else:
+                await self.circuit_breaker.record_success(trial)
+
+        return response
+
 
 if __name__ == "__main__":
-    import config as conf
-    import asyncio
     import random
     from schema import ProdCalcSet
 
@@ -1,13 +1,15 @@
 import asyncio
 import logging
+from datetime import datetime
 from typing import Any, Coroutine, Dict, List, Optional, Union
 
 import httpx
+from async_generator import async_generator, yield_
 
 import config as conf
 import util
 from collector import AsyncClient
-from const import Enum, FracFocusPath
+from const import Enum, FracFocusPath, Provider
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +19,7 @@ __all__ = ["FracFocusPath", "FracFocusClient"]
 class FracFocusClient(AsyncClient):
     base_url: httpx.URL = conf.FRACFOCUS_BASE_URL
     paths: Enum = FracFocusPath
+    provider: Provider = Provider.FRACFOCUS
 
     def __init__(
         self,
@@ -76,6 +79,34 @@ class FracFocusClient(AsyncClient):
 
         return data
 
+    @classmethod
+    @async_generator
+    async def iter_registry(
+        cls,
+        updated_since: datetime = None,
+        page_size: int = None,
+        timeout: Optional[int] = None,
+        **kwargs,
+    ):
+        """ Page through the full job registry, yielding the job records from each
+            page. If updated_since is given, only jobs updated after that time are
+            requested. """
+        params: Dict[str, Any] = {
+            "pagesize": page_size or conf.FRACFOCUS_REGISTRY_PAGE_SIZE
+        }
+        if updated_since:
+            params["updated_since"] = updated_since.isoformat()
+
+        async with cls(**kwargs) as client:
+            async for r in client.iter_pages(
+                FracFocusPath.jobs.value,
+                data_key="data",
+                params=params,
+                timeout=timeout,
+            ):
+                json: Dict = r.json() if r.content else {}  # type: ignore
+                await yield_(json.get("data", []))
+
 
 if __name__ == "__main__":
 
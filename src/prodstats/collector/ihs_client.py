@@ -1,13 +1,14 @@
 import asyncio
 import logging
-from typing import Any, Coroutine, Dict, List, Optional, Union
+from typing import Any, Coroutine, Dict, List, Optional, Tuple, Union
 
 import httpx
+from async_generator import async_generator, yield_
 
 import config as conf
 import util
 from collector import AsyncClient
-from const import Enum, IHSPath
+from const import Enum, IHSPath, Provider
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +18,7 @@ __all__ = ["IHSPath", "IHSClient"]
 class IHSClient(AsyncClient):
     base_url: httpx.URL = conf.IHS_BASE_URL
     paths: Enum = IHSPath
+    provider: Provider = Provider.IHS
 
     def __init__(
         self,
@@ -68,24 +70,48 @@ class IHSClient(AsyncClient):
         return data
 
     @classmethod
-    async def get_production(
+    @async_generator
+    async def _iter(
         cls,
+        ids: Union[str, List[str]],
         path: IHSPath,
+        param_name: str,
         params: Dict = None,
-        entities: Union[str, List[str]] = None,
-        entity12s: Union[str, List[str]] = None,
-        api14s: Union[str, List[str]] = None,
-        api10s: Union[str, List[str]] = None,
         timeout: Optional[int] = None,
         concurrency: int = None,
-        related: bool = True,
         **kwargs,
-    ) -> List[Dict[str, Any]]:
-        """Fetch production records from the internal IHS service.
-
-        Returns:
-            list -- list of monthly production records
+    ):
+        """ Get an async generator yielding the decoded data from each response as
+            soon as it arrives. Unlike _get(), a response is released as soon as it has
+            been decoded, so only the responses still in flight are held in memory.
         """
+        ids = util.ensure_list(ids)
+        concurrency = concurrency or 50
+        timeout = timeout or 300
+
+        params = params or {}
+
+        async with cls(**kwargs) as client:
+            for chunk in util.chunks(ids, concurrency):
+                coros: List[Coroutine] = [
+                    client.get(
+                        path.value, params={param_name: id, **params}, timeout=timeout,
+                    )
+                    for id in chunk
+                ]
+                for next_response in asyncio.as_completed(coros):
+                    r: httpx.Response = await next_response
+                    json: Dict = r.json() if r.content else {}  # type: ignore
+                    del r
+                    await yield_(json.get("data", []))
+
+    @staticmethod
+    def _production_id_param(
+        entities: Union[str, List[str]] = None,
+        entity12s: Union[str, List[str]] = None,
+        api14s: Union[str, List[str]] = None,
+        api10s: Union[str, List[str]] = None,
+    ) -> Tuple[Union[str, List[str]], str]:
         optcount = sum(
             [
                 entities is not None,
@@ -104,18 +130,51 @@ class IHSClient(AsyncClient):
             )
 
         if entities is not None:
-            ids = entities
-            param_name = "id"
+            return entities, "id"
         elif api14s is not None:
-            ids = api14s
-            param_name = "api14"
+            return api14s, "api14"
         elif api10s is not None:
-            ids = api10s
-            param_name = "api10"
+            return api10s, "api10"
+        else:
+            return entity12s, "entity12"  # type: ignore
+
+    @staticmethod
+    def _well_id_param(
+        api14s: Union[str, List[str]] = None, api10s: Union[str, List[str]] = None,
+    ) -> Tuple[Union[str, List[str]], str]:
+        optcount = sum([api14s is not None, api10s is not None])
+        if optcount < 1:
+            raise ValueError("One of ['api14s', 'api10s'] must be specified")
+        if optcount > 1:
+            raise ValueError("Only one of ['api14s', 'api10s'] can be specified")
 
-        elif entity12s is not None:
-            ids = entity12s
-            param_name = "entity12"
+        if api14s is not None:
+            return api14s, "api14"
+        else:
+            return api10s, "api10"  # type: ignore
+
+    @classmethod
+    async def get_production(
+        cls,
+        path: IHSPath,
+        params: Dict = None,
+        entities: Union[str, List[str]] = None,
+        entity12s: Union[str, List[str]] = None,
+        api14s: Union[str, List[str]] = None,
+        api10s: Union[str, List[str]] = None,
+        timeout: Optional[int] = None,
+        concurrency: int = None,
+        related: bool = True,
+        **kwargs,
+    ) -> List[Dict[str, Any]]:
+        """Fetch production records from the internal IHS service.
+
+        Returns:
+            list -- list of monthly production records
+        """
+        ids, param_name = cls._production_id_param(
+            entities=entities, entity12s=entity12s, api14s=api14s, api10s=api10s
+        )
 
         return await cls._get(
             ids=ids,
@@ -138,18 +197,7 @@ class IHSClient(AsyncClient):
         concurrency: int = 50,
         **kwargs,
     ) -> List[Dict[str, Any]]:
-        optcount = sum([api14s is not None, api10s is not None])
-        if optcount < 1:
-            raise ValueError("One of ['api14s', 'api10s'] must be specified")
-        if optcount > 1:
-            raise ValueError("Only one of ['api14s', 'api10s'] can be specified")
-
-        if api14s is not None:
-            ids = api14s
-            param_name = "api14"
-        elif api10s is not None:
-            ids = api10s
-            param_name = "api10"
+        ids, param_name = cls._well_id_param(api14s=api14s, api10s=api10s)
 
         return await cls._get(
             ids=ids,
@@ -161,6 +209,61 @@ class IHSClient(AsyncClient):
             **kwargs,
         )
 
+    @classmethod
+    def iter_production(
+        cls,
+        path: IHSPath,
+        params: Dict = None,
+        entities: Union[str, List[str]] = None,
+        entity12s: Union[str, List[str]] = None,
+        api14s: Union[str, List[str]] = None,
+        api10s: Union[str, List[str]] = None,
+        timeout: Optional[int] = None,
+        concurrency: int = None,
+        related: bool = True,
+        **kwargs,
+    ):
+        """ Streaming counterpart of get_production(). Returns an async generator
+            yielding the production records of each response as it arrives. """
+        ids, param_name = cls._production_id_param(
+            entities=entities, entity12s=entity12s, api14s=api14s, api10s=api10s
+        )
+
+        return cls._iter(
+            ids=ids,
+            path=path,
+            param_name=param_name,
+            params={"related": related, **(params or {})},
+            timeout=timeout,
+            concurrency=concurrency,
+            **kwargs,
+        )
+
+    @classmethod
+    def iter_wells(
+        cls,
+        path: IHSPath,
+        params: Dict = None,
+        api14s: Union[str, List[str]] = None,
+        api10s: Union[str, List[str]] = None,
+        timeout: Optional[int] = None,
+        concurrency: int = 50,
+        **kwargs,
+    ):
+        """ Streaming counterpart of get_wells(). Returns an async generator
+            yielding the well records of each response as it arrives. """
+        ids, param_name = cls._well_id_param(api14s=api14s, api10s=api10s)
+
+        return cls._iter(
+            ids=ids,
+            path=path,
+            param_name=param_name,
+            params=params,
+            timeout=timeout,
+            concurrency=concurrency,
+            **kwargs,
+        )
+
     @classmethod
     async def get_sample(
         cls,
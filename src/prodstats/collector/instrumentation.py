@@ -0,0 +1,226 @@
+""" Per-request instrumentation for upstream provider clients.
+
+    Each request made through an AsyncClient is recorded against the provider and
+    the named path (IHSPath/FracFocusPath member) it targets: latency, response
+    bytes, status codes, retries, time spent waiting on the rate limiter, and the
+    number of requests in flight. Measurements are collected by any recorders
+    active in the current context (see recording()), so an executor can isolate
+    and export the requests made on its behalf.
+"""
+import contextlib
+import contextvars
+import logging
+import math
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import ext.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["PathStats", "RequestRecorder", "recording", "active_recorders"]
+
+LATENCY_BUCKETS: Tuple[float, ...] = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+
+_recorders: contextvars.ContextVar = contextvars.ContextVar(
+    "request_recorders", default=()
+)
+
+
+class PathStats:
+    """ Aggregated measurements of the requests made to a single path """
+
+    def __init__(self):
+        self.requests: int = 0
+        self.errors: int = 0
+        self.retries: int = 0
+        self.bytes: int = 0
+        self.seconds: float = 0
+        self.throttled_seconds: float = 0
+        self.statuses: Counter = Counter()
+        self.latencies: List[float] = []
+        self.in_flight: int = 0
+        self.max_in_flight: int = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        """ Nearest-rank percentile of the recorded latencies (0 < q <= 100) """
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        idx = max(math.ceil(q / 100 * len(ordered)) - 1, 0)
+        return ordered[idx]
+
+    def histogram(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Dict[str, int]:
+        """ Cumulative latency histogram keyed by bucket upper bound """
+        return {str(le): sum(1 for x in self.latencies if x <= le) for le in buckets}
+
+    def to_dict(self) -> Dict[str, Union[int, float, None, Dict]]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 4),
+            "throttled_seconds": round(self.throttled_seconds, 4),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": max(self.latencies) if self.latencies else None,
+            "max_in_flight": self.max_in_flight,
+            "statuses": dict(self.statuses),
+        }
+
+
+class RequestRecorder:
+    """ Collects PathStats keyed by (provider, path name) """
+
+    def __init__(self):
+        self.stats: Dict[Tuple[str, str], PathStats] = {}
+
+    def __repr__(self):
+        return f"RequestRecorder: {len(self.stats)} paths"
+
+    def __iter__(self) -> Iterator[Tuple[Tuple[str, str], PathStats]]:
+        return iter(self.stats.items())
+
+    def get(self, provider: str, path: str) -> PathStats:
+        key = (provider, path)
+        if key not in self.stats:
+            self.stats[key] = PathStats()
+        return self.stats[key]
+
+    def to_records(self) -> List[Dict]:
+        return [
+            {"provider": provider, "path": path, **stats.to_dict()}
+            for (provider, path), stats in self.stats.items()
+        ]
+
+    def series(self, tags: Dict[str, str] = None) -> List[Dict]:
+        """ The collected measurements as a batch of ext.metrics payloads """
+        series: List[Dict] = []
+        for (provider, path), stats in self.stats.items():
+            path_tags = {**(tags or {}), "provider": provider, "path": path}
+            tag_list = metrics.to_tags(path_tags)
+
+            series += [
+                metrics.metric("http.requests", stats.requests, tags=tag_list),
+                metrics.metric("http.request.errors", stats.errors, tags=tag_list),
+                metrics.metric("http.request.retries", stats.retries, tags=tag_list),
+                metrics.metric("http.response.bytes", stats.bytes, tags=tag_list),
+                metrics.metric(
+                    "http.request.throttled_seconds",
+                    stats.throttled_seconds,
+                    metric_type="gauge",
+                    tags=tag_list,
+                ),
+                metrics.metric(
+                    "http.requests.in_flight.max",
+                    stats.max_in_flight,
+                    metric_type="gauge",
+                    tags=tag_list,
+                ),
+            ]
+
+            for status, count in stats.statuses.items():
+                series.append(
+                    metrics.metric(
+                        "http.responses",
+                        count,
+                        tags=metrics.to_tags({**path_tags, "status_code": status}),
+                    )
+                )
+
+            for name, q in [("p50", 50), ("p95", 95), ("max", 100)]:
+                value = stats.percentile(q)
+                if value is not None:
+                    series.append(
+                        metrics.metric(
+                            f"http.request.latency.{name}",
+                            value,
+                            metric_type="gauge",
+                            tags=tag_list,
+                        )
+                    )
+
+            for le, count in stats.histogram().items():
+                series.append(
+                    metrics.metric(
+                        "http.request.latency.bucket",
+                        count,
+                        tags=metrics.to_tags({**path_tags, "le": le}),
+                    )
+                )
+        return series
+
+    def post(self, tags: Dict[str, str] = None):
+        """ Export the collected measurements through ext.metrics, in a single
+            request. Blocks on the request: from a coroutine, prefer
+            metrics.send_async(recorder.series(...)) """
+        metrics.send(self.series(tags=tags))
+
+
+def active_recorders() -> Tuple[RequestRecorder, ...]:
+    return _recorders.get()
+
+
+@contextlib.contextmanager
+def recording() -> Iterator[RequestRecorder]:
+    """ Record the requests made in the current context (including tasks spawned
+        from it) until the block exits. Recorders can be nested. """
+    recorder = RequestRecorder()
+    token = _recorders.set((*_recorders.get(), recorder))
+    try:
+        yield recorder
+    finally:
+        _recorders.reset(token)
+
+
+@contextlib.contextmanager
+def track(provider: str, path: str) -> Iterator[None]:
+    """ Track a request as in flight for the duration of the block """
+    stats = [r.get(provider, path) for r in active_recorders()]
+    for s in stats:
+        s.in_flight += 1
+        s.max_in_flight = max(s.max_in_flight, s.in_flight)
+    try:
+        yield
+    finally:
+        for s in stats:
+            s.in_flight -= 1
+
+
+def record_response(
+    provider: str,
+    path: str,
+    seconds: float,
+    status_code: int = None,
+    nbytes: int = 0,
+    throttled_seconds: float = 0,
+):
+    """ Record a completed request. A missing status code is recorded as a
+        transport error. """
+    is_error = status_code is None or status_code >= 400
+    for recorder in active_recorders():
+        stats = recorder.get(provider, path)
+        stats.requests += 1
+        stats.errors += int(is_error)
+        stats.bytes += nbytes
+        stats.seconds += seconds
+        stats.throttled_seconds += throttled_seconds
+        stats.statuses[str(status_code or "error")] += 1
+        stats.latencies.append(seconds)
+
+    logger.debug(
+        f"({provider}) {path} {status_code or 'error'} {nbytes}B {round(seconds, 3)}s",
+        extra={
+            "provider": provider,
+            "path": path,
+            "status_code": status_code,
+            "bytes": nbytes,
+            "duration": seconds,
+        },
+    )
+
+
+def record_retry(provider: str, path: str):
+    for recorder in active_recorders():
+        recorder.get(provider, path).retries += 1
@@ -0,0 +1,380 @@
+""" Request throttling for upstream providers.
+
+    Each provider gets a token bucket rate limiter and a circuit breaker. By default,
+    their state lives in the current process. When a redis url is configured
+    (PRODSTATS_REDIS_URL), the state is kept in redis instead so that every worker
+    process draws from the same budget and sees the same breaker state.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import config as conf
+from const import Provider
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "CircuitOpenError",
+    "LocalStateStore",
+    "RedisStateStore",
+    "StateStore",
+    "TokenBucket",
+    "CircuitBreaker",
+    "get_rate_limiter",
+    "get_circuit_breaker",
+]
+
+
+class CircuitOpenError(Exception):
+    """ Raised when a request is attempted while a provider's circuit is open """
+
+    def __init__(self, name: str, retry_after: float = None):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(
+            f"circuit open for {name}"
+            + (f" (retry after {round(retry_after, 2)}s)" if retry_after else "")
+        )
+
+
+# --- state stores ----------------------------------------------------------- #
+
+
+class LocalStateStore:
+    """ Process-local key/value store with per-key expiration """
+
+    def __init__(self):
+        self.data: Dict[str, Tuple[Any, Optional[float]]] = {}
+
+    def _get(self, key: str) -> Any:
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key, None)
+            return None
+        return value
+
+    def _set(self, key: str, value: Any, ttl: float = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        self.data[key] = (value, expires_at)
+
+    async def get(self, key: str) -> Any:
+        return self._get(key)
+
+    async def ttl(self, key: str) -> Optional[float]:
+        value, expires_at = self.data.get(key, (None, None))
+        if value is None or expires_at is None:
+            return None
+        return max(expires_at - time.monotonic(), 0)
+
+    async def set(self, key: str, value: Any, ttl: float = None, nx: bool = False):
+        if nx and self._get(key) is not None:
+            return False
+        self._set(key, value, ttl)
+        return True
+
+    async def incr(self, key: str, ttl: float = None) -> int:
+        value = (self._get(key) or 0) + 1
+        if value == 1:
+            self._set(key, value, ttl)
+        else:  # keep the original expiration
+            self.data[key] = (value, self.data[key][1])
+        return value
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def take_token(
+        self, key: str, rate: float, capacity: int, requested: int = 1
+    ) -> float:
+        """ Take tokens from the bucket stored under key. Returns zero if the tokens
+            were taken, otherwise the number of seconds until they will be available """
+        now = time.monotonic()
+        tokens, ts = self._get(key) or (capacity, now)
+        tokens = min(capacity, tokens + max(0, now - ts) * rate)
+        if tokens >= requested:
+            self._set(key, (tokens - requested, now))
+            return 0
+        self._set(key, (tokens, now))
+        return (requested - tokens) / rate
+
+
+class RedisStateStore:
+    """ Key/value store backed by redis, shared across processes. Redis calls are
+        made from the default executor to avoid blocking the event loop. """
+
+    # atomically refill and take from a bucket using the redis server's clock
+    TOKEN_BUCKET_SCRIPT = """
+        redis.replicate_commands()
+        local rate = tonumber(ARGV[1])
+        local capacity = tonumber(ARGV[2])
+        local requested = tonumber(ARGV[3])
+        local t = redis.call("TIME")
+        local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+        local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+        local tokens = tonumber(state[1]) or capacity
+        local ts = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+        local wait = 0
+        if tokens >= requested then
+            tokens = tokens - requested
+        else
+            wait = (requested - tokens) / rate
+        end
+        redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+        redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+        return tostring(wait)
+    """
+
+    def __init__(self, url: str, prefix: str = None):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix or conf.project
+        self._take_token = self.redis.register_script(self.TOKEN_BUCKET_SCRIPT)
+
+    def key(self, key: str) -> str:
+        return f"{self.prefix}:throttle:{key}"
+
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(func, *args, **kwargs)
+        )
+
+    async def get(self, key: str) -> Any:
+        return await self._run(self.redis.get, self.key(key))
+
+    async def ttl(self, key: str) -> Optional[float]:
+        ms = await self._run(self.redis.pttl, self.key(key))
+        return ms / 1000 if ms and ms > 0 else None
+
+    async def set(self, key: str, value: Any, ttl: float = None, nx: bool = False):
+        px = int(ttl * 1000) if ttl else None
+        return bool(await self._run(self.redis.set, self.key(key), value, px=px, nx=nx))
+
+    async def incr(self, key: str, ttl: float = None) -> int:
+        def incr():
+            with self.redis.pipeline() as pipe:
+                pipe.incr(self.key(key))
+                pipe.ttl(self.key(key))
+                value, remaining = pipe.execute()
+            if ttl and remaining < 0:  # only set expiration on a new key
+                self.redis.expire(self.key(key), int(ttl))
+            return value
+
+        return await self._run(incr)
+
+    async def delete(self, *keys: str):
+        await self._run(self.redis.delete, *[self.key(k) for k in keys])
+
+    async def take_token(
+        self, key: str, rate: float, capacity: int, requested: int = 1
+    ) -> float:
+        wait = await self._run(
+            self._take_token, keys=[self.key(key)], args=[rate, capacity, requested]
+        )
+        return float(wait)
+
+
+StateStore = Union[LocalStateStore, RedisStateStore]
+
+
+# --- limiter ---------------------------------------------------------------- #
+
+
+class TokenBucket:
+    """ Token bucket rate limiter. Tokens refill continuously at `rate` per second up
+        to `capacity`, allowing bursts of up to `capacity` requests. """
+
+    def __init__(
+        self, name: str, rate: float, capacity: int, store: StateStore = None,
+    ):
+        if rate <= 0:
+            raise ValueError(f"rate must be greater than zero: {rate=}")
+        self.name = name
+        self.rate = rate
+        self.capacity = max(int(capacity), 1)
+        self.store = store or LocalStateStore()
+
+    def __repr__(self):
+        return f"TokenBucket: {self.name} rate={self.rate}/s capacity={self.capacity}"
+
+    async def acquire(self, tokens: int = 1) -> float:
+        """ Wait until the requested number of tokens are available and take them.
+            Returns the total number of seconds spent waiting. """
+        waited: float = 0
+        while True:
+            try:
+                wait = await self.store.take_token(
+                    f"{self.name}:bucket", self.rate, self.capacity, tokens
+                )
+            except Exception as e:  # fail open if the shared store is unreachable
+                logger.warning(f"({self.name}) rate limiter unavailable -- {e}")
+                return waited
+
+            if wait <= 0:
+                if waited > 0:
+                    logger.debug(f"({self.name}) rate limited for {round(waited, 2)}s")
+                return waited
+
+            await asyncio.sleep(wait)
+            waited += wait
+
+
+# --- circuit breaker -------------------------------------------------------- #
+
+
+class CircuitBreaker:
+    """ Circuit breaker for an upstream provider.
+
+        The circuit opens when `failure_threshold` failures are recorded within
+        `failure_window` seconds. While open, requests fail immediately with a
+        CircuitOpenError. After `recovery_timeout` seconds, a single trial request
+        is let through (half-open): if it succeeds the circuit closes, otherwise it
+        opens again for another `recovery_timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        recovery_timeout: float,
+        failure_window: float,
+        store: StateStore = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failure_window = failure_window
+        self.store = store or LocalStateStore()
+
+    def __repr__(self):
+        return f"CircuitBreaker: {self.name} threshold={self.failure_threshold}"
+
+    def _key(self, key: str) -> str:
+        return f"{self.name}:breaker:{key}"
+
+    async def state(self) -> str:
+        if await self.store.get(self._key("open")):
+            return "open"
+        if await self.store.get(self._key("tripped")):
+            return "half_open"
+        return "closed"
+
+    async def before_request(self) -> bool:
+        """ Check the circuit before sending a request. Raises CircuitOpenError if the
+            request should not be sent. Returns True if the request is the trial
+            request of a half-open circuit. """
+        try:
+            if await self.store.get(self._key("open")):
+                raise CircuitOpenError(
+                    self.name, retry_after=await self.store.ttl(self._key("open"))
+                )
+
+            if await self.store.get(self._key("tripped")):
+                # half-open: only one caller gets to send the trial request
+                if await self.store.set(
+                    self._key("trial"), 1, ttl=self.recovery_timeout, nx=True
+                ):
+                    logger.info(f"({self.name}) circuit half-open: sending trial")
+                    return True
+                raise CircuitOpenError(self.name)
+
+        except CircuitOpenError:
+            raise
+        except Exception as e:  # fail open if the shared store is unreachable
+            logger.warning(f"({self.name}) circuit breaker unavailable -- {e}")
+
+        return False
+
+    async def record_success(self, trial: bool = False):
+        if not trial:
+            return
+        try:
+            await self.store.delete(
+                self._key("tripped"), self._key("trial"), self._key("failures")
+            )
+            logger.warning(f"({self.name}) circuit closed")
+        except Exception as e:
+            logger.warning(f"({self.name}) circuit breaker unavailable -- {e}")
+
+    async def record_failure(self, trial: bool = False):
+        try:
+            if trial:
+                await self.open()
+                return
+
+            failures = await self.store.incr(
+                self._key("failures"), ttl=self.failure_window
+            )
+            if failures >= self.failure_threshold:
+                await self.open()
+        except Exception as e:
+            logger.warning(f"({self.name}) circuit breaker unavailable -- {e}")
+
+    async def open(self):
+        await self.store.set(self._key("open"), 1, ttl=self.recovery_timeout)
+        await self.store.set(self._key("tripped"), 1)
+        await self.store.delete(self._key("failures"), self._key("trial"))
+        logger.warning(
+            f"({self.name}) circuit opened for {self.recovery_timeout}s",
+            extra={"provider": self.name},
+        )
+
+
+# --- registry --------------------------------------------------------------- #
+
+_store: Optional[StateStore] = None
+_limiters: Dict[str, TokenBucket] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_store() -> StateStore:
+    """ Get the state store shared by all limiters and breakers in this process """
+    global _store
+    if _store is None:
+        if conf.THROTTLE_STATE_URL:
+            _store = RedisStateStore(conf.THROTTLE_STATE_URL)
+        else:
+            _store = LocalStateStore()
+    return _store
+
+
+def get_rate_limiter(provider: Optional[Provider]) -> Optional[TokenBucket]:
+    """ Get the configured rate limiter for a provider, if rate limiting is enabled """
+    if provider is None or not conf.RATE_LIMIT_ENABLED:
+        return None
+
+    name = Provider(provider).value
+    if name not in _limiters:
+        prefix = name.upper()
+        _limiters[name] = TokenBucket(
+            name,
+            rate=getattr(conf, f"{prefix}_RATE_LIMIT"),
+            capacity=getattr(conf, f"{prefix}_RATE_LIMIT_BURST"),
+            store=get_store(),
+        )
+    return _limiters[name]
+
+
+def get_circuit_breaker(provider: Optional[Provider]) -> Optional[CircuitBreaker]:
+    """ Get the circuit breaker for a provider, if circuit breaking is enabled """
+    if provider is None or not conf.CIRCUIT_BREAKER_ENABLED:
+        return None
+
+    name = Provider(provider).value
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(
+            name,
+            failure_threshold=conf.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=conf.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+            failure_window=conf.CIRCUIT_BREAKER_FAILURE_WINDOW,
+            store=get_store(),
+        )
+    return _breakers[name]
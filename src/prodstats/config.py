@@ -57,6 +57,19 @@ EXTERNAL_CONFIG_BASE_PATH: Path = Path("./config").resolve()
 SECRET_KEY: Secret = conf("SECRET_KEY", cast=Secret)
 
 TASK_BATCH_SIZE: int = conf("PRODSTATS_TASK_BATCH_SIZE", cast=int, default=25)
+# persist each executor's dataset through one connection in one transaction
+PERSIST_TRANSACTIONAL: bool = conf(
+    "PRODSTATS_PERSIST_TRANSACTIONAL", cast=bool, default=False
+)
+# persist the monthly columns derived from volumes and lateral length, rather than
+# computing them on read (see ProdMonthly.normalized)
+PERSIST_DERIVED_MONTHLY: bool = conf(
+    "PRODSTATS_PERSIST_DERIVED_MONTHLY", cast=bool, default=True
+)
+# refresh the well_summary rows of the wells touched by each executor persist
+REFRESH_WELL_SUMMARY: bool = conf(
+    "PRODSTATS_REFRESH_WELL_SUMMARY", cast=bool, default=True
+)
 # TASK_SPREAD_MULTIPLIER: int = conf(
 #     "PRODSTATS_TASK_SPREAD_MULTIPLIER", cast=int, default=30
 # )
@@ -86,9 +99,10 @@ DATABASE_PASSWORD: Secret = conf("DATABASE_PASSWORD", cast=Secret, default=None)
 DATABASE_HOST: str = conf("DATABASE_HOST", cast=str, default="localhost")
 DATABASE_PORT: int = conf("DATABASE_PORT", cast=int, default=5432)
 DATABASE_NAME: str = conf("DATABASE_NAME", cast=str)
+# pool of the web process (see CeleryConfig for worker processes)
 DATABASE_POOL_SIZE_MIN: int = conf("DATABASE_POOL_SIZE_MIN", cast=int, default=1)
 DATABASE_POOL_SIZE_MAX: int = conf(
-    "DATABASE_POOL_SIZE_MIN", cast=int, default=DATABASE_POOL_SIZE_MIN
+    "DATABASE_POOL_SIZE_MAX", cast=int, default=max(DATABASE_POOL_SIZE_MIN, 10)
 )
 DATABASE_CONFIG: DatabaseURL = DatabaseURL(
     drivername=DATABASE_DRIVER,
@@ -99,6 +113,38 @@ DATABASE_CONFIG: DatabaseURL = DatabaseURL(
     database=DATABASE_NAME,
 )
 
+# initial payload of an upsert batch, from which a model's batch size is derived
+DATABASE_BATCH_TARGET_BYTES: int = conf(
+    "DATABASE_BATCH_TARGET_BYTES", cast=int, default=1048576
+)
+# batch sizes are adapted at runtime toward this statement latency
+DATABASE_BATCH_TARGET_SECONDS: float = conf(
+    "DATABASE_BATCH_TARGET_SECONDS", cast=float, default=1
+)
+
+# retries of batches aborted by a deadlock or serialization failure
+DATABASE_MAX_RETRIES: int = conf("DATABASE_MAX_RETRIES", cast=int, default=5)
+DATABASE_RETRY_BACKOFF: float = conf(
+    "DATABASE_RETRY_BACKOFF", cast=float, default=0.1
+)  # seconds, doubled after each retry and jittered
+
+# statements slower than this are logged, and a sample of the slow reads explained
+DATABASE_QUERY_LOG_ENABLED: bool = conf(
+    "DATABASE_QUERY_LOG_ENABLED", cast=bool, default=True
+)
+DATABASE_SLOW_QUERY_SECONDS: float = conf(
+    "DATABASE_SLOW_QUERY_SECONDS", cast=float, default=1
+)
+DATABASE_SLOW_QUERY_LOG_SIZE: int = conf(
+    "DATABASE_SLOW_QUERY_LOG_SIZE", cast=int, default=50
+)  # slowest statements kept in memory
+DATABASE_EXPLAIN_SAMPLE_RATE: float = conf(
+    "DATABASE_EXPLAIN_SAMPLE_RATE", cast=float, default=0
+)  # share of slow reads re-run with EXPLAIN (ANALYZE, BUFFERS); off by default
+DATABASE_EXPLAIN_MAX_CONCURRENT: int = conf(
+    "DATABASE_EXPLAIN_MAX_CONCURRENT", cast=int, default=1
+)  # plans captured at once; slow reads sampled beyond this aren't explained
+
 # --- alembic ---------------------------------------------------------------- #
 
 # Currently only used to first initialize alembic in manage.py::db::init
@@ -140,6 +186,84 @@ DATADOG_DEFAULT_TAGS: Dict[str, str] = {
 IHS_BASE_URL = conf("PRODSTATS_IHS_URL", cast=HTTPUrl)
 FRACFOCUS_BASE_URL = conf("PRODSTATS_FRACFOCUS_URL", cast=HTTPUrl)
 
+# decode IHS responses as they arrive and parse them into the sets a batch at a
+# time, instead of collecting every response before parsing
+IHS_STREAM_RESPONSES: bool = conf(
+    "PRODSTATS_IHS_STREAM_RESPONSES", cast=bool, default=False
+)
+
+# resolve frac parameters from the locally synced registry instead of the service
+FRACFOCUS_USE_REGISTRY: bool = conf(
+    "PRODSTATS_FRACFOCUS_USE_REGISTRY", cast=bool, default=False
+)
+FRACFOCUS_REGISTRY_PAGE_SIZE: int = conf(
+    "PRODSTATS_FRACFOCUS_REGISTRY_PAGE_SIZE", cast=int, default=5000
+)
+
+# --- collector throttling --------------------------------------------------- #
+
+# retries of failed upstream requests (transport errors, 429 and 5xx responses)
+HTTP_MAX_RETRIES: int = conf("PRODSTATS_HTTP_MAX_RETRIES", cast=int, default=0)
+HTTP_RETRY_BACKOFF: float = conf(
+    "PRODSTATS_HTTP_RETRY_BACKOFF", cast=float, default=1
+)  # seconds, doubled after each retry
+
+# shared limiter/breaker state across processes; process-local if not set
+THROTTLE_STATE_URL: Optional[str] = conf("PRODSTATS_REDIS_URL", cast=str, default=None)
+
+RATE_LIMIT_ENABLED: bool = conf(
+    "PRODSTATS_RATE_LIMIT_ENABLED", cast=bool, default=False
+)
+IHS_RATE_LIMIT: float = conf(
+    "PRODSTATS_IHS_RATE_LIMIT", cast=float, default=25
+)  # requests per second
+IHS_RATE_LIMIT_BURST: int = conf("PRODSTATS_IHS_RATE_LIMIT_BURST", cast=int, default=50)
+FRACFOCUS_RATE_LIMIT: float = conf(
+    "PRODSTATS_FRACFOCUS_RATE_LIMIT", cast=float, default=25
+)  # requests per second
+FRACFOCUS_RATE_LIMIT_BURST: int = conf(
+    "PRODSTATS_FRACFOCUS_RATE_LIMIT_BURST", cast=int, default=50
+)
+
+CIRCUIT_BREAKER_ENABLED: bool = conf(
+    "PRODSTATS_CIRCUIT_BREAKER_ENABLED", cast=bool, default=False
+)
+CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = conf(
+    "PRODSTATS_CIRCUIT_BREAKER_FAILURE_THRESHOLD", cast=int, default=20
+)
+CIRCUIT_BREAKER_FAILURE_WINDOW: int = conf(
+    "PRODSTATS_CIRCUIT_BREAKER_FAILURE_WINDOW", cast=int, default=60
+)  # seconds
+CIRCUIT_BREAKER_RECOVERY_TIMEOUT: int = conf(
+    "PRODSTATS_CIRCUIT_BREAKER_RECOVERY_TIMEOUT", cast=int, default=30
+)  # seconds
+
+
+# --- api -------------------------------------------------------------------- #
+
+PAGINATION_COUNT_CACHE_SECONDS: float = conf(
+    "PRODSTATS_PAGINATION_COUNT_CACHE_SECONDS", cast=float, default=30
+)  # exact page counts are reused for this long (0 disables)
+PAGINATION_COUNT_CACHE_SIZE: int = conf(
+    "PRODSTATS_PAGINATION_COUNT_CACHE_SIZE", cast=int, default=1000
+)
+API_LOOKUP_MAX_IDS: int = conf(
+    "PRODSTATS_API_LOOKUP_MAX_IDS", cast=int, default=10000
+)  # api10s/api14s accepted by a single lookup request
+API_STREAM_CHUNK_SIZE: int = conf(
+    "PRODSTATS_API_STREAM_CHUNK_SIZE", cast=int, default=5000
+)  # rows fetched from the cursor for each chunk of a streamed response
+
+
+# --- export ----------------------------------------------------------------- #
+
+EXPORT_CHUNK_SIZE: int = conf(
+    "PRODSTATS_EXPORT_CHUNK_SIZE", cast=int, default=50000
+)  # rows in each record batch / parquet row group
+EXPORT_PARQUET_COMPRESSION: str = conf(
+    "PRODSTATS_EXPORT_PARQUET_COMPRESSION", cast=str, default="snappy"
+)
+
 
 # --- accessors -------------------------------------------------------------- #
 
@@ -171,9 +295,11 @@ class CeleryConfig:
 
     # --- custom ------------------------------------------------------------- #
 
+    # pool of each worker process. A worker process runs one executor at a time,
+    # whose bulk upserts use up to the pool's max size concurrently.
     db_pool_min_size: int = conf("CELERY_DB_MIN_POOL_SIZE", cast=int, default=1)
     db_pool_max_size: int = conf(
-        "CELERY_DB_MAX_POOL_SIZE", cast=int, default=db_pool_min_size
+        "CELERY_DB_MAX_POOL_SIZE", cast=int, default=max(db_pool_min_size, 5)
     )
 
     # --- broker ------------------------------------------------------------- #
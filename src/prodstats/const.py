@@ -62,3 +62,25 @@ class IHSPath(str, Enum):
 class FracFocusPath(str, Enum):
     api10 = "api10"
     api14 = "api14"
+    jobs = "jobs"
+
+
+class CountMode(str, Enum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    NONE = "none"
+
+
+class StreamFormat(str, Enum):
+    NDJSON = "ndjson"  # one json object per line
+    JSON = "json"  # a single json array
+
+
+class ExportFormat(str, Enum):
+    ARROW = "arrow"  # arrow ipc stream
+    PARQUET = "parquet"
+
+
+class ExportDataset(str, Enum):
+    MONTHLY = "production_monthly"
+    PRODSTATS = "prodstats"
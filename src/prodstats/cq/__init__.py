@@ -47,3 +47,10 @@ def setup_periodic_tasks(sender, **kwargs):
         tasks.sync_known_entities.s(HoleDirection.H),
         name="sync_known_entities_h",
     )
+
+    if conf.FRACFOCUS_USE_REGISTRY:
+        add_task(
+            crontab(minute=30, hour="*/6"),
+            tasks.sync_fracfocus_registry.s(),
+            name="sync_fracfocus_registry",
+        )
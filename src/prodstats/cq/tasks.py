@@ -13,8 +13,9 @@ import cq.signals  # noqa
 import cq.util
 import db.models
 import ext.metrics as metrics
+import schemas as sch
 import util
-from collector import IHSClient
+from collector import FracFocusClient, IHSClient
 from const import HoleDirection, IHSPath, Provider
 from cq.worker import celery_app
 from executors import BaseExecutor, GeomExecutor, ProdExecutor, WellExecutor  # noqa
@@ -254,11 +255,40 @@ def sync_known_entities_for_area(hole_dir: HoleDirection, area: str):
         combined = combined.drop(columns=["created_at", "updated_at"])
 
         # persist the new records
-        await db.models.KnownEntity.bulk_upsert(combined, batch_size=1000)
+        await db.models.KnownEntity.bulk_upsert(combined)
 
     util.aio.async_to_sync(wrapper(hole_dir, area))
 
 
+@celery_app.task
+def sync_fracfocus_registry(full: bool = False):
+    """ Bulk sync the FracFocus job registry into the local fracfocus_jobs table.
+        Only jobs updated since the last sync are fetched unless full is True. """
+
+    async def wrapper(full: bool) -> int:
+        model = db.models.FracFocusJob
+        updated_since = None
+        if not full:
+            updated_since = await db.db.func.max(
+                model.provider_last_update_at
+            ).gino.scalar()
+
+        affected = 0
+        async for data in FracFocusClient.iter_registry(updated_since=updated_since):
+            df = sch.FracParameterSet(wells=data).df(create_index=False)
+            if not df.empty:
+                df["api10"] = df.api14.str[:10]
+                affected += await model.bulk_upsert(df, reset_index=False)
+
+        logger.info(
+            f"({model.__name__}) synchronized registry: {affected} jobs updated"
+            + (f" since {updated_since}" if updated_since else "")
+        )
+        return affected
+
+    return util.aio.async_to_sync(wrapper(full))
+
+
 @celery_app.task
 def run_for_apilist(
     hole_dir: HoleDirection,
@@ -3,10 +3,19 @@ import logging
 
 import gino
 
-from config import DATABASE_CONFIG, DATABASE_POOL_SIZE_MAX, DATABASE_POOL_SIZE_MIN
+from config import (
+    DATABASE_CONFIG,
+    DATABASE_POOL_SIZE_MAX,
+    DATABASE_POOL_SIZE_MIN,
+    DATABASE_QUERY_LOG_ENABLED,
+)
+from db import pool, querylog
 
 logger = logging.getLogger(__name__)
 
+if DATABASE_QUERY_LOG_ENABLED:
+    querylog.install()
+
 db: gino.Gino = gino.Gino(
     naming_convention={  # passed to sqlalchemy.MetaData
         "ix": "ix_%(column_0_label)s",
@@ -42,9 +51,15 @@ def qsize():
     return db.bind.raw_pool._queue.qsize()
 
 
+def pool_status():
+    """ Get the open, in use, idle and waiting connection counts of the pool """
+    return pool.status(db.bind)
+
+
 # set some properties for convenience
-db.qsize, db.startup, db.shutdown, db.create_engine, db.url = (
+db.qsize, db.pool_status, db.startup, db.shutdown, db.create_engine, db.url = (
     qsize,
+    pool_status,
     startup,
     shutdown,
     create_engine,
@@ -0,0 +1,273 @@
+""" Columnar exports of monthly production and prodstats.
+
+    Rows are read from a server-side cursor (see DataFrameMixin.iter_rows) and
+    encoded a chunk at a time, as a record batch of an Arrow IPC stream or a row
+    group of a Parquet file, so only one chunk of an export is held in memory.
+    The encoded bytes of each chunk are handed off as soon as they are written.
+    Encoding is CPU-bound, so each chunk is encoded in the loop's default executor
+    rather than on the event loop.
+
+    pyarrow is an optional dependency (the export extra): exports raise ImportError
+    without it.
+"""
+import asyncio
+import io
+import json
+import logging
+from datetime import date, timezone
+from pathlib import Path
+from timeit import default_timer as timer
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Tuple, Union
+
+import sqlalchemy as sa
+from sqlalchemy.sql import Select
+
+import config as conf
+from const import ExportDataset, ExportFormat
+from db.models import Model, ProdMonthly, ProdStat, WellHeader
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["Export", "MEDIA_TYPES"]
+
+MEDIA_TYPES: Dict[ExportFormat, str] = {
+    ExportFormat.ARROW: "application/vnd.apache.arrow.stream",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+EXTENSIONS: Dict[ExportFormat, str] = {
+    ExportFormat.ARROW: "arrows",
+    ExportFormat.PARQUET: "parquet",
+}
+
+
+def arrow_type(column_type: Any) -> Tuple[Any, Callable]:
+    """ The arrow type of a sqlalchemy column type, and a function converting the
+        column's values to values of the arrow type (or None if they convert as
+        they are) """
+    if isinstance(column_type, sa.Boolean):
+        return pa.bool_(), None
+    if isinstance(column_type, sa.SmallInteger):
+        return pa.int16(), None
+    if isinstance(column_type, sa.BigInteger):
+        return pa.int64(), None
+    if isinstance(column_type, sa.Integer):
+        return pa.int32(), None
+    if isinstance(column_type, sa.Numeric):  # includes Float
+        return pa.float64(), lambda x: None if x is None else float(x)
+    if isinstance(column_type, sa.DateTime):
+        if column_type.timezone:
+            return (
+                pa.timestamp("us", tz="UTC"),
+                lambda x: None if x is None else x.astimezone(timezone.utc),
+            )
+        return pa.timestamp("us"), None
+    if isinstance(column_type, sa.Date):
+        return pa.date32(), None
+    if isinstance(column_type, sa.JSON):  # includes JSONB
+        return pa.string(), lambda x: None if x is None else json.dumps(x)
+    if isinstance(column_type, sa.String):
+        return pa.string(), None
+    return pa.string(), lambda x: None if x is None else str(x)
+
+
+class ChunkSink(io.RawIOBase):
+    """ Write-only file collecting the bytes written by an arrow writer until they
+        are drained. Tracks the total bytes written, since parquet records the
+        file offsets of its row groups. """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks: List[bytes] = []
+        self.position: int = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class Export:
+    """ A columnar export of monthly production (with the normalized columns) or
+        prodstats (in the wide shape), ordered by well
+
+        Arguments:
+            dataset: the dataset to export
+            format: arrow (an Arrow IPC stream) or parquet
+            columns: column names to export; defaults to all columns
+            api10s: limit the export to the wells of the given api10s
+            basin: limit the export to the wells of a basin
+            names: limit a prodstats export to the given stat names
+            start_date: limit monthly production to prod dates from start_date,
+                or prodstats to periods ending on or after it
+            end_date: limit monthly production to prod dates up to end_date, or
+                prodstats to periods starting on or before it
+            chunk_size: rows in each record batch or row group
+
+        Raises ValueError for unknown columns or filters that don't apply to the
+        dataset, and ImportError if pyarrow isn't installed.
+
+        Example:
+            >>> export = Export("prodstats", "parquet", basin="permian")
+            >>> async for chunk in export:
+                    stream.write(chunk)
+    """
+
+    def __init__(
+        self,
+        dataset: Union[ExportDataset, str],
+        format: Union[ExportFormat, str] = ExportFormat.PARQUET,
+        columns: List[str] = None,
+        api10s: Iterable[str] = None,
+        basin: str = None,
+        names: Iterable[str] = None,
+        start_date: date = None,
+        end_date: date = None,
+        chunk_size: int = None,
+    ):
+        if pa is None:
+            raise ImportError("pyarrow is required for columnar exports")
+
+        self.dataset = ExportDataset(dataset)
+        self.format = ExportFormat(format)
+        self.chunk_size = chunk_size or conf.EXPORT_CHUNK_SIZE
+        self.rows: int = 0
+
+        self.model: Model
+        if self.dataset == ExportDataset.PRODSTATS:
+            self.model = ProdStat
+            stmt = ProdStat.lookup(
+                api10s=api10s, names=names, start_date=start_date, end_date=end_date
+            )
+            keys = ["api10", "name"]
+        else:
+            if names is not None:
+                raise ValueError(f"names can't filter {self.dataset.value}")
+            self.model = ProdMonthly
+            stmt = ProdMonthly.lookup(
+                api10s=api10s, start_date=start_date, end_date=end_date
+            )
+            keys = ["api10", "prod_date"]
+
+        if basin:
+            stmt = stmt.where(
+                self.model.api10.in_(
+                    sa.select([WellHeader.api10]).where(WellHeader.basin == basin)
+                )
+            )
+
+        source = stmt.order_by(None).alias("source")
+        available = [x.name for x in source.columns]
+        self.columns: List[str] = list(columns or available)
+        unknown = [x for x in self.columns if x not in available]
+        if unknown:
+            raise ValueError(
+                f"Can't export {unknown} from {self.dataset.value}: must be one of {available}"  # noqa
+            )
+
+        self.stmt: Select = sa.select([source.c[x] for x in self.columns]).order_by(
+            *[source.c[x] for x in keys]
+        )
+
+        fields = []
+        self.converters: Dict[int, Callable] = {}
+        for idx, name in enumerate(self.columns):
+            pa_type, converter = arrow_type(source.c[name].type)
+            fields.append(pa.field(name, pa_type))
+            if converter:
+                self.converters[idx] = converter
+        self.schema = pa.schema(fields)
+
+    def __repr__(self):
+        return f"Export: {self.dataset.value} ({self.format.value}) {len(self.columns)} columns"  # noqa
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.format]
+
+    @property
+    def filename(self) -> str:
+        return f"{self.dataset.value}.{EXTENSIONS[self.format]}"
+
+    def record_batch(self, rows: List[Tuple]):
+        """ Build a record batch of the export's schema from rows """
+        values = list(zip(*rows))
+        arrays = []
+        for idx, field in enumerate(self.schema):
+            column = values[idx]
+            if idx in self.converters:
+                column = [self.converters[idx](x) for x in column]
+            arrays.append(pa.array(column, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def writer(self, sink: ChunkSink):
+        if self.format == ExportFormat.PARQUET:
+            return pq.ParquetWriter(
+                sink, self.schema, compression=conf.EXPORT_PARQUET_COMPRESSION
+            )
+        return pa.ipc.new_stream(sink, self.schema)
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self.iter_chunks()
+
+    def encode(self, writer, sink: ChunkSink, rows: List[Tuple]) -> bytes:
+        """ Write rows as a record batch or row group and drain the bytes written """
+        batch = self.record_batch(rows)
+        if self.format == ExportFormat.PARQUET:
+            writer.write_table(pa.Table.from_batches([batch]))  # one row group
+        else:
+            writer.write_batch(batch)
+        return sink.drain()
+
+    @staticmethod
+    def finish(writer, sink: ChunkSink) -> bytes:
+        """ Close the writer and drain its trailing bytes (e.g. the parquet footer) """
+        writer.close()
+        return sink.drain()
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """ Yield the encoded export, a record batch or row group at a time """
+        ts = timer()
+        self.rows = 0
+        sink = ChunkSink()
+        writer = self.writer(sink)
+        loop = asyncio.get_event_loop()
+
+        async for rows in self.model.iter_rows(self.stmt, chunk_size=self.chunk_size):
+            data = await loop.run_in_executor(None, self.encode, writer, sink, rows)
+            self.rows += len(rows)
+            if data:
+                yield data
+
+        yield await loop.run_in_executor(None, self.finish, writer, sink)
+
+        logger.info(
+            f"({self.__class__.__name__}) exported {self.rows} {self.dataset.value} records as {self.format.value} ({round(timer() - ts, 2)}s)",  # noqa
+            extra={"dataset": self.dataset.value, "format": self.format.value},
+        )
+
+    async def to_file(self, path: Union[Path, str]) -> int:
+        """ Write the export to a file. Returns the number of rows written. """
+        with open(path, "wb") as f:
+            async for chunk in self:
+                f.write(chunk)
+        return self.rows
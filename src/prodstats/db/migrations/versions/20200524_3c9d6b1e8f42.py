@@ -0,0 +1,69 @@
+"""partition production_monthly and prodstats by hash of api10
+
+Revision ID: 3c9d6b1e8f42
+Revises: 5e8a2f7c4b16
+Create Date: 2020-05-24 09:41:27.106384+00:00
+
+"""
+from typing import List
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3c9d6b1e8f42"
+down_revision = "5e8a2f7c4b16"
+branch_labels = None
+depends_on = None
+
+PARTITIONS = 8  # db.partitions.DEFAULT_PARTITIONS at the time of this revision
+
+TABLES = {
+    "production_monthly": {
+        "pk": ["api10", "prod_date"],
+        "indexes": {"ix_production_monthly_updated_at": ["updated_at"]},
+    },
+    "prodstats": {
+        "pk": ["api10", "name"],
+        "indexes": {
+            "ix_prodstats_name": ["name"],
+            "ix_prodstats_property_name": ["property_name"],
+            "ix_prodstats_aggregate_type": ["aggregate_type"],
+            "ix_prodstats_updated_at": ["updated_at"],
+            "ix_prodstat_api10_prop_agg": ["api10", "property_name", "aggregate_type"],
+        },
+    },
+}
+
+
+def rebuild(table: str, pk: List[str], indexes: dict, partitioned: bool):
+    """ Recreate the table, with or without partitions, and copy its rows over.
+        Keys and indexes are created after the copy. """
+    previous = f"{table}_previous"
+    op.rename_table(table, previous)
+
+    partition_by = " PARTITION BY HASH (api10)" if partitioned else ""
+    op.execute(
+        f"CREATE TABLE {table} (LIKE {previous} INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partition_by}"  # noqa
+    )
+    if partitioned:
+        for r in range(PARTITIONS):
+            op.execute(
+                f"CREATE TABLE {table}_p{r} PARTITION OF {table} FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {r})"  # noqa
+            )
+
+    op.execute(f"INSERT INTO {table} SELECT * FROM {previous}")
+    op.drop_table(previous)  # drops the previous keys and indexes with it
+
+    op.create_primary_key(op.f(f"pk_{table}"), table, pk)
+    for name, columns in indexes.items():
+        op.create_index(name, table, columns, unique=False)
+
+
+def upgrade():
+    for table, spec in TABLES.items():
+        rebuild(table, spec["pk"], spec["indexes"], partitioned=True)
+
+
+def downgrade():
+    for table, spec in TABLES.items():
+        rebuild(table, spec["pk"], spec["indexes"], partitioned=False)
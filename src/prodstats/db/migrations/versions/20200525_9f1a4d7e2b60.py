@@ -0,0 +1,216 @@
+"""move prodstat attributes to prodstat_definitions
+
+Revision ID: 9f1a4d7e2b60
+Revises: 3c9d6b1e8f42
+Create Date: 2020-05-25 14:02:51.733918+00:00
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "9f1a4d7e2b60"
+down_revision = "3c9d6b1e8f42"
+branch_labels = None
+depends_on = None
+
+PARTITIONS = 8  # db.partitions.DEFAULT_PARTITIONS at the time of this revision
+
+DEFINITION_COLUMNS = [
+    "name",
+    "property_name",
+    "aggregate_type",
+    "is_peak_norm",
+    "is_ll_norm",
+    "ll_norm_value",
+    "includes_zeroes",
+    "comments",
+]
+
+VALUE_COLUMNS = [
+    "api10",
+    "value",
+    "start_date",
+    "end_date",
+    "start_month",
+    "end_month",
+    "created_at",
+    "updated_at",
+]
+
+WIDE_INDEXES = {
+    "ix_prodstats_name": ["name"],
+    "ix_prodstats_property_name": ["property_name"],
+    "ix_prodstats_aggregate_type": ["aggregate_type"],
+    "ix_prodstats_updated_at": ["updated_at"],
+    "ix_prodstat_api10_prop_agg": ["api10", "property_name", "aggregate_type"],
+}
+
+VIEW_SQL = """
+CREATE VIEW prodstats_expanded AS
+SELECT prodstats.api10, prodstat_definitions.name, prodstats.value,
+    prodstat_definitions.property_name, prodstat_definitions.aggregate_type,
+    prodstat_definitions.is_peak_norm, prodstat_definitions.is_ll_norm,
+    prodstat_definitions.ll_norm_value, prodstat_definitions.includes_zeroes,
+    prodstats.start_date, prodstats.end_date, prodstats.start_month,
+    prodstats.end_month, prodstat_definitions.comments, prodstats.created_at,
+    prodstats.updated_at
+FROM prodstats JOIN prodstat_definitions ON prodstats.stat_id = prodstat_definitions.id
+"""
+
+
+def audit_columns():
+    return [
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+    ]
+
+
+def create_partitions(table: str):
+    for r in range(PARTITIONS):
+        op.execute(
+            f"CREATE TABLE {table}_p{r} PARTITION OF {table} FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {r})"  # noqa
+        )
+
+
+def rename_partitioned(table: str, new_name: str):
+    op.rename_table(table, new_name)
+    for r in range(PARTITIONS):
+        op.rename_table(f"{table}_p{r}", f"{new_name}_p{r}")
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table(
+        "prodstat_definitions",
+        sa.Column("id", sa.SmallInteger(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(length=50), nullable=False),
+        sa.Column("property_name", sa.String(length=50), nullable=True),
+        sa.Column("aggregate_type", sa.String(length=25), nullable=True),
+        sa.Column("is_peak_norm", sa.Boolean(), nullable=True),
+        sa.Column("is_ll_norm", sa.Boolean(), nullable=True),
+        sa.Column("ll_norm_value", sa.Integer(), nullable=True),
+        sa.Column("includes_zeroes", sa.Boolean(), nullable=True),
+        sa.Column(
+            "comments",
+            postgresql.JSONB(astext_type=sa.Text()),
+            server_default="{}",
+            nullable=False,
+        ),
+        *audit_columns(),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_prodstat_definitions")),
+        sa.UniqueConstraint("name", name=op.f("uq_prodstat_definitions_name")),
+    )
+    op.create_index(
+        op.f("ix_prodstat_definitions_aggregate_type"),
+        "prodstat_definitions",
+        ["aggregate_type"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_prodstat_definitions_property_name"),
+        "prodstat_definitions",
+        ["property_name"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_prodstat_definitions_updated_at"),
+        "prodstat_definitions",
+        ["updated_at"],
+        unique=False,
+    )
+    # ### end Alembic commands ###
+
+    definitions = ", ".join(DEFINITION_COLUMNS)
+    op.execute(
+        f"INSERT INTO prodstat_definitions ({definitions}) SELECT DISTINCT ON (name) {definitions} FROM prodstats ORDER BY name"  # noqa
+    )
+
+    rename_partitioned("prodstats", "prodstats_previous")
+    op.create_table(
+        "prodstats",
+        sa.Column("api10", sa.String(length=10), nullable=False),
+        sa.Column("stat_id", sa.SmallInteger(), nullable=False),
+        sa.Column("value", sa.Numeric(precision=19, scale=2), nullable=True),
+        sa.Column("start_date", sa.Date(), nullable=True),
+        sa.Column("end_date", sa.Date(), nullable=True),
+        sa.Column("start_month", sa.Integer(), nullable=True),
+        sa.Column("end_month", sa.Integer(), nullable=True),
+        sa.Column("row_hash", sa.BigInteger(), nullable=True),
+        *audit_columns(),
+        postgresql_partition_by="HASH (api10)",
+    )
+    create_partitions("prodstats")
+
+    # row hashes are left empty, as they covered the previous columns
+    values = ", ".join(VALUE_COLUMNS)
+    selected = ", ".join(f"p.{x}" for x in VALUE_COLUMNS)
+    op.execute(
+        f"INSERT INTO prodstats (stat_id, {values}) SELECT d.id, {selected} FROM prodstats_previous p JOIN prodstat_definitions d ON d.name = p.name"  # noqa
+    )
+    op.drop_table("prodstats_previous")
+
+    op.create_primary_key(op.f("pk_prodstats"), "prodstats", ["api10", "stat_id"])
+    op.create_index(
+        "ix_prodstats_stat_id_value", "prodstats", ["stat_id", "value"], unique=False
+    )
+    op.create_index(
+        op.f("ix_prodstats_updated_at"), "prodstats", ["updated_at"], unique=False
+    )
+    op.execute(VIEW_SQL)
+
+
+def downgrade():
+    op.execute("DROP VIEW IF EXISTS prodstats_expanded")
+    rename_partitioned("prodstats", "prodstats_previous")
+    op.create_table(
+        "prodstats",
+        sa.Column("api10", sa.String(length=10), nullable=False),
+        sa.Column("name", sa.String(length=50), nullable=False),
+        sa.Column("value", sa.Numeric(precision=19, scale=2), nullable=True),
+        sa.Column("property_name", sa.String(length=50), nullable=True),
+        sa.Column("aggregate_type", sa.String(length=25), nullable=True),
+        sa.Column("is_peak_norm", sa.Boolean(), nullable=True),
+        sa.Column("is_ll_norm", sa.Boolean(), nullable=True),
+        sa.Column("ll_norm_value", sa.Integer(), nullable=True),
+        sa.Column("includes_zeroes", sa.Boolean(), nullable=True),
+        sa.Column("start_date", sa.Date(), nullable=True),
+        sa.Column("end_date", sa.Date(), nullable=True),
+        sa.Column("start_month", sa.Integer(), nullable=True),
+        sa.Column("end_month", sa.Integer(), nullable=True),
+        sa.Column(
+            "comments",
+            postgresql.JSONB(astext_type=sa.Text()),
+            server_default="{}",
+            nullable=False,
+        ),
+        *audit_columns(),
+        sa.Column("row_hash", sa.BigInteger(), nullable=True),
+        postgresql_partition_by="HASH (api10)",
+    )
+    create_partitions("prodstats")
+
+    values = ", ".join(VALUE_COLUMNS + DEFINITION_COLUMNS)
+    selected = ", ".join(
+        [f"p.{x}" for x in VALUE_COLUMNS] + [f"d.{x}" for x in DEFINITION_COLUMNS]
+    )
+    op.execute(
+        f"INSERT INTO prodstats ({values}) SELECT {selected} FROM prodstats_previous p JOIN prodstat_definitions d ON d.id = p.stat_id"  # noqa
+    )
+    op.drop_table("prodstats_previous")
+    op.drop_table("prodstat_definitions")
+
+    op.create_primary_key(op.f("pk_prodstats"), "prodstats", ["api10", "name"])
+    for name, columns in WIDE_INDEXES.items():
+        op.create_index(name, "prodstats", columns, unique=False)
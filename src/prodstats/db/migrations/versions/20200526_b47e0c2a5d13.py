@@ -0,0 +1,72 @@
+"""create production_monthly_normalized view
+
+Revision ID: b47e0c2a5d13
+Revises: 9f1a4d7e2b60
+Create Date: 2020-05-26 08:37:14.520661+00:00
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b47e0c2a5d13"
+down_revision = "9f1a4d7e2b60"
+branch_labels = None
+depends_on = None
+
+PROD_COLUMNS = ["oil", "gas", "water", "boe"]
+LATERAL_NORMS = {"1k": 1000, "3k": 3000, "5k": 5000, "7500": 7500, "10k": 10000}
+NUMERIC_AVG_DAILY = ["gas", "water", "boe"]  # Numeric(19, 2); oil is an integer
+
+BASE_COLUMNS = [
+    "api10",
+    "prod_date",
+    "prod_month",
+    "days_in_month",
+    "prod_days",
+    "peak_norm_month",
+    "peak_norm_days",
+    "oil",
+    "gas",
+    "water",
+    "boe",
+    "water_cut",
+    "oil_percent",
+    "gor",
+]
+TRAILING_COLUMNS = ["comments", "row_hash", "created_at", "updated_at"]
+
+
+def view_sql() -> str:
+    columns = [f"m.{x}" for x in BASE_COLUMNS]
+
+    for suffix, norm_value in LATERAL_NORMS.items():
+        for x in PROD_COLUMNS:
+            name = f"{x}_per{suffix}"
+            columns.append(
+                f"coalesce(m.{name}, CAST(trunc(CAST(m.{x} AS NUMERIC) * {norm_value} / nullif(h.perfll, 0)) AS INTEGER)) AS {name}"  # noqa
+            )
+
+    for x in PROD_COLUMNS:
+        name = f"{x}_avg_daily"
+        expr = f"CAST(m.{x} AS NUMERIC) / nullif(m.days_in_month, 0)"
+        if x in NUMERIC_AVG_DAILY:
+            expr = f"round({expr}, 2)"
+        else:
+            expr = f"CAST(trunc({expr}) AS INTEGER)"
+        columns.append(f"coalesce(m.{name}, {expr}) AS {name}")
+
+    columns += [f"m.{x}" for x in TRAILING_COLUMNS]
+    return (
+        "CREATE VIEW production_monthly_normalized AS SELECT "
+        + ", ".join(columns)
+        + " FROM production_monthly m"
+        + " LEFT OUTER JOIN production_header h ON h.api10 = m.api10"
+    )
+
+
+def upgrade():
+    op.execute(view_sql())
+
+
+def downgrade():
+    op.execute("DROP VIEW IF EXISTS production_monthly_normalized")
@@ -0,0 +1,189 @@
+"""create well_summary
+
+Revision ID: d81f36a9c5e7
+Revises: b47e0c2a5d13
+Create Date: 2020-05-27 10:12:45.218304+00:00
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d81f36a9c5e7"
+down_revision = "b47e0c2a5d13"
+branch_labels = None
+depends_on = None
+
+WELL_COLUMNS = [
+    "api10",
+    "well_name",
+    "hole_direction",
+    "status",
+    "is_producing",
+    "operator",
+    "operator_alias",
+    "basin",
+    "sub_basin",
+    "state",
+    "county",
+    "tvd",
+    "perfll",
+    "lateral_length",
+    "spud_date",
+    "comp_date",
+]
+FRAC_COLUMNS = [
+    "fluid_bbl",
+    "proppant_lb",
+    "fluid_bbl_ft",
+    "proppant_lb_ft",
+    "gen",
+    "gen_name",
+]
+HEADER_COLUMNS = [
+    "first_prod_date",
+    "last_prod_date",
+    "prod_months",
+    "peak30_oil",
+    "peak30_gas",
+    "peak30_month",
+]
+SUMMARY_STATS = [
+    "oil_sum",
+    "gas_sum",
+    "boe_sum",
+    "oil_sum_first6mo",
+    "gas_sum_first6mo",
+    "boe_sum_first6mo",
+    "oil_sum_first12mo",
+    "gas_sum_first12mo",
+    "boe_sum_first12mo",
+    "oil_sum_first12mo_per1k",
+    "boe_sum_first12mo_per1k",
+    "oil_sum_peaknorm6mo",
+    "boe_sum_peaknorm6mo",
+    "oil_sum_last3mo",
+    "boe_sum_last3mo",
+]
+
+
+def populate_sql() -> str:
+    """ Statement populating the summary from the source tables, as in
+        WellSummary.source() at the time of this revision """
+    stats = ", ".join(f"'{x}'" for x in SUMMARY_STATS)
+    pivot = ", ".join(
+        f"max(s.value) FILTER (WHERE d.name = '{x}') AS {x}" for x in SUMMARY_STATS
+    )
+    columns = ["api14"] + WELL_COLUMNS + FRAC_COLUMNS + HEADER_COLUMNS + SUMMARY_STATS
+    selected = (
+        ["w.api14"]
+        + [f"w.{x}" for x in WELL_COLUMNS]
+        + [f"f.{x}" for x in FRAC_COLUMNS]
+        + [f"h.{x}" for x in HEADER_COLUMNS]
+        + [f"stats.{x}" for x in SUMMARY_STATS]
+    )
+    return (
+        f"INSERT INTO well_summary ({', '.join(columns)}) SELECT {', '.join(selected)}"
+        " FROM wells w"
+        " LEFT OUTER JOIN frac_parameters f ON f.api14 = w.api14"
+        " LEFT OUTER JOIN production_header h ON h.api10 = w.api10"
+        f" LEFT OUTER JOIN (SELECT s.api10, {pivot} FROM prodstats s"
+        " JOIN prodstat_definitions d ON s.stat_id = d.id"
+        f" WHERE d.name IN ({stats}) GROUP BY s.api10) stats ON stats.api10 = w.api10"
+    )
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table(
+        "well_summary",
+        sa.Column("api14", sa.String(length=14), nullable=False),
+        sa.Column("api10", sa.String(length=10), nullable=True),
+        sa.Column("well_name", sa.String(), nullable=True),
+        sa.Column("hole_direction", sa.String(length=1), nullable=True),
+        sa.Column("status", sa.String(length=50), nullable=True),
+        sa.Column("is_producing", sa.Boolean(), nullable=True),
+        sa.Column("operator", sa.String(), nullable=True),
+        sa.Column("operator_alias", sa.String(), nullable=True),
+        sa.Column("basin", sa.String(length=50), nullable=True),
+        sa.Column("sub_basin", sa.String(length=50), nullable=True),
+        sa.Column("state", sa.String(length=50), nullable=True),
+        sa.Column("county", sa.String(length=50), nullable=True),
+        sa.Column("tvd", sa.Integer(), nullable=True),
+        sa.Column("perfll", sa.Integer(), nullable=True),
+        sa.Column("lateral_length", sa.Integer(), nullable=True),
+        sa.Column("spud_date", sa.Date(), nullable=True),
+        sa.Column("comp_date", sa.Date(), nullable=True),
+        sa.Column("fluid_bbl", sa.Integer(), nullable=True),
+        sa.Column("proppant_lb", sa.Integer(), nullable=True),
+        sa.Column("fluid_bbl_ft", sa.Integer(), nullable=True),
+        sa.Column("proppant_lb_ft", sa.Integer(), nullable=True),
+        sa.Column("gen", sa.Integer(), nullable=True),
+        sa.Column("gen_name", sa.String(length=10), nullable=True),
+        sa.Column("first_prod_date", sa.Date(), nullable=True),
+        sa.Column("last_prod_date", sa.Date(), nullable=True),
+        sa.Column("prod_months", sa.Integer(), nullable=True),
+        sa.Column("peak30_oil", sa.Integer(), nullable=True),
+        sa.Column("peak30_gas", sa.Integer(), nullable=True),
+        sa.Column("peak30_month", sa.Integer(), nullable=True),
+        sa.Column("oil_sum", sa.Numeric(precision=19, scale=2), nullable=True),
+        sa.Column("gas_sum", sa.Numeric(precision=19, scale=2), nullable=True),
+        sa.Column("boe_sum", sa.Numeric(precision=19, scale=2), nullable=True),
+        sa.Column("oil_sum_first6mo", sa.Numeric(precision=19, scale=2), nullable=True),
+        sa.Column("gas_sum_first6mo", sa.Numeric(precision=19, scale=2), nullable=True),
+        sa.Column("boe_sum_first6mo", sa.Numeric(precision=19, scale=2), nullable=True),
+        sa.Column(
+            "oil_sum_first12mo", sa.Numeric(precision=19, scale=2), nullable=True
+        ),
+        sa.Column(
+            "gas_sum_first12mo", sa.Numeric(precision=19, scale=2), nullable=True
+        ),
+        sa.Column(
+            "boe_sum_first12mo", sa.Numeric(precision=19, scale=2), nullable=True
+        ),
+        sa.Column(
+            "oil_sum_first12mo_per1k", sa.Numeric(precision=19, scale=2), nullable=True
+        ),
+        sa.Column(
+            "boe_sum_first12mo_per1k", sa.Numeric(precision=19, scale=2), nullable=True
+        ),
+        sa.Column(
+            "oil_sum_peaknorm6mo", sa.Numeric(precision=19, scale=2), nullable=True
+        ),
+        sa.Column(
+            "boe_sum_peaknorm6mo", sa.Numeric(precision=19, scale=2), nullable=True
+        ),
+        sa.Column("oil_sum_last3mo", sa.Numeric(precision=19, scale=2), nullable=True),
+        sa.Column("boe_sum_last3mo", sa.Numeric(precision=19, scale=2), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("api14", name=op.f("pk_well_summary")),
+    )
+    op.create_index(
+        "ix_well_summary_basin_holedir_isprod",
+        "well_summary",
+        ["basin", "hole_direction", "is_producing"],
+        unique=False,
+    )
+    for column in ["api10", "operator", "operator_alias", "county", "updated_at"]:
+        op.create_index(
+            op.f(f"ix_well_summary_{column}"), "well_summary", [column], unique=False
+        )
+    # ### end Alembic commands ###
+
+    # populated here, then refreshed by the executors as wells are persisted
+    op.execute(populate_sql())
+
+
+def downgrade():
+    op.drop_table("well_summary")
@@ -4,20 +4,50 @@ from __future__ import annotations
 
 import asyncio
 import functools
+import json
 import logging
+import random
+from datetime import date
 from enum import Enum
 from timeit import default_timer as timer
-from typing import Callable, Coroutine, Dict, List, Optional, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import pandas as pd
-from asyncpg.exceptions import DataError, UniqueViolationError
+import sqlalchemy as sa
+from asyncpg.exceptions import (
+    DataError,
+    DeadlockDetectedError,
+    SerializationError,
+    UniqueViolationError,
+)
+from geoalchemy2 import Geometry
+from pandas.api.types import (
+    is_bool_dtype,
+    is_datetime64_any_dtype,
+    is_float_dtype,
+    is_integer_dtype,
+    is_numeric_dtype,
+)
 from sqlalchemy.dialects.postgresql.dml import Insert
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.schema import Constraint
+from sqlalchemy.schema import Column, Constraint
 
 import config as conf
 import util
+import util.geo
+from db import pool, querylog
 
 
 class Operation(Enum):
@@ -27,8 +57,242 @@ class Operation(Enum):
     UPSERT = "upsert"
 
 
+class UpsertMethod(Enum):
+    VALUES = "values"  # prepared INSERT ... VALUES, executed once per row
+    COPY = "copy"  # COPY into a staging table, then INSERT ... SELECT
+
+
 logger = logging.getLogger(__name__)
 
+# audit columns that are ignored when comparing a row to its update
+AUDIT_COLUMNS = ["created_at", "updated_at"]
+
+# models with this column store a content hash of each row (see DataFrameMixin)
+ROW_HASH_COLUMN = "row_hash"
+
+# per-transaction row counts of a table, as tracked by the statistics collector.
+# Rows of a partitioned table are counted against its partitions, not the parent.
+XACT_COUNTS_SQL = """
+SELECT
+    coalesce(sum(pg_stat_get_xact_tuples_inserted(relid)), 0)::bigint,
+    coalesce(sum(pg_stat_get_xact_tuples_updated(relid)), 0)::bigint
+FROM (
+    SELECT $1::regclass::oid AS relid
+    UNION ALL
+    SELECT inhrelid FROM pg_inherits WHERE inhparent = $1::regclass
+) AS t
+"""
+
+# errors from which a batch is retried as is, after a backoff
+TRANSIENT_ERRORS = (DeadlockDetectedError, SerializationError)
+
+# compiled statements keyed by model, statement kind, columns and conflict mode
+_statement_cache: Dict[Tuple, Any] = {}
+
+# postgres rejects statements binding more parameters than this
+MAX_BIND_PARAMS = 32767
+
+# estimated bytes per value by column type, used to derive batch sizes. Checked in
+# order, so subclasses come before their bases.
+TYPE_WIDTHS: List[Tuple[Any, int]] = [
+    (sa.Boolean, 1),
+    (sa.SmallInteger, 2),
+    (sa.BigInteger, 8),
+    (sa.Integer, 4),
+    (sa.Float, 8),
+    (sa.Numeric, 16),
+    (sa.DateTime, 8),
+    (sa.Date, 4),
+    (sa.JSON, 256),
+    (Geometry, 64),
+]
+DEFAULT_WIDTH = 32
+
+# batch sizers keyed by model, method and columns
+_batch_sizers: Dict[Tuple, Any] = {}
+
+
+class UpsertCounts:
+    """ Number of records inserted, updated, left unchanged, or rejected by an
+        upsert. Records that conflict with an existing row are unchanged when the
+        row already holds the same values or the upsert ignores conflicts. """
+
+    def __init__(
+        self, inserted: int = 0, updated: int = 0, unchanged: int = 0, failed: int = 0
+    ):
+        self.inserted = inserted
+        self.updated = updated
+        self.unchanged = unchanged
+        self.failed = failed
+
+    def __repr__(self):
+        return f"UpsertCounts: {self.to_dict()}"
+
+    def __eq__(self, other):
+        return isinstance(other, UpsertCounts) and self.to_dict() == other.to_dict()
+
+    def __add__(self, other: Union[UpsertCounts, int]) -> UpsertCounts:
+        if isinstance(other, int):  # supports sum()
+            return UpsertCounts(**self.to_dict())
+        return UpsertCounts(
+            inserted=self.inserted + other.inserted,
+            updated=self.updated + other.updated,
+            unchanged=self.unchanged + other.unchanged,
+            failed=self.failed + other.failed,
+        )
+
+    __radd__ = __add__
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.unchanged + self.failed
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+        }
+
+
+def estimate_width(column: Column) -> int:
+    """ Estimated bytes of a column's values """
+    for type_, width in TYPE_WIDTHS:
+        if isinstance(column.type, type_):
+            return width
+    length = getattr(column.type, "length", None)
+    return min(length, 64) if length else DEFAULT_WIDTH
+
+
+class BatchSizer:
+    """ Batch size of a model's bulk operations for one method and set of columns.
+
+        The initial size fills the target payload with rows of the estimated row
+        width, and is capped at MAX_BIND_PARAMS parameters per batch for methods
+        that bind every value of a batch in a single statement. As batches
+        complete, the size is scaled toward the one expected to execute in the
+        target latency, within 4x of the initial size. """
+
+    min_size: int = 10
+
+    def __init__(
+        self,
+        row_bytes: int,
+        ncols: int,
+        bind_params: bool = True,
+        target_bytes: int = None,
+        target_seconds: float = None,
+    ):
+        target_bytes = target_bytes or conf.DATABASE_BATCH_TARGET_BYTES
+        self.target_seconds = target_seconds or conf.DATABASE_BATCH_TARGET_SECONDS
+
+        initial = max(target_bytes // max(row_bytes, 1), 1)
+        self.max_size = initial * 4
+        if bind_params:
+            self.max_size = min(self.max_size, MAX_BIND_PARAMS // max(ncols, 1))
+        self.min_size = min(self.min_size, self.max_size)
+        self.initial_size = self.size = min(initial, self.max_size)
+
+    def __repr__(self):
+        return f"BatchSizer: {self.size} (initial={self.initial_size} max={self.max_size})"  # noqa
+
+    def observe(self, n: int, seconds: float) -> int:
+        """ Adapt the batch size from the latency of a batch of n rows """
+        if n < self.size // 4 or seconds <= 0:
+            return self.size  # fixed costs dominate small batches
+
+        projected = seconds / n * self.size
+        ratio = self.target_seconds / projected
+        if 0.8 < ratio < 1.25:
+            return self.size
+
+        factor = min(max(ratio, 0.5), 1.5)
+        self.size = min(max(int(self.size * factor), self.min_size), self.max_size)
+        return self.size
+
+
+class PreparedUpsert:
+    """ An upsert statement compiled once for a model, set of columns, and conflict
+        handling mode, and executed over batches of row tuples with executemany.
+        asyncpg caches the prepared statement on each pooled connection.
+
+        Columns with python-side defaults must be included in the column set, since
+        defaults aren't evaluated when the statement is executed. """
+
+    def __init__(self, model: BulkIOMixin, columns: List[str], **kwargs):
+        table = model.__table__
+        dialect = model.__metadata__.bind.dialect
+
+        self.model = model
+        self.columns = list(columns)
+
+        stmt = model.on_conflict(Insert(table), **kwargs)
+        compiled = stmt.compile(dialect=dialect, column_keys=self.columns)
+
+        missing = [x for x in compiled.positiontup if x not in self.columns]
+        if missing:  # python-side defaults, see BulkIOMixin.to_rows
+            raise ValueError(f"columns with defaults must be included: {missing}")
+
+        self.sql: str = compiled.string
+        self.positions: List[int] = [
+            self.columns.index(x) for x in compiled.positiontup
+        ]
+        self.processors: Dict[int, Callable] = {}
+        for idx in self.positions:
+            column_type = table.c[self.columns[idx]].type
+            processor = column_type.dialect_impl(dialect).bind_processor(dialect)
+            if processor:
+                self.processors[idx] = processor
+
+    def __repr__(self):
+        return f"PreparedUpsert: {self.model.__name__} ({len(self.columns)} columns)"
+
+    def args(self, rows: List[Tuple]) -> List[Tuple]:
+        """ Reorder and process row values into statement arguments """
+        procs = self.processors
+        return [
+            tuple(
+                procs[idx](row[idx]) if idx in procs else row[idx]
+                for idx in self.positions
+            )
+            for row in rows
+        ]
+
+    async def execute(self, rows: List[Tuple]) -> UpsertCounts:
+        """ Execute the statement over the rows in a transaction. Inserted and
+            updated rows are counted from the difference in the table's statistics
+            for the transaction, since executemany doesn't return results. """
+        table = self.model.__table__.fullname
+        async with pool.acquire(self.model.__metadata__.bind) as conn:
+            raw = conn.raw_connection
+            async with conn.transaction():
+                inserted, updated = await raw.fetchrow(XACT_COUNTS_SQL, table)
+                ts = timer()
+                await raw.executemany(self.sql, self.args(rows))
+                querylog.observe(
+                    self.sql,
+                    timer() - ts,
+                    many=True,
+                    model=self.model.__name__,
+                    operation="upsert",
+                )
+                inserted_after, updated_after = await raw.fetchrow(
+                    XACT_COUNTS_SQL, table
+                )
+
+        inserted = inserted_after - inserted
+        updated = updated_after - updated
+        return UpsertCounts(
+            inserted=inserted,
+            updated=updated,
+            unchanged=len(rows) - inserted - updated,
+        )
+
 
 class BulkIOMixin(object):
     @classmethod
@@ -38,19 +302,24 @@ class BulkIOMixin(object):
     @classmethod
     async def execute_statement(
         cls,
-        stmt,
-        records: List[Dict],
+        stmt: Union[PreparedUpsert, Any],
+        records: Union[List[Dict], List[Tuple]],
         op_name: str,
         retry_func: Optional[Callable] = None,
-    ) -> int:
+        batch_size: int = None,
+    ) -> UpsertCounts:
 
         try:
             n = len(records)
 
             ts = timer()
-            await stmt.gino.load(cls).all()
+            if isinstance(stmt, PreparedUpsert):
+                counts = await cls.retry_transient(lambda: stmt.execute(records))
+            else:
+                await cls.retry_transient(lambda: stmt.gino.load(cls).all())
+                counts = UpsertCounts(inserted=n)
             exc_time = round(timer() - ts, 2)
-            cls.log_operation(op_name, n, exc_time)
+            cls.log_operation(op_name, n, exc_time, batch_size=batch_size)
 
         except (IntegrityError, UniqueViolationError, DataError) as ie:
 
@@ -62,20 +331,30 @@ class BulkIOMixin(object):
                     second_n = len(second_half)
 
                     logger.info(
-                        f"{cls.log_prefix}: retrying with fractured records (first_half={first_n} second_half={second_n}) -- {ie}"  # noqa
+                        f"{cls.log_prefix(ie)}: retrying with fractured records (first_half={first_n} second_half={second_n}) -- {ie}"  # noqa
                     )
-                    await retry_func(first_half, batch_size=first_n // 4)
-                    await retry_func(second_half, batch_size=second_n // 4)
+                    retries = [
+                        retry_func(first_half, batch_size=first_n // 4),
+                        retry_func(second_half, batch_size=second_n // 4),
+                    ]
+                    if cls.shares_connection():
+                        counts = sum([await x for x in retries])
+                    else:  # the halves are bisected concurrently
+                        counts = sum(await asyncio.gather(*retries))
                 else:
                     record = util.reduce(records)
-                    record = {k: v for k, v in record.items() if k in cls.pk.names}
+                    if isinstance(stmt, PreparedUpsert):
+                        record = dict(zip(stmt.columns, record))
+                    primary_key = {k: v for k, v in record.items() if k in cls.pk.names}
 
                     # include primary key names/values in log message
                     # values can be scrubbed later, if needed
                     logger.error(
-                        f"{cls.log_prefix}: {ie} -- primary_key={record}",
-                        extra={"primary_key": record},
+                        f"{cls.log_prefix(ie)}: {ie} -- primary_key={primary_key}",
+                        extra={"primary_key": primary_key},
                     )
+                    await cls.capture_failed(record, ie)
+                    counts = UpsertCounts(failed=n)
 
             else:  # fail whole batch
                 log_records: str = ""
@@ -84,7 +363,7 @@ class BulkIOMixin(object):
                 if conf.DEBUG:
                     log_records = f"\n{util.jsontools.to_string(records)}\n"
 
-                logger.error(f"{cls.log_prefix}:  {ie} -- {log_records}",)
+                logger.error(f"{cls.log_prefix(ie)}:  {ie} -- {log_records}",)
                 raise ie
 
         except Exception as e:
@@ -94,96 +373,507 @@ class BulkIOMixin(object):
             if conf.DEBUG:
                 log_records = f"\n{util.jsontools.to_string(records)}\n"
 
-            logger.exception(f"{cls.log_prefix}: {e} -- {e.args} {log_records}")
+            logger.exception(f"{cls.log_prefix(e)}: {e} -- {e.args} {log_records}")
             raise e
 
-        return n
+        return counts
 
     @classmethod
-    async def bulk_upsert(
+    async def retry_transient(cls, func: Callable[[], Awaitable]) -> Any:
+        """ Await func(), calling it again after a deadlock or serialization
+            failure, with exponential backoff and full jitter so that the workers
+            involved don't collide again. Gives up after DATABASE_MAX_RETRIES. """
+        attempt = 0
+        while True:
+            try:
+                return await func()
+            except TRANSIENT_ERRORS as e:
+                if attempt >= conf.DATABASE_MAX_RETRIES:
+                    raise e
+                delay = random.uniform(0, conf.DATABASE_RETRY_BACKOFF * 2 ** attempt)
+                attempt += 1
+                logger.warning(
+                    f"{cls.log_prefix(e)}: retrying in {round(delay, 3)}s (attempt {attempt}) -- {e}",  # noqa
+                    extra={"tablename": cls.__table__.name, "attempt": attempt},
+                )
+                await asyncio.sleep(delay)
+
+    @classmethod
+    def shares_connection(cls) -> bool:
+        """ Whether statements run on a connection held by the current context,
+            e.g. inside db.transaction(). Statements can't run concurrently on a
+            single connection, so bulk operations run their batches in sequence. """
+        return cls.__metadata__.bind.current_connection is not None
+
+    @classmethod
+    async def capture_failed(cls, record: Dict, error: Exception):
+        """ Write a record rejected by an upsert to the dead letter table for later
+            reprocessing. A failure to capture the record is logged rather than
+            raised, so it doesn't interrupt the remaining batches. """
+        from db.models import DeadLetter
+
+        payload = util.jsontools.to_string(record, pretty=False)
+        payload = json.loads(payload)  # coerce dates, shapes, etc.
+        try:
+            await DeadLetter.create(
+                model_name=cls.__name__,
+                table_name=cls.__table__.name,
+                primary_key={k: v for k, v in payload.items() if k in cls.pk.names},
+                error_type=error.__class__.__name__,
+                error=str(error),
+                payload=payload,
+            )
+        except Exception as e:
+            logger.warning(f"{cls.log_prefix(e)}: failed to capture record -- {e}")
+
+    @classmethod
+    def on_conflict(
         cls,
-        records: List[Dict],
-        batch_size: int = 500,
+        stmt: Insert,
         exclude_cols: list = None,
         update_on_conflict: bool = True,
         ignore_on_conflict: bool = False,
         conflict_constraint: Union[str, Constraint] = None,
-        concurrency: int = 50,
-        errors: str = "fractionalize",
-    ) -> int:
-        batch_size = batch_size or len(records)
+        skip_unchanged: bool = False,
+    ) -> Insert:
+        """ Add the conflict handling clause to an insert statement.
+
+            With skip_unchanged, a conflicting row is only updated when at least one
+            of the updated columns (other than the audit columns) IS DISTINCT FROM
+            the proposed value, so unchanged rows aren't rewritten. """
         exclude_cols = exclude_cols or []
         conflict_constraint = conflict_constraint or cls.__table__.primary_key
-        coros: List[Coroutine] = []
 
-        for idx, chunk in enumerate(util.chunks(records, batch_size)):
-            op_name = "bulk_upsert"
-            chunk = list(chunk)
-            stmt = Insert(cls).values(chunk)
+        if ignore_on_conflict:
+            stmt = stmt.on_conflict_do_nothing(constraint=conflict_constraint)
 
+        elif update_on_conflict:
             # update these columns when a conflict is encountered
-            if ignore_on_conflict:
-                stmt = stmt.on_conflict_do_nothing(constraint=conflict_constraint)
-
-            elif update_on_conflict:
-                on_conflict_update_cols = [
-                    c.name
-                    for c in cls.columns
-                    if c not in cls.pk and c.name not in exclude_cols
-                ]
-                stmt = stmt.on_conflict_do_update(
-                    constraint=conflict_constraint,
-                    set_={
-                        k: getattr(stmt.excluded, k) for k in on_conflict_update_cols
-                    },
+            on_conflict_update_cols = [
+                c.name
+                for c in cls.columns
+                if c not in cls.pk and c.name not in exclude_cols
+            ]
+            compare_cols = [
+                x for x in on_conflict_update_cols if x not in AUDIT_COLUMNS
+            ]
+            where = None
+            if skip_unchanged and compare_cols:
+                table = cls.__table__
+                where = sa.tuple_(*[table.c[k] for k in compare_cols]).is_distinct_from(
+                    sa.tuple_(*[getattr(stmt.excluded, k) for k in compare_cols])
                 )
+            stmt = stmt.on_conflict_do_update(
+                constraint=conflict_constraint,
+                set_={k: getattr(stmt.excluded, k) for k in on_conflict_update_cols},
+                where=where,
+            )
+
+        return stmt
+
+    @classmethod
+    def conflict_key(
+        cls,
+        exclude_cols: list = None,
+        update_on_conflict: bool = True,
+        ignore_on_conflict: bool = False,
+        conflict_constraint: Union[str, Constraint] = None,
+        skip_unchanged: bool = False,
+    ) -> Tuple:
+        """ Hashable identity of a conflict handling mode, used to cache compiled
+            statements """
+        if conflict_constraint is not None and not isinstance(conflict_constraint, str):
+            conflict_constraint = conflict_constraint.name or id(conflict_constraint)
+        return (
+            tuple(sorted(exclude_cols or [])),
+            bool(update_on_conflict),
+            bool(ignore_on_conflict),
+            conflict_constraint,
+            bool(skip_unchanged),
+        )
+
+    @classmethod
+    def prepare_upsert(cls, columns: List[str], **kwargs) -> PreparedUpsert:
+        """ Get the upsert statement for a set of columns and conflict handling
+            mode, compiling it on first use """
+        key = (cls, "upsert", tuple(columns), cls.conflict_key(**kwargs))
+        if key not in _statement_cache:
+            _statement_cache[key] = PreparedUpsert(cls, columns, **kwargs)
+        return _statement_cache[key]
+
+    @classmethod
+    def prepare_merge(cls, staging_name: str, **kwargs) -> str:
+        """ Get the statement merging a staging table into the model's table for a
+            conflict handling mode, compiling it on first use. The statement
+            returns the number of inserted and updated rows. """
+        key = (cls, "merge", staging_name, cls.conflict_key(**kwargs))
+        if key not in _statement_cache:
+            names = cls.columns.names
+            staging = sa.table(staging_name, *[sa.column(x) for x in names])
+            # rows are merged in primary key order (see bulk_upsert)
+            select = sa.select([staging.c[x] for x in names]).order_by(
+                *[staging.c[x] for x in cls.pk.names]
+            )
+            stmt = Insert(cls.__table__).from_select(names, select)
+            stmt = cls.on_conflict(stmt, **kwargs).returning(
+                sa.literal_column("xmax = 0").label("inserted")
+            )
+            sql = str(stmt.compile(dialect=cls.__metadata__.bind.dialect))
+
+            # rows skipped by the conflict clause aren't returned
+            merge = f"WITH merged AS ({sql}) SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged"  # noqa
+            _statement_cache[key] = merge
+        return _statement_cache[key]
+
+    @classmethod
+    def to_rows(
+        cls, records: Union[List[Dict], List[Tuple]], columns: List[str] = None
+    ) -> Tuple[List[str], List[Tuple]]:
+        """ Normalize records to tuples of values in the order of the returned
+            column names, evaluating python-side column defaults for the model's
+            columns that are missing from the records.
+
+            Records are either dicts or, when columns is given, tuples of values
+            in the order of columns. """
+
+        if columns:
+            names = list(columns)
+            rows = records
+        elif records:
+            names = [x for x in cls.columns.names if x in records[0]]
+            rows = [tuple(r.get(name) for name in names) for r in records]
+        else:
+            return [], []
+
+        defaults: Dict[str, Any] = {}
+        for c in cls.columns:
+            if c.name not in names and c.default is not None:
+                if c.default.is_scalar:
+                    defaults[c.name] = c.default.arg
+                elif c.default.is_callable:
+                    defaults[c.name] = c.default.arg(None)
 
-            if errors == "fractionalize":
-                partial = functools.partial(
-                    cls.bulk_upsert,
-                    exclude_cols=exclude_cols,
-                    update_on_conflict=update_on_conflict,
-                    ignore_on_conflict=ignore_on_conflict,
-                    concurrency=concurrency,
+        if defaults:
+            names += list(defaults)
+            default_values = tuple(defaults.values())
+            rows = [tuple(row) + default_values for row in rows]
+
+        return names, rows
+
+    @classmethod
+    def sort_rows(cls, columns: List[str], rows: List[Tuple]) -> List[Tuple]:
+        """ Sort rows by primary key, so that concurrent upserts of overlapping
+            keys lock rows in the same order instead of deadlocking. Rows are
+            returned as is if the primary key isn't among the columns. """
+        if not all(x in columns for x in cls.pk.names):
+            return rows
+        positions = [columns.index(x) for x in cls.pk.names]
+
+        def key(row: Tuple) -> Tuple:  # nulls last
+            values = [row[idx] for idx in positions]
+            return tuple((v is None, 0 if v is None else v) for v in values)
+
+        return sorted(rows, key=key)
+
+    @classmethod
+    async def bulk_upsert(
+        cls,
+        records: Union[List[Dict], List[Tuple]],
+        batch_size: int = None,
+        exclude_cols: list = None,
+        update_on_conflict: bool = True,
+        ignore_on_conflict: bool = False,
+        conflict_constraint: Union[str, Constraint] = None,
+        concurrency: int = None,
+        errors: str = "fractionalize",
+        method: Union[UpsertMethod, str] = UpsertMethod.VALUES,
+        columns: List[str] = None,
+        skip_unchanged: bool = False,
+        return_counts: bool = False,
+    ) -> Union[int, UpsertCounts]:
+        """ Insert or update records in batches.
+
+            Records are either dicts or, when columns is given, tuples of values
+            in the order of columns. Returns the number of records processed, or
+            UpsertCounts when return_counts is set.
+
+            Without a batch_size, batches are sized by the model's BatchSizer for
+            the method and columns, and each round of concurrent batches uses the
+            size adapted from the previous rounds. A batch_size of 0 upserts the
+            records in a single batch. Up to concurrency batches (by default, and
+            at most, the connection pool's max size) run at once.
+
+            With errors="fractionalize", a failed batch is bisected, retrying its
+            halves concurrently until the failing records are isolated. Those are
+            counted as failed and written to the dead letter table. """
+        method = UpsertMethod(method)
+        conflict_kwargs = dict(
+            exclude_cols=exclude_cols,
+            update_on_conflict=update_on_conflict,
+            ignore_on_conflict=ignore_on_conflict,
+            conflict_constraint=conflict_constraint,
+            skip_unchanged=skip_unchanged,
+        )
+        columns, rows = cls.to_rows(records, columns=columns)
+        rows = cls.sort_rows(columns, rows)
+
+        # batches beyond the pool's capacity would only wait for a connection
+        capacity = pool.capacity(cls.__metadata__.bind)
+        concurrency = min(concurrency or capacity, capacity)
+        if cls.shares_connection():
+            concurrency = 1
+
+        sizer: Optional[BatchSizer] = None
+        if batch_size is None:
+            sizer = cls.batch_sizer(method.value, columns)
+        elif batch_size == 0:
+            batch_size = len(rows)
+
+        if errors == "fractionalize":
+            partial = functools.partial(
+                cls.bulk_upsert,
+                columns=columns,
+                concurrency=concurrency,
+                return_counts=True,
+                **conflict_kwargs,
+            )
+        elif errors == "raise":
+            partial = None
+        else:
+            raise ValueError(
+                "Invalid value for 'errors': must be one of [fractionalize, raise]"
+            )
+
+        async def run(chunk: List[Tuple], size: int) -> UpsertCounts:
+            ts = timer()
+            if method == UpsertMethod.COPY:
+                counts = await cls.copy_upsert(
+                    chunk,
+                    columns=columns,
+                    retry_func=partial,
+                    batch_size=size,
+                    **conflict_kwargs,
                 )
-            elif errors == "raise":  # placeholder for later
-                partial = None
-                # TODO: Log failed table_name and primary keys and capture for later reprocessing (no mechanism for this exists yet) # noqa
             else:
-                raise ValueError(
-                    "Invalid value for 'errors': must be one of [fractionalize, raise]"
+                counts = await cls.execute_statement(
+                    cls.prepare_upsert(columns, **conflict_kwargs),
+                    records=chunk,
+                    op_name="bulk_upsert",
+                    retry_func=partial,
+                    batch_size=size,
                 )
+            if sizer:
+                sizer.observe(len(chunk), timer() - ts)
+            return counts
+
+        result = UpsertCounts()
+        offset = 0
+        while offset < len(rows):
+            size = sizer.size if sizer else batch_size
+            coros: List[Coroutine] = []
+            for _ in range(concurrency):
+                chunk = list(rows[offset : offset + size])
+                if not chunk:
+                    break
+                offset += size
+                coros.append(run(chunk, size))
+            result += sum(await asyncio.gather(*coros))
+
+        if return_counts:
+            return result
+        return result.total
+
+    @classmethod
+    def copy_encoder(cls, column: Column) -> Optional[Callable[[Any], Any]]:
+        """ Get the function used to encode a column's values for COPY, for column
+            types that asyncpg can't encode in binary format as they are """
 
-            coros.append(
-                cls.execute_statement(
-                    stmt, records=chunk, op_name=op_name, retry_func=partial
+        if isinstance(column.type, Geometry):
+            # staged as hex-encoded EWKB text and cast to geometry on insert
+
+            def encode_geometry(value: Any) -> Optional[str]:
+                if value is None:
+                    return None
+                value = util.geo.shape_to_wkb(value, srid=column.type.srid)
+                srid = f"SRID={value.srid};" if value.srid > 0 else ""
+                return f"{srid}{value.desc}"
+
+            return encode_geometry
+
+        elif isinstance(column.type, sa.JSON):
+
+            def encode_json(value: Any) -> Optional[str]:
+                if value is None or isinstance(value, str):
+                    return value
+                return util.jsontools.to_string(value, pretty=False)
+
+            return encode_json
+
+        return None
+
+    @classmethod
+    async def copy_upsert(
+        cls,
+        records: Union[List[Dict], List[Tuple]],
+        columns: List[str] = None,
+        retry_func: Optional[Callable] = None,
+        batch_size: int = None,
+        **kwargs,
+    ) -> UpsertCounts:
+        """ Upsert a batch of records by streaming them into a temporary staging
+            table with COPY, then merging the staging table into the model's table
+            with a single INSERT ... SELECT ... ON CONFLICT statement.
+
+            Columns missing from the records take the column's python-side default
+            or the table's server default, the same as in a VALUES insert. On a
+            data, encoding, or integrity error the batch is retried through the
+            VALUES path using retry_func.
+
+            Records are either dicts or, when columns is given, tuples of values
+            in the order of columns. """
+
+        n = len(records)
+        if n == 0:
+            return UpsertCounts()
+
+        table = cls.__table__
+        names, rows = cls.to_rows(records, columns=columns)
+
+        copy_columns = [table.c[name] for name in names]
+        encoders = {
+            idx: enc
+            for idx, enc in enumerate(cls.copy_encoder(c) for c in copy_columns)
+            if enc
+        }
+        if encoders:
+            rows = [
+                tuple(
+                    encoders[idx](v) if idx in encoders else v
+                    for idx, v in enumerate(row)
                 )
-            )
+                for row in rows
+            ]
+
+        staging_name = f"_staging_{table.name}"[:63]
+        merge = cls.prepare_merge(staging_name, **kwargs)
 
-        result: int = 0
-        for idx, chunk in enumerate(util.chunks(coros, concurrency)):
-            result += sum(await asyncio.gather(*chunk))
+        async def copy_merge() -> Tuple[int, int]:
+            async with pool.acquire(cls.__metadata__.bind) as conn:
+                async with conn.transaction():
+                    raw = conn.raw_connection
+                    await raw.execute(
+                        f'CREATE TEMPORARY TABLE "{staging_name}" (LIKE {table.fullname} INCLUDING DEFAULTS) ON COMMIT DROP'  # noqa
+                    )
+                    for col in copy_columns:
+                        if isinstance(col.type, Geometry):
+                            await raw.execute(
+                                f'ALTER TABLE "{staging_name}" ALTER COLUMN "{col.name}" TYPE text'  # noqa
+                            )
+                    await raw.copy_records_to_table(
+                        staging_name, records=rows, columns=names
+                    )
+                    ts = timer()
+                    counts = await raw.fetchrow(merge)
+                    querylog.observe(
+                        merge, timer() - ts, model=cls.__name__, operation="merge"
+                    )
+                    # dropped now in case this is a savepoint in a longer transaction
+                    await raw.execute(f'DROP TABLE "{staging_name}"')
+            return counts
 
-        return result
+        try:
+            ts = timer()
+            inserted, updated = await cls.retry_transient(copy_merge)
+            exc_time = round(timer() - ts, 2)
+            cls.log_operation("copy_upsert", n, exc_time, batch_size=batch_size)
+
+        except (
+            IntegrityError,
+            UniqueViolationError,
+            DataError,
+            TypeError,  # raised by asyncpg when a value can't be encoded for COPY
+            ValueError,
+        ) as ie:
+            if retry_func:
+                logger.info(
+                    f"{cls.log_prefix(ie)}: retrying {n} records with values upsert -- {ie}"  # noqa
+                )
+                return await retry_func(records, batch_size=max(n // 4, 1))
+
+            log_records: str = ""
+            if conf.DEBUG:
+                log_records = f"\n{util.jsontools.to_string(records)}\n"
+
+            logger.error(f"{cls.log_prefix(ie)}: {ie} -- {log_records}")
+            raise ie
+
+        except Exception as e:
+            log_records = ""
+            if conf.DEBUG:
+                log_records = f"\n{util.jsontools.to_string(records)}\n"
+
+            logger.exception(f"{cls.log_prefix(e)}: {e} -- {e.args} {log_records}")
+            raise e
+
+        return UpsertCounts(
+            inserted=inserted, updated=updated, unchanged=n - inserted - updated
+        )
 
     @classmethod
-    async def bulk_insert(cls, records: List[Dict], batch_size: int = 100) -> int:
+    async def bulk_insert(cls, records: List[Dict], batch_size: int = None) -> int:
+        """ Insert records with multi-row VALUES statements. Without a batch_size,
+            batches are sized by the model's BatchSizer for inserts. """
 
         affected: int = 0
-        batch_size = batch_size or len(records)
+        if not records:
+            return affected
+
+        sizer: Optional[BatchSizer] = None
+        if batch_size is None:
+            sizer = cls.batch_sizer("insert", list(records[0]))
+        elif batch_size == 0:
+            batch_size = len(records)
+
+        offset = 0
+        while offset < len(records):
+            size = sizer.size if sizer else batch_size
+            chunk = records[offset : offset + size]
+            offset += size
+            n = len(chunk)
 
-        for chunk in util.chunks(records, batch_size):
             ts = timer()
             stmt = Insert(cls).values(chunk)
-            exc_time = round(timer() - ts, 2)
-            n = len(chunk)
             await stmt.gino.load(cls).all()
-            cls.log_operation("insert", n, exc_time)
+            exc_time = round(timer() - ts, 2)
+            if sizer:
+                sizer.observe(n, exc_time)
+            cls.log_operation("insert", n, exc_time, batch_size=size)
             affected += n
         return affected
 
     @classmethod
-    def log_operation(cls, method: str, n: int, exc_time: float):
+    def batch_sizer(cls, method: str, columns: List[str]) -> BatchSizer:
+        """ Get the batch sizer of a method and set of columns, creating it on
+            first use. Only bulk_insert's multi-row INSERT binds every value of a
+            batch in one statement: the values upsert executes a one-row statement
+            per row and COPY binds nothing, so their batches are only limited by
+            payload size and latency. """
+        key = (cls, method, tuple(columns))
+        if key not in _batch_sizers:
+            table = cls.__table__
+            row_bytes = sum(
+                estimate_width(table.c[x]) if x in table.c else DEFAULT_WIDTH
+                for x in columns
+            )
+            _batch_sizers[key] = BatchSizer(
+                row_bytes=row_bytes, ncols=len(columns), bind_params=method == "insert",
+            )
+        return _batch_sizers[key]
+
+    @classmethod
+    def log_operation(
+        cls, method: str, n: int, exc_time: float, batch_size: int = None
+    ):
         method = method.lower()
 
         measurements = {
@@ -192,6 +882,9 @@ class BulkIOMixin(object):
             f"{method}_time": exc_time,
         }
 
+        if batch_size:
+            measurements[f"{method}_batch_size"] = batch_size
+
         if n > 0:
             measurements[f"{method}s"] = n
 
@@ -205,13 +898,108 @@ class BulkIOMixin(object):
 
 class DataFrameMixin(BulkIOMixin):
     @classmethod
-    async def df(cls, create_index: bool = True) -> pd.DataFrame:
-        records = await cls.query.gino.all()
-        df = pd.DataFrame([x.to_dict() for x in records], columns=cls.c.names)
-        if create_index:
-            df = df.set_index(cls.pk.names)
+    async def df(cls, create_index: bool = True, **kwargs) -> pd.DataFrame:
+        """ Read the table into a DataFrame. Accepts the arguments of iter_df. """
+        frames = [x async for x in cls.iter_df(create_index=create_index, **kwargs)]
+        if frames:
+            return pd.concat(frames, ignore_index=not create_index)
+
+        df = pd.DataFrame(
+            columns=cls._read_columns(kwargs.get("columns"), create_index)
+        )
+        return df.set_index(cls.pk.names) if create_index else df
 
-        return df
+    @classmethod
+    def _read_columns(
+        cls, columns: Optional[List[str]], create_index: bool
+    ) -> List[str]:
+        names = list(columns or cls.c.names)
+        if create_index:  # the primary key is always read when indexing
+            names = [x for x in cls.pk.names if x not in names] + names
+        return names
+
+    @classmethod
+    async def iter_rows(
+        cls, stmt: sa.sql.Select, chunk_size: int = 10000
+    ) -> AsyncIterator[List[Tuple]]:
+        """ Stream the rows of a select statement through a server-side cursor,
+            yielding batches of up to chunk_size rows. Rows are tuples in the
+            order of the statement's columns, with the result processing of the
+            column types applied.
+
+            The cursor's connection is held until the iteration completes.
+        """
+        dialect = cls.__metadata__.bind.dialect
+
+        compiled = stmt.compile(dialect=dialect)
+        params = compiled.construct_params()
+        args = [params[x] for x in compiled.positiontup]
+
+        processors: Dict[int, Callable] = {}
+        for idx, column in enumerate(stmt.columns):
+            column_type = column.type.dialect_impl(dialect)
+            processor = column_type.result_processor(dialect, None)
+            if processor:
+                processors[idx] = processor
+
+        async with pool.acquire(cls.__metadata__.bind) as conn:
+            async with conn.transaction():  # cursors only exist in a transaction
+                cursor = await conn.raw_connection.cursor(compiled.string, *args)
+                while True:
+                    records = await cursor.fetch(chunk_size)
+                    if not records:
+                        break
+
+                    if processors:
+                        rows = []
+                        for r in records:
+                            row = list(r)
+                            for idx, processor in processors.items():
+                                row[idx] = processor(row[idx])
+                            rows.append(tuple(row))
+                    else:
+                        rows = [tuple(r) for r in records]
+
+                    logger.debug(f"({cls.__name__}) read {len(rows)} records")
+                    yield rows
+
+    @classmethod
+    async def iter_df(
+        cls,
+        columns: List[str] = None,
+        where: Any = None,
+        order_by: List[str] = None,
+        chunk_size: int = 10000,
+        create_index: bool = True,
+    ) -> AsyncIterator[pd.DataFrame]:
+        """ Stream the table's rows through a server-side cursor, yielding frames
+            of up to chunk_size rows. Records are read straight into each frame,
+            without loading model instances.
+
+            Arguments:
+                columns: column names to read; defaults to all columns
+                where: sqlalchemy expression used to filter the rows
+                order_by: column names to sort the rows by
+                chunk_size: maximum number of rows in each frame
+                create_index: index each frame by the primary key, which is read
+                    even if missing from columns
+
+            The cursor's connection is held until the iteration completes.
+        """
+        table = cls.__table__
+        names = cls._read_columns(columns, create_index)
+
+        stmt = sa.select([table.c[x] for x in names])
+        if where is not None:
+            stmt = stmt.where(where)
+        if order_by:
+            stmt = stmt.order_by(*[table.c[x] for x in order_by])
+
+        async for rows in cls.iter_rows(stmt, chunk_size=chunk_size):
+            df = pd.DataFrame(rows, columns=names)
+            if create_index:
+                df = df.set_index(cls.pk.names)
+            yield df
 
     @classmethod
     def _prepare(cls, df: pd.DataFrame, reset_index: bool) -> List[Dict]:
@@ -240,16 +1028,205 @@ class DataFrameMixin(BulkIOMixin):
 
         return df.to_dict(orient="records")
 
+    @staticmethod
+    def _to_pylist(values: pd.Series, pytype: type) -> List[Any]:
+        """ Convert a column to a list of python values of the given type, with
+            missing and infinite values as None """
+
+        dtype = values.dtype
+        if dtype == object and pytype in (int, float):
+            # mixed numbers and missing values; left as is if not numeric
+            converted = pd.to_numeric(values, errors="ignore")
+            if is_numeric_dtype(converted.dtype):
+                values, dtype = converted, converted.dtype
+
+        if is_datetime64_any_dtype(dtype):
+            mask = values.isna().to_numpy()
+            if pytype is date:
+                out = values.dt.date.to_numpy(dtype=object)
+            else:
+                out = values.dt.to_pydatetime()
+
+        elif is_float_dtype(dtype):
+            arr = values.to_numpy(dtype="float64", na_value=np.nan)
+            mask = ~np.isfinite(arr)
+            if pytype is int:
+                finite = arr[~mask]
+                if (finite != np.floor(finite)).any():
+                    # asyncpg truncates floats bound to integer columns, so these
+                    # must be split off beforehand (see non_integral_rows)
+                    raise ValueError(
+                        f"non-integral values for integer column {values.name}"
+                    )
+                out = np.where(mask, 0, arr).astype(np.int64).astype(object)
+            else:
+                out = arr.astype(object)
+
+        elif is_integer_dtype(dtype) or is_bool_dtype(dtype):
+            mask = values.isna().to_numpy()  # only nullable dtypes hold missing values
+            out = values.to_numpy(dtype=object)
+
+        else:
+            out = values.to_numpy(dtype=object, copy=True)
+            mask = pd.isna(out)
+
+        if mask.any():
+            out[mask] = None
+        return out.tolist()
+
+    @classmethod
+    def non_integral_rows(cls, df: pd.DataFrame) -> Tuple[np.ndarray, List[str]]:
+        """ Find the rows of a frame holding non-integral numbers in any of the
+            model's integer columns. Returns a boolean mask of the rows and the
+            names of the offending columns. """
+        pytypes = cls.columns.pytypes
+        mask = np.zeros(df.shape[0], dtype=bool)
+        names: List[str] = []
+        for name in cls.columns.names:
+            if name not in df.columns or pytypes[name] is not int:
+                continue
+
+            values = df[name]
+            if values.dtype == object:
+                values = pd.to_numeric(values, errors="coerce")
+            if not is_float_dtype(values.dtype):
+                continue
+
+            arr = values.to_numpy(dtype="float64", na_value=np.nan)
+            invalid = np.isfinite(arr) & (arr != np.floor(arr))
+            if invalid.any():
+                mask |= invalid
+                names.append(name)
+        return mask, names
+
+    @classmethod
+    def _prepare_rows(
+        cls, df: pd.DataFrame, reset_index: bool
+    ) -> Tuple[List[str], List[Tuple]]:
+        """ Columnar alternative to _prepare. Returns the names of the model's
+            columns present in the frame, in table order, and a tuple of values
+            per row in that order. Frame columns that aren't in the table are
+            ignored. """
+
+        if reset_index:
+            df = df.reset_index()
+
+        # drop rows with any missing primary keys
+        pk_names = [x for x in cls.pk.names if x in df.columns]
+        if pk_names:
+            missing = df[pk_names].isna().any(axis=1).to_numpy()
+            if missing.any():
+                df = df.loc[~missing]
+                logger.info(
+                    f"({cls.__name__}) Dropped {missing.sum()} records with missing primary keys"  # noqa
+                )
+
+        pytypes = cls.columns.pytypes
+        names = [x for x in cls.columns.names if x in df.columns]
+        values = [cls._to_pylist(df[name], pytypes[name]) for name in names]
+        return names, list(zip(*values))
+
+    @classmethod
+    def hash_rows(cls, df: pd.DataFrame) -> pd.Series:
+        """ Content hash of each row of a frame over the model's columns, excluding
+            the audit columns """
+        names = [
+            x
+            for x in cls.columns.names
+            if x in df.columns and x not in AUDIT_COLUMNS and x != ROW_HASH_COLUMN
+        ]
+        hashes = pd.util.hash_pandas_object(df[names], index=False)
+        return pd.Series(hashes.to_numpy().view(np.int64), index=df.index)
+
+    @classmethod
+    async def get_row_hashes(cls, df: pd.DataFrame, chunk_size: int = 5000):
+        """ Fetch the stored primary keys and row hashes of the rows sharing the
+            first primary key column's values with the frame """
+        pk_names = cls.pk.names
+        first = cls.pk.columns[0]
+        keys = df[first.name].dropna().unique().tolist()
+
+        records: List[Tuple] = []
+        for chunk in util.chunks(keys, chunk_size):
+            stmt = cls.select(*pk_names, ROW_HASH_COLUMN).where(first.in_(chunk))
+            records += [tuple(x) for x in await stmt.gino.all()]
+
+        stored = pd.DataFrame(records, columns=[*pk_names, ROW_HASH_COLUMN])
+        return stored.dropna(subset=[ROW_HASH_COLUMN])
+
+    @classmethod
+    async def drop_unchanged(cls, df: pd.DataFrame) -> pd.DataFrame:
+        """ Drop the rows of a frame whose primary key and row hash match a stored
+            row. The frame must have the primary key and row hashes as columns. """
+        stored = await cls.get_row_hashes(df)
+        if stored.empty:
+            return df
+
+        names = [*cls.pk.names, ROW_HASH_COLUMN]
+        stored = stored.astype({ROW_HASH_COLUMN: np.int64})
+        for name in cls.pk.names:
+            if is_datetime64_any_dtype(df[name].dtype):
+                stored[name] = pd.to_datetime(stored[name])
+
+        current = pd.MultiIndex.from_frame(df[names])
+        unchanged = current.isin(pd.MultiIndex.from_frame(stored[names]))
+        return df.loc[~unchanged]
+
     @classmethod
     async def bulk_upsert(
-        cls, df: Union[pd.DataFrame, List[Dict]], reset_index: bool = True, **kwargs
-    ) -> int:
-        records: List[Dict] = []
-        if isinstance(df, pd.DataFrame):
-            records = cls._prepare(df=df, reset_index=reset_index)
-        else:
-            records = df
-        return await super().bulk_upsert(records, **kwargs)
+        cls,
+        df: Union[pd.DataFrame, List[Dict]],
+        reset_index: bool = True,
+        delta: bool = False,
+        **kwargs,
+    ) -> Union[int, UpsertCounts]:
+        """ Upsert a frame or list of records. For models that store row hashes,
+            the hash of each row in a frame is computed and, with delta enabled,
+            rows that are unchanged since they were stored are not sent. """
+        if not isinstance(df, pd.DataFrame):
+            return await super().bulk_upsert(df, **kwargs)
+
+        skipped = 0
+        if ROW_HASH_COLUMN in cls.columns.names:
+            if reset_index:
+                df = df.reset_index()
+                reset_index = False
+            df = df.assign(**{ROW_HASH_COLUMN: cls.hash_rows(df)})
+
+            if delta:
+                n = df.shape[0]
+                df = await cls.drop_unchanged(df)
+                skipped = n - df.shape[0]
+                logger.debug(f"({cls.__name__}) skipping {skipped} unchanged records")
+
+        if reset_index:
+            df = df.reset_index()
+            reset_index = False
+
+        # asyncpg would silently truncate these rather than reject them
+        failed = 0
+        invalid, names = cls.non_integral_rows(df)
+        if invalid.any():
+            error = DataError(f"non-integral values for integer columns {names}")
+            if kwargs.get("errors", "fractionalize") == "raise":
+                raise error
+
+            for record in cls._prepare(df.loc[invalid], reset_index=False):
+                primary_key = {k: v for k, v in record.items() if k in cls.pk.names}
+                logger.error(
+                    f"{cls.log_prefix(error)}: {error} -- primary_key={primary_key}",
+                    extra={"primary_key": primary_key},
+                )
+                await cls.capture_failed(record, error)
+                failed += 1
+            df = df.loc[~invalid]
+
+        columns, rows = cls._prepare_rows(df=df, reset_index=reset_index)
+        result = await super().bulk_upsert(rows, columns=columns, **kwargs)
+
+        if isinstance(result, UpsertCounts):
+            return result + UpsertCounts(unchanged=skipped, failed=failed)
+        return result + skipped + failed
 
     @classmethod
     async def bulk_insert(
@@ -1,8 +1,10 @@
 # flake8: noqa
 from db.models.areas import *
 from db.models.bases import Base as Model
+from db.models.dead_letters import *
 from db.models.known_entities import *
 from db.models.prod import *
 from db.models.providers import *
 from db.models.runtime_stats import *
+from db.models.summary import *
 from db.models.wells import *
@@ -76,11 +76,9 @@ class Area(Base):
         return area_obj, attr, is_ready, cooldown
 
     @classmethod
-    async def df(cls) -> pd.DataFrame:
-        records = await cls.query.gino.all()
-        return pd.DataFrame(
-            [x.to_dict() for x in records], columns=cls.c.names
-        ).set_index("area")
+    async def df(cls, **kwargs) -> pd.DataFrame:
+        df = await super().df(create_index=False, **kwargs)
+        return df.set_index("area")
 
 
 if __name__ == "__main__":
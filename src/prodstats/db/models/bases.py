@@ -105,7 +105,10 @@ class ColumnProxy:
     def pytypes(self) -> Dict[str, Any]:
         dtypes = {}
         for col in self.columns:
-            dtypes[col.name] = col.type.python_type
+            try:
+                dtypes[col.name] = col.type.python_type
+            except NotImplementedError:  # e.g. geometry types
+                dtypes[col.name] = object
 
         return dtypes
 
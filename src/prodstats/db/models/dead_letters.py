@@ -0,0 +1,17 @@
+from db.models.bases import Base, db
+
+__all__ = ["DeadLetter"]
+
+
+class DeadLetter(Base):
+    """ Records rejected by a bulk upsert, captured for later reprocessing """
+
+    __tablename__ = "dead_letters"
+
+    id = db.Column(db.BigInteger(), primary_key=True)
+    model_name = db.Column(db.String(100), nullable=False, index=True)
+    table_name = db.Column(db.String(63), nullable=False)
+    primary_key = db.Column(db.JSONB(), nullable=False, server_default="{}")
+    error_type = db.Column(db.String(100))
+    error = db.Column(db.Text())
+    payload = db.Column(db.JSONB(), nullable=False, server_default="{}")
@@ -1,6 +1,65 @@
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, List, Union
+
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Select
+
+from db.mixins import UpsertCounts
 from db.models.bases import Base, db
+from db.partitions import hash_partitioned
+from util.deco import classproperty
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "ProdMonthly",
+    "ProdStat",
+    "ProdStatDefinition",
+    "ProdHeader",
+    "PRODSTATS_VIEW",
+    "MONTHLY_VIEW",
+]
+
+PROD_COLUMNS: List[str] = ["oil", "gas", "water", "boe"]
+
+# lateral lengths that monthly volumes are normalized to, by column suffix
+LATERAL_NORMS: Dict[str, int] = {
+    "1k": 1000,
+    "3k": 3000,
+    "5k": 5000,
+    "7500": 7500,
+    "10k": 10000,
+}
+
 
-__all__ = ["ProdMonthly", "ProdStat", "ProdHeader"]
+async def select_df(stmt: Select, index: List[str], where: Any = None) -> pd.DataFrame:
+    """ Read the rows of a select statement into a frame """
+    if where is not None:
+        stmt = stmt.where(where)
+    records = await stmt.gino.all()
+    columns = [x.name for x in stmt.c]
+    return pd.DataFrame([tuple(r) for r in records], columns=columns).set_index(index)
+
+
+def any_of(column: Any, values: Iterable) -> Any:
+    """ column = ANY(values), with the values bound as a single array parameter,
+        so lists of thousands of values don't expand into a parameter each """
+    values = list(values)
+    return column == sa.any_(
+        sa.bindparam(None, values, type_=postgresql.ARRAY(column.type))
+    )
+
+
+def for_wells(
+    stmt: Select, api10: Any, api10s: Iterable[str] = None, order_by: List[Any] = None,
+) -> Select:
+    """ Limit a select to the wells of the given api10s (if any) and order it """
+    if api10s is not None:
+        stmt = stmt.where(any_of(api10, api10s))
+    return stmt.order_by(*(order_by or [api10]))
 
 
 class ProdHeader(Base):
@@ -32,9 +91,26 @@ class ProdHeader(Base):
     related_wells = db.Column(db.JSONB(), nullable=False, server_default="[]")
     comments = db.Column(db.JSONB(), nullable=False, server_default="{}")
 
+    @classmethod
+    def lookup(
+        cls,
+        api10s: Iterable[str] = None,
+        start_date: date = None,
+        end_date: date = None,
+    ) -> Select:
+        """ Select the headers of the wells of the given api10s that produced
+            between start_date and end_date, ordered by api10 """
+        stmt = db.select([cls.__table__])
+        if start_date:
+            stmt = stmt.where(cls.last_prod_date >= start_date)
+        if end_date:
+            stmt = stmt.where(cls.first_prod_date <= end_date)
+        return for_wells(stmt, cls.api10, api10s)
+
 
 class ProdMonthly(Base):
     __tablename__ = "production_monthly"
+    __table_args__ = hash_partitioned("api10")
 
     api10 = db.Column(db.String(10), primary_key=True)
     prod_date = db.Column(db.Date(), primary_key=True)
@@ -75,26 +151,269 @@ class ProdMonthly(Base):
     water_avg_daily = db.Column(db.Numeric(19, 2))
     boe_avg_daily = db.Column(db.Numeric(19, 2))
     comments = db.Column(db.JSONB(), nullable=False, server_default="{}")
+    row_hash = db.Column(db.BigInteger())  # see DataFrameMixin.hash_rows
 
+    @classproperty
+    def derived_columns(cls) -> List[str]:
+        """ Columns derived from the monthly volumes, days_in_month and the
+            header's perfll. They can be left empty when persisting and computed
+            on read instead (see normalized()). """
+        per_ll = [f"{x}_per{k}" for k in LATERAL_NORMS for x in PROD_COLUMNS]
+        return per_ll + [f"{x}_avg_daily" for x in PROD_COLUMNS]
 
-class ProdStat(Base):
-    __tablename__ = "prodstats"
+    @classmethod
+    def normalized(cls) -> Select:
+        """ Select monthly production with each derived column taken as stored or,
+            when empty, computed from the base columns """
+        m = cls.__table__
+        perfll = sa.func.nullif(ProdHeader.perfll, 0)
+        days = sa.func.nullif(m.c.days_in_month, 0)
 
-    api10 = db.Column(db.String(10), primary_key=True)
-    name = db.Column(db.String(50), primary_key=True, index=True)
-    value = db.Column(db.Numeric(19, 2))
+        def derive(name: str, expr: Any) -> Any:
+            column = m.c[name]
+            # match the truncation of values persisted from a frame
+            if isinstance(column.type, sa.Integer):
+                expr = sa.cast(sa.func.trunc(expr), column.type)
+            else:
+                expr = sa.func.round(expr, column.type.scale)
+            return sa.func.coalesce(column, expr).label(name)
+
+        derived: Dict[str, Any] = {}
+        for suffix, norm_value in LATERAL_NORMS.items():
+            for x in PROD_COLUMNS:
+                derived[f"{x}_per{suffix}"] = derive(
+                    f"{x}_per{suffix}",
+                    sa.cast(m.c[x], sa.Numeric) * norm_value / perfll,
+                )
+        for x in PROD_COLUMNS:
+            derived[f"{x}_avg_daily"] = derive(
+                f"{x}_avg_daily", sa.cast(m.c[x], sa.Numeric) / days
+            )
+
+        return db.select([derived.get(c.name, c) for c in m.columns]).select_from(
+            m.outerjoin(ProdHeader.__table__, ProdHeader.api10 == m.c.api10)
+        )
+
+    @classmethod
+    async def normalized_df(cls, where: Any = None) -> pd.DataFrame:
+        """ Read monthly production with its derived columns, indexed by api10
+            and prod_date """
+        return await select_df(cls.normalized(), cls.pk.names, where=where)
+
+    @classmethod
+    def lookup(
+        cls,
+        api10s: Iterable[str] = None,
+        start_date: date = None,
+        end_date: date = None,
+    ) -> Select:
+        """ Select the normalized monthly production of the wells of the given
+            api10s, between start_date and end_date (inclusive), ordered by api10
+            and prod_date """
+        stmt = cls.normalized()
+        if start_date:
+            stmt = stmt.where(cls.prod_date >= start_date)
+        if end_date:
+            stmt = stmt.where(cls.prod_date <= end_date)
+        return for_wells(stmt, cls.api10, api10s, order_by=[cls.api10, cls.prod_date])
+
+
+class ProdStatDefinition(Base):
+    """ The attributes of a prodstat that are the same for every well, stored once
+        per stat name and referenced from ProdStat by id """
+
+    __tablename__ = "prodstat_definitions"
+
+    id = db.Column(db.SmallInteger(), primary_key=True, autoincrement=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
     property_name = db.Column(db.String(50), index=True)
     aggregate_type = db.Column(db.String(25), index=True)
     is_peak_norm = db.Column(db.Boolean())
     is_ll_norm = db.Column(db.Boolean())
     ll_norm_value = db.Column(db.Integer())
     includes_zeroes = db.Column(db.Boolean())
+    comments = db.Column(db.JSONB(), nullable=False, server_default="{}")
+
+    @classmethod
+    async def resolve(cls, df: pd.DataFrame) -> pd.Series:
+        """ Get the ids of the definitions named in a frame, registering those that
+            aren't stored yet and updating those whose attributes have changed from
+            the frame's first row for each name. Returns the ids indexed by name.
+
+            Stored definitions are updated in place rather than upserted, so only
+            new names draw values from the id sequence. """
+        first = df.loc[df["name"].notna()].drop_duplicates("name")
+        if first.empty:
+            return pd.Series(dtype=int)
+
+        names = first["name"].tolist()
+        pytypes = cls.columns.pytypes
+        attrs = [
+            x
+            for x in cls.columns.names
+            if x in first.columns and x not in ("id", "name")
+        ]
+        values = {x: cls._to_pylist(first[x], pytypes[x]) for x in attrs}
+        definitions = {
+            name: {x: values[x][idx] for x in attrs} for idx, name in enumerate(names)
+        }
+        if "comments" in attrs:
+            for attributes in definitions.values():
+                attributes["comments"] = attributes["comments"] or {}
+
+        async def load() -> Dict[str, Dict[str, Any]]:
+            rows = (
+                await db.select([cls.name, cls.id, *[getattr(cls, x) for x in attrs]])
+                .where(cls.name.in_(names))
+                .gino.all()
+            )
+            return {row[0]: dict(zip(["id", *attrs], row[1:])) for row in rows}
+
+        stored = await load()
+
+        changed = [
+            name
+            for name, attributes in definitions.items()
+            if name in stored
+            and any(stored[name][x] != value for x, value in attributes.items())
+        ]
+        for name in changed:
+            await cls.update.values(**definitions[name]).where(
+                cls.name == name
+            ).gino.status()
+        if changed:
+            logger.debug(f"({cls.__name__}) updated {len(changed)} definitions")
+
+        missing = [name for name in names if name not in stored]
+        if missing:
+            # definitions registered concurrently by another process are kept as is
+            await cls.bulk_upsert(
+                [{"name": name, **definitions[name]} for name in missing],
+                ignore_on_conflict=True,
+                conflict_constraint=f"uq_{cls.__tablename__}_name",
+                errors="raise",
+            )
+            stored = await load()
+            logger.debug(f"({cls.__name__}) registered {len(missing)} definitions")
+
+        return pd.Series({name: x["id"] for name, x in stored.items()}, dtype=int)
+
+
+class ProdStat(Base):
+    """ Per-well prodstat values, with the stat's other attributes stored once in
+        prodstat_definitions. The prodstats_expanded view (see expanded()) reads
+        them in their original wide shape. """
+
+    __tablename__ = "prodstats"
+    __table_args__ = hash_partitioned("api10")
+
+    api10 = db.Column(db.String(10), primary_key=True)
+    stat_id = db.Column(db.SmallInteger(), primary_key=True)
+    value = db.Column(db.Numeric(19, 2))
     start_date = db.Column(db.Date())
     end_date = db.Column(db.Date())
     start_month = db.Column(db.Integer())
     end_month = db.Column(db.Integer())
-    comments = db.Column(db.JSONB(), nullable=False, server_default="{}")
+    row_hash = db.Column(db.BigInteger())  # see DataFrameMixin.hash_rows
 
-    ix_prodstat_api10_prop_agg = db.Index(
-        "ix_prodstat_api10_prop_agg", "api10", "property_name", "aggregate_type"
+    ix_prodstats_stat_id_value = db.Index(
+        "ix_prodstats_stat_id_value", "stat_id", "value"
     )
+
+    @classmethod
+    async def encode(cls, df: pd.DataFrame) -> pd.DataFrame:
+        """ Assign the stat_id of each row's named definition to a frame of
+            prodstats in the wide shape, with name as a column """
+        ids = await ProdStatDefinition.resolve(df)
+        return df.assign(stat_id=df["name"].map(ids))
+
+    @classmethod
+    async def bulk_upsert(
+        cls, df: Union[pd.DataFrame, List[Dict]], reset_index: bool = True, **kwargs
+    ) -> Union[int, UpsertCounts]:
+        """ Upsert prodstats. Frames in the wide shape, identified by name rather
+            than stat_id, are encoded first. """
+        if isinstance(df, pd.DataFrame) and "name" in [*df.index.names, *df.columns]:
+            if reset_index:
+                df = df.reset_index()
+                reset_index = False
+            df = await cls.encode(df)
+        return await super().bulk_upsert(df, reset_index=reset_index, **kwargs)
+
+    @classmethod
+    def expanded(cls) -> Select:
+        """ Select prodstats joined to their definitions, in the original wide
+            shape of the table """
+        d = ProdStatDefinition
+        return db.select(
+            [
+                cls.api10,
+                d.name,
+                cls.value,
+                d.property_name,
+                d.aggregate_type,
+                d.is_peak_norm,
+                d.is_ll_norm,
+                d.ll_norm_value,
+                d.includes_zeroes,
+                cls.start_date,
+                cls.end_date,
+                cls.start_month,
+                cls.end_month,
+                d.comments,
+                cls.created_at,
+                cls.updated_at,
+            ]
+        ).select_from(cls.__table__.join(d.__table__, cls.stat_id == d.id))
+
+    @classmethod
+    async def expanded_df(cls, where: Any = None) -> pd.DataFrame:
+        """ Read prodstats in the wide shape, indexed by api10 and name """
+        return await select_df(cls.expanded(), ["api10", "name"], where=where)
+
+    @classmethod
+    def lookup(
+        cls,
+        api10s: Iterable[str] = None,
+        names: Iterable[str] = None,
+        start_date: date = None,
+        end_date: date = None,
+    ) -> Select:
+        """ Select the prodstats of the wells of the given api10s in the wide
+            shape, optionally limited to the given stat names and to the stats
+            whose period overlaps start_date and end_date. Ordered by api10 and
+            name. """
+        d = ProdStatDefinition
+        stmt = cls.expanded()
+        if names is not None:
+            stmt = stmt.where(any_of(d.name, names))
+        if start_date:
+            stmt = stmt.where(cls.end_date >= start_date)
+        if end_date:
+            stmt = stmt.where(cls.start_date <= end_date)
+        return for_wells(stmt, cls.api10, api10s, order_by=[cls.api10, d.name])
+
+
+# backward-compatible reads of the prodstats table's original wide shape
+PRODSTATS_VIEW = "prodstats_expanded"
+
+sa.event.listen(
+    db,
+    "after_create",
+    sa.DDL(
+        f"CREATE VIEW {PRODSTATS_VIEW} AS {ProdStat.expanded().compile(dialect=postgresql.dialect())}"  # noqa
+    ),
+)
+sa.event.listen(db, "before_drop", sa.DDL(f"DROP VIEW IF EXISTS {PRODSTATS_VIEW}"))
+
+# monthly production with the derived columns computed for rows persisted without
+MONTHLY_VIEW = "production_monthly_normalized"
+
+sa.event.listen(
+    db,
+    "after_create",
+    sa.DDL(
+        f"CREATE VIEW {MONTHLY_VIEW} AS {ProdMonthly.normalized().compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True})}"  # noqa
+    ),
+)
+sa.event.listen(db, "before_drop", sa.DDL(f"DROP VIEW IF EXISTS {MONTHLY_VIEW}"))
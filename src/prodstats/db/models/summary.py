@@ -0,0 +1,202 @@
+from timeit import default_timer as timer
+from typing import Iterable, List
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql.dml import Insert
+from sqlalchemy.sql.expression import Select
+
+from db.models.bases import Base, db
+from db.models.prod import ProdHeader, ProdStat, ProdStatDefinition
+from db.models.wells import FracParameters, WellHeader
+
+__all__ = ["WellSummary", "SUMMARY_STATS"]
+
+# columns of the summary taken from each source table
+WELL_COLUMNS: List[str] = [
+    "api10",
+    "well_name",
+    "hole_direction",
+    "status",
+    "is_producing",
+    "operator",
+    "operator_alias",
+    "basin",
+    "sub_basin",
+    "state",
+    "county",
+    "tvd",
+    "perfll",
+    "lateral_length",
+    "spud_date",
+    "comp_date",
+]
+FRAC_COLUMNS: List[str] = [
+    "fluid_bbl",
+    "proppant_lb",
+    "fluid_bbl_ft",
+    "proppant_lb_ft",
+    "gen",
+    "gen_name",
+]
+HEADER_COLUMNS: List[str] = [
+    "first_prod_date",
+    "last_prod_date",
+    "prod_months",
+    "peak30_oil",
+    "peak30_gas",
+    "peak30_month",
+]
+
+# prodstats pivoted into columns of the summary, by name
+SUMMARY_STATS: List[str] = [
+    "oil_sum",
+    "gas_sum",
+    "boe_sum",
+    "oil_sum_first6mo",
+    "gas_sum_first6mo",
+    "boe_sum_first6mo",
+    "oil_sum_first12mo",
+    "gas_sum_first12mo",
+    "boe_sum_first12mo",
+    "oil_sum_first12mo_per1k",
+    "boe_sum_first12mo_per1k",
+    "oil_sum_peaknorm6mo",
+    "boe_sum_peaknorm6mo",
+    "oil_sum_last3mo",
+    "boe_sum_last3mo",
+]
+
+
+class WellSummary(Base):
+    """ One row per well, combining its header, frac intensity and most-used
+        prodstats, so well lists can be read from a single table. Rows are only
+        written by refresh(). """
+
+    __tablename__ = "well_summary"
+
+    api14 = db.Column(db.String(14), primary_key=True)
+    api10 = db.Column(db.String(10), index=True)
+    well_name = db.Column(db.String())
+    hole_direction = db.Column(db.String(1))
+    status = db.Column(db.String(50))
+    is_producing = db.Column(db.Boolean())
+    operator = db.Column(db.String(), index=True)
+    operator_alias = db.Column(db.String(), index=True)
+    basin = db.Column(db.String(50))
+    sub_basin = db.Column(db.String(50))
+    state = db.Column(db.String(50))
+    county = db.Column(db.String(50), index=True)
+    tvd = db.Column(db.Integer())
+    perfll = db.Column(db.Integer())
+    lateral_length = db.Column(db.Integer())
+    spud_date = db.Column(db.Date())
+    comp_date = db.Column(db.Date())
+    fluid_bbl = db.Column(db.Integer())
+    proppant_lb = db.Column(db.Integer())
+    fluid_bbl_ft = db.Column(db.Integer())
+    proppant_lb_ft = db.Column(db.Integer())
+    gen = db.Column(db.Integer())
+    gen_name = db.Column(db.String(10))
+    first_prod_date = db.Column(db.Date())
+    last_prod_date = db.Column(db.Date())
+    prod_months = db.Column(db.Integer())
+    peak30_oil = db.Column(db.Integer())
+    peak30_gas = db.Column(db.Integer())
+    peak30_month = db.Column(db.Integer())
+    oil_sum = db.Column(db.Numeric(19, 2))
+    gas_sum = db.Column(db.Numeric(19, 2))
+    boe_sum = db.Column(db.Numeric(19, 2))
+    oil_sum_first6mo = db.Column(db.Numeric(19, 2))
+    gas_sum_first6mo = db.Column(db.Numeric(19, 2))
+    boe_sum_first6mo = db.Column(db.Numeric(19, 2))
+    oil_sum_first12mo = db.Column(db.Numeric(19, 2))
+    gas_sum_first12mo = db.Column(db.Numeric(19, 2))
+    boe_sum_first12mo = db.Column(db.Numeric(19, 2))
+    oil_sum_first12mo_per1k = db.Column(db.Numeric(19, 2))
+    boe_sum_first12mo_per1k = db.Column(db.Numeric(19, 2))
+    oil_sum_peaknorm6mo = db.Column(db.Numeric(19, 2))
+    boe_sum_peaknorm6mo = db.Column(db.Numeric(19, 2))
+    oil_sum_last3mo = db.Column(db.Numeric(19, 2))
+    boe_sum_last3mo = db.Column(db.Numeric(19, 2))
+
+    basin_holedir_isprod_idx = db.Index(
+        "ix_well_summary_basin_holedir_isprod",
+        "basin",
+        "hole_direction",
+        "is_producing",
+    )
+
+    @classmethod
+    def source(cls, api10s: List[str] = None) -> Select:
+        """ Select the summary rows from the source tables, optionally limited to
+            the wells of the given api10s """
+        w = WellHeader.__table__
+        f = FracParameters.__table__
+        h = ProdHeader.__table__
+        d = ProdStatDefinition
+
+        stats = (
+            db.select(
+                [ProdStat.api10]
+                + [
+                    sa.func.max(ProdStat.value).filter(d.name == x).label(x)
+                    for x in SUMMARY_STATS
+                ]
+            )
+            .select_from(ProdStat.__table__.join(d.__table__, ProdStat.stat_id == d.id))
+            .where(d.name.in_(SUMMARY_STATS))
+            .group_by(ProdStat.api10)
+        )
+        if api10s is not None:
+            # filtered here as well, so only the partitions of the api10s are read
+            stats = stats.where(ProdStat.api10.in_(api10s))
+        stats = stats.alias("stats")
+
+        columns = [w.c.api14]
+        columns += [w.c[x] for x in WELL_COLUMNS]
+        columns += [f.c[x] for x in FRAC_COLUMNS]
+        columns += [h.c[x] for x in HEADER_COLUMNS]
+        columns += [stats.c[x] for x in SUMMARY_STATS]
+
+        stmt = db.select(columns).select_from(
+            w.outerjoin(f, f.c.api14 == w.c.api14)
+            .outerjoin(h, h.c.api10 == w.c.api10)
+            .outerjoin(stats, stats.c.api10 == w.c.api10)
+        )
+        if api10s is not None:
+            stmt = stmt.where(w.c.api10.in_(api10s))
+        return stmt
+
+    @classmethod
+    async def refresh(cls, api10s: Iterable[str] = None) -> int:
+        """ Rebuild the summary rows of the wells of the given api10s from the
+            source tables, or of every well if api10s is None. Only the rows that
+            changed are rewritten, and rows of wells no longer in the source are
+            removed, in the same transaction. Returns the number of rows written or
+            removed. """
+        if api10s is not None:
+            api10s = sorted(set(api10s))
+            if not api10s:
+                return 0
+
+        ts = timer()
+        select = cls.source(api10s)
+        names = [c.name for c in select.columns]
+        stmt = Insert(cls.__table__).from_select(names, select, include_defaults=False)
+        stmt = cls.on_conflict(
+            stmt, exclude_cols=["created_at"], skip_unchanged=True
+        ).returning(cls.api14)
+
+        # the source has a row for every well header of the api10s
+        w = WellHeader.__table__
+        stale = cls.delete.where(~sa.exists().where(w.c.api14 == cls.api14))
+        if api10s is not None:
+            stale = stale.where(cls.api10.in_(api10s))
+        stale = stale.returning(cls.api14)
+
+        async with db.transaction():
+            n = len(await db.all(stmt))
+            n += len(await db.all(stale))
+
+        cls.log_operation("refresh", n, round(timer() - ts, 2))
+        return n
@@ -8,6 +8,7 @@ __all__ = [
     "WellLocation",
     "IPTest",
     "FracParameters",
+    "FracFocusJob",
     "Survey",
     "SurveyPoint",
 ]
@@ -72,6 +73,20 @@ class FracParameters(WellBase):
     provider_last_update_at = db.Column(db.DateTime(timezone=True))
 
 
+class FracFocusJob(WellBase):
+    """ Local copy of the FracFocus job registry """
+
+    __tablename__ = "fracfocus_jobs"
+
+    api10 = db.Column(db.String(10), index=True)
+    fluid = db.Column(db.Integer())
+    fluid_uom = db.Column(db.String(10))
+    proppant = db.Column(db.Integer())
+    proppant_uom = db.Column(db.String(10))
+    provider = db.Column(db.String())
+    provider_last_update_at = db.Column(db.DateTime(timezone=True), index=True)
+
+
 class WellStat(WellBase):
     __tablename__ = "wellstats"
 
@@ -112,6 +127,7 @@ class WellDepth(WellBase):
     overlap_percent = db.Column(db.Float())
     in_target = db.Column(db.Boolean())
     assignment_method = db.Column(db.String())  # TODO: enum
+    row_hash = db.Column(db.BigInteger())  # see DataFrameMixin.hash_rows
 
 
 class WellLink(WellBase):
@@ -186,6 +202,7 @@ class SurveyPoint(WellBase):
     is_hard_corner = db.Column(db.Boolean(), nullable=False, default=False)
     is_kop = db.Column(db.Boolean(), nullable=False, default=False)
     geom = db.Column(db.Geometry("POINT", srid=4326, spatial_index=False))
+    row_hash = db.Column(db.BigInteger())  # see DataFrameMixin.hash_rows
     ix_lateral_partial = db.Index(
         "ix_lateral_partial",
         "api14",
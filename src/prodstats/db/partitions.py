@@ -0,0 +1,138 @@
+""" Declarative hash partitioning.
+
+    A model opts in by passing hash_partitioned() as its __table_args__. The parent
+    table is created with PARTITION BY HASH on the partition key and its
+    partitions are created alongside it, both by create_all() and by the
+    migrations. The partition key must be part of the primary key, so the primary
+    key stays a valid conflict target for bulk upserts.
+
+    Each partition carries its own indexes, so they stay bounded as the table
+    grows. maintain() runs a maintenance command over the partitions
+    concurrently, and stage()/swap() replace a partition's contents wholesale:
+    the replacement is loaded into a standalone table, then exchanged for the
+    partition in a single transaction.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import sqlalchemy as sa
+
+from db import pool
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "DEFAULT_PARTITIONS",
+    "hash_partitioned",
+    "partition_count",
+    "partition_name",
+    "partition_names",
+    "create_partitions_ddl",
+    "maintain",
+    "stage",
+    "swap",
+]
+
+DEFAULT_PARTITIONS: int = 8  # changing this requires a migration
+
+
+def hash_partitioned(*columns: str, partitions: int = DEFAULT_PARTITIONS) -> Dict:
+    """ Table arguments partitioning a table by the hash of the given columns """
+    if partitions < 1:
+        raise ValueError(f"partitions must be positive: {partitions}")
+    return {
+        "postgresql_partition_by": f"HASH ({', '.join(columns)})",
+        "info": {"partitions": partitions},
+    }
+
+
+def partition_count(table: sa.Table) -> int:
+    """ Number of hash partitions of the table. Zero if the table isn't partitioned """
+    return table.info.get("partitions", 0)
+
+
+def partition_name(table: sa.Table, remainder: int) -> str:
+    return f"{table.name}_p{remainder}"
+
+
+def partition_names(table: sa.Table) -> List[str]:
+    return [partition_name(table, r) for r in range(partition_count(table))]
+
+
+def create_partitions_ddl(table: sa.Table) -> List[str]:
+    """ Statements creating each of the table's partitions """
+    modulus = partition_count(table)
+    return [
+        f"CREATE TABLE {partition_name(table, r)} PARTITION OF {table.name} FOR VALUES WITH (MODULUS {modulus}, REMAINDER {r})"  # noqa
+        for r in range(modulus)
+    ]
+
+
+@sa.event.listens_for(sa.Table, "after_create")
+def _create_partitions(table: sa.Table, connection, **kwargs):
+    for stmt in create_partitions_ddl(table):
+        connection.execute(stmt)
+
+
+async def maintain(
+    model, command: str = "ANALYZE", concurrency: int = None
+) -> List[str]:
+    """ Run a maintenance command (e.g. ANALYZE, VACUUM, REINDEX TABLE) against
+        each partition of the model's table, using up to concurrency connections
+        at once. Returns the names of the partitions processed. """
+    bind = model.__metadata__.bind
+    names = partition_names(model.__table__)
+    capacity = pool.capacity(bind)
+    semaphore = asyncio.Semaphore(min(concurrency or capacity, capacity))
+
+    async def run(name: str):
+        async with semaphore:
+            async with pool.acquire(bind, reuse=False) as conn:
+                await conn.status(f"{command} {name}")
+                logger.debug(f"({model.__name__}) {command} {name}")
+
+    await asyncio.gather(*[run(name) for name in names])
+    return names
+
+
+async def stage(model, remainder: int) -> str:
+    """ Create an empty standalone table shaped like the partition with the given
+        remainder, to be loaded and swapped in. Returns the table's name. """
+    table = model.__table__
+    name = f"{partition_name(table, remainder)}_staged"
+    await model.__metadata__.status(f"DROP TABLE IF EXISTS {name}")
+    await model.__metadata__.status(
+        f"CREATE TABLE {name} (LIKE {table.name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"  # noqa
+    )
+    return name
+
+
+async def swap(model, remainder: int, staged: str, keep: bool = False) -> Optional[str]:
+    """ Replace the partition with the given remainder with the staged table.
+        Attaching validates that every staged row belongs to the partition. The
+        replaced partition is dropped, or kept detached under a new name (returned)
+        if keep is True. """
+    table = model.__table__
+    modulus = partition_count(table)
+    if not 0 <= remainder < modulus:
+        raise ValueError(
+            f"({model.__name__}) remainder must be in [0, {modulus}): {remainder}"
+        )
+
+    name = partition_name(table, remainder)
+    retired = f"{name}_retired"
+
+    async with model.__metadata__.transaction() as tx:
+        conn = tx.connection
+        await conn.status(f"ALTER TABLE {table.name} DETACH PARTITION {name}")
+        await conn.status(f"ALTER TABLE {name} RENAME TO {retired}")
+        await conn.status(f"ALTER TABLE {staged} RENAME TO {name}")
+        await conn.status(
+            f"ALTER TABLE {table.name} ATTACH PARTITION {name} FOR VALUES WITH (MODULUS {modulus}, REMAINDER {remainder})"  # noqa
+        )
+        if not keep:
+            await conn.status(f"DROP TABLE {retired}")
+
+    logger.info(f"({model.__name__}) swapped partition {name}")
+    return retired if keep else None
@@ -0,0 +1,187 @@
+""" Connection pool telemetry.
+
+    status() reads the number of open, in use, idle and waiting connections from
+    the bound asyncpg pool. Acquisitions made through acquire() additionally
+    record how long they waited for a connection, so starvation of the pool
+    during bulk operations shows up as acquire-wait latency. capacity() is the
+    number of connections bulk operations can use concurrently.
+"""
+import contextlib
+import logging
+import math
+from timeit import default_timer as timer
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import config as conf
+import ext.metrics as metrics
+from util.stats import Histogram
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "PoolStats",
+    "pool_stats",
+    "status",
+    "capacity",
+    "acquire",
+    "series",
+    "post",
+]
+
+WAIT_BUCKETS: Tuple[float, ...] = (0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, math.inf)
+
+
+class PoolStats:
+    """ Aggregated measurements of connection acquisitions. Waits are counted in
+        fixed buckets, so the stats don't grow with the number of acquisitions. """
+
+    def __init__(self, buckets: Tuple[float, ...] = WAIT_BUCKETS):
+        self.buckets = buckets
+        self.acquisitions: int = 0
+        self.waits: Histogram = Histogram(buckets)
+        self.max_waiting: int = 0
+
+    def observe(self, seconds: float):
+        self.acquisitions += 1
+        self.waits.observe(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """ Estimated percentile of the acquire waits (0 < q <= 100) """
+        return self.waits.percentile(q)
+
+    def histogram(self) -> Dict[str, int]:
+        """ Cumulative acquire wait histogram keyed by bucket upper bound """
+        return self.waits.cumulative()
+
+    def reset(self):
+        self.__init__(self.buckets)
+
+    def to_dict(self) -> Dict:
+        return {
+            "acquisitions": self.acquisitions,
+            "wait_p50": self.percentile(50),
+            "wait_p95": self.percentile(95),
+            "wait_max": self.waits.max,
+            "max_waiting": self.max_waiting,
+        }
+
+
+pool_stats = PoolStats()  # process-wide
+
+
+def status(engine=None) -> Dict[str, int]:
+    """ Current state of the engine's connection pool. Empty if the engine isn't
+        bound to a pool, or if the pool's internals can't be read.
+
+        asyncpg doesn't expose these counts, so they are read from the private
+        attributes of its Pool (as of asyncpg 0.20, which is pinned). """
+    pool = _raw_pool(engine)
+    if pool is None:
+        return {}
+
+    try:
+        holders = pool._holders
+        size = sum(1 for h in holders if h._con is not None)
+        in_use = sum(1 for h in holders if h._in_use is not None)
+        waiting = sum(1 for w in pool._queue._getters if not w.done())
+        min_size, max_size = pool._minsize, pool._maxsize
+    except (AttributeError, TypeError) as e:
+        logger.debug(f"(pool) failed to read the pool's status -- {e}")
+        return {}
+
+    return {
+        "min_size": min_size,
+        "max_size": max_size,
+        "size": size,
+        "in_use": in_use,
+        "idle": size - in_use,
+        "waiting": waiting,
+    }
+
+
+def capacity(engine=None) -> int:
+    """ Number of connections that can be in use at once """
+    pool = _raw_pool(engine)
+    return getattr(pool, "_maxsize", None) or conf.DATABASE_POOL_SIZE_MAX
+
+
+@contextlib.asynccontextmanager
+async def acquire(engine, reuse: bool = True) -> AsyncIterator:
+    """ Acquire a connection from a gino engine, recording the time spent waiting
+        for it. Reused connections don't wait and aren't recorded. """
+    if reuse and engine.current_connection is not None:
+        async with engine.acquire(reuse=True) as conn:
+            yield conn
+        return
+
+    waiting = status(engine).get("waiting", 0)
+    pool_stats.max_waiting = max(pool_stats.max_waiting, waiting)
+
+    ts = timer()
+    async with engine.acquire(reuse=reuse) as conn:
+        pool_stats.observe(timer() - ts)
+        yield conn
+
+
+def series(engine=None, tags: Dict[str, str] = None, reset: bool = True) -> List[Dict]:
+    """ The pool's state and the acquire waits recorded since the last reset, as
+        a batch of ext.metrics payloads """
+    tag_list = metrics.to_tags(tags or {})
+
+    series = [
+        metrics.metric(f"db.pool.{name}", value, metric_type="gauge", tags=tag_list)
+        for name, value in status(engine).items()
+    ]
+
+    series += [
+        metrics.metric("db.pool.acquisitions", pool_stats.acquisitions, tags=tag_list),
+        metrics.metric(
+            "db.pool.waiting.max",
+            pool_stats.max_waiting,
+            metric_type="gauge",
+            tags=tag_list,
+        ),
+    ]
+
+    for name, q in [("p50", 50), ("p95", 95), ("max", 100)]:
+        value = pool_stats.percentile(q)
+        if value is not None:
+            series.append(
+                metrics.metric(
+                    f"db.pool.acquire.wait.{name}",
+                    value,
+                    metric_type="gauge",
+                    tags=tag_list,
+                )
+            )
+
+    for le, count in pool_stats.histogram().items():
+        series.append(
+            metrics.metric(
+                "db.pool.acquire.wait.bucket",
+                count,
+                tags=metrics.to_tags({**(tags or {}), "le": le}),
+            )
+        )
+
+    if reset:
+        pool_stats.reset()
+
+    return series
+
+
+def post(engine=None, tags: Dict[str, str] = None, reset: bool = True):
+    """ Export the pool's state and the acquire waits recorded since the last
+        post through ext.metrics, in a single request """
+    metrics.send(series(engine, tags=tags, reset=reset))
+
+
+def _raw_pool(engine=None):
+    if engine is None:
+        from db import db
+
+        if not db.is_bound():
+            return None
+        engine = db.bind
+
+    return getattr(engine, "raw_pool", None)
@@ -0,0 +1,362 @@
+""" Statement timing and slow query capture.
+
+    Once installed, every statement executed through gino is timed and recorded
+    against the model and operation tagged in the current context (see tagged()).
+    The raw asyncpg statements of the bulk operations are recorded by the bulk
+    operations themselves, through observe().
+
+    Statements slower than DATABASE_SLOW_QUERY_SECONDS are kept in memory, up to
+    the DATABASE_SLOW_QUERY_LOG_SIZE slowest. When DATABASE_EXPLAIN_SAMPLE_RATE
+    is set, a sample of the slow reads has its plan captured with EXPLAIN
+    (ANALYZE, BUFFERS). That re-runs the statement on a separate connection, so
+    at most DATABASE_EXPLAIN_MAX_CONCURRENT plans are captured at once. Writes
+    are never explained, since EXPLAIN ANALYZE executes the statement.
+"""
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import math
+import random
+from timeit import default_timer as timer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from gino.dialects.asyncpg import AsyncpgDialect, DBAPICursor
+
+import config as conf
+import ext.metrics as metrics
+from db import pool
+from util.dt import utcnow
+from util.stats import Histogram
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "OperationStats",
+    "SlowStatement",
+    "QueryLog",
+    "TimedCursor",
+    "query_log",
+    "tagged",
+    "observe",
+    "install",
+    "series",
+    "post",
+]
+
+LATENCY_BUCKETS: Tuple[float, ...] = (0.01, 0.05, 0.1, 0.5, 1, 5, 30, math.inf)
+
+_tags: contextvars.ContextVar = contextvars.ContextVar("query_tags", default={})
+
+
+@contextlib.contextmanager
+def tagged(model: str = None, operation: str = None) -> Iterator[None]:
+    """ Tag the statements executed in the current context (including tasks
+        spawned from it) with a model and operation until the block exits. Tags
+        of nested blocks take precedence. """
+    given = {"model": model, "operation": operation}
+    token = _tags.set({**_tags.get(), **{k: v for k, v in given.items() if v}})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def verb(sql: str) -> str:
+    """ The leading keyword of a statement, e.g. select or insert """
+    return sql.lstrip().split(None, 1)[0].lower() if sql.strip() else ""
+
+
+class OperationStats:
+    """ Aggregated timings of the statements of a model and operation. Latencies
+        are counted in fixed buckets, so the stats don't grow with the number of
+        statements recorded. """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.statements: int = 0
+        self.slow: int = 0
+        self.seconds: float = 0
+        self.latencies: Histogram = Histogram(buckets)
+
+    def observe(self, seconds: float):
+        self.statements += 1
+        self.seconds += seconds
+        self.latencies.observe(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """ Estimated percentile of the recorded latencies (0 < q <= 100) """
+        return self.latencies.percentile(q)
+
+    def histogram(self) -> Dict[str, int]:
+        """ Cumulative latency histogram keyed by bucket upper bound """
+        return self.latencies.cumulative()
+
+    def to_dict(self) -> Dict:
+        return {
+            "statements": self.statements,
+            "slow": self.slow,
+            "seconds": round(self.seconds, 4),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.latencies.max,
+        }
+
+
+class SlowStatement:
+    """ A statement that exceeded the slow query threshold, with its plan if one
+        was captured """
+
+    def __init__(self, sql: str, model: Optional[str], operation: str):
+        self.sql = sql
+        self.model = model
+        self.operation = operation
+        self.calls: int = 0
+        self.seconds: float = 0
+        self.max_seconds: float = 0
+        self.last_seen_at = None
+        self.plan: Optional[Any] = None
+        self.explained_at = None
+
+    def __repr__(self):
+        return f"SlowStatement: {self.operation} {self.model} ({self.max_seconds}s)"
+
+    def observe(self, seconds: float):
+        self.calls += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.last_seen_at = utcnow()
+
+    def to_dict(self) -> Dict:
+        return {
+            "sql": self.sql,
+            "model": self.model,
+            "operation": self.operation,
+            "calls": self.calls,
+            "seconds": round(self.seconds, 4),
+            "max_seconds": round(self.max_seconds, 4),
+            "last_seen_at": self.last_seen_at,
+            "plan": self.plan,
+            "explained_at": self.explained_at,
+        }
+
+
+class QueryLog:
+    """ Collects OperationStats keyed by (model, operation) and the slowest
+        statements keyed by their sql """
+
+    def __init__(
+        self,
+        threshold: float = None,
+        size: int = None,
+        sample_rate: float = None,
+        max_explaining: int = None,
+    ):
+        self.threshold: float = (
+            conf.DATABASE_SLOW_QUERY_SECONDS if threshold is None else threshold
+        )
+        self.size: int = conf.DATABASE_SLOW_QUERY_LOG_SIZE if size is None else size
+        self.sample_rate: float = (
+            conf.DATABASE_EXPLAIN_SAMPLE_RATE if sample_rate is None else sample_rate
+        )
+        self.max_explaining: int = (
+            conf.DATABASE_EXPLAIN_MAX_CONCURRENT
+            if max_explaining is None
+            else max_explaining
+        )
+        self.operations: Dict[Tuple[Optional[str], str], OperationStats] = {}
+        self.statements: Dict[str, SlowStatement] = {}
+        self._explaining: Set[asyncio.Future] = set()
+
+    def __repr__(self):
+        return f"QueryLog: {len(self.operations)} operations, {len(self.statements)} slow statements"  # noqa
+
+    def record(
+        self,
+        sql: str,
+        seconds: float,
+        args: Sequence = None,
+        many: bool = False,
+        model: str = None,
+        operation: str = None,
+    ) -> Optional[SlowStatement]:
+        """ Record an executed statement. Returns its entry in the slow statements
+            if it exceeded the threshold. """
+        tags = _tags.get()
+        model = model or tags.get("model")
+        operation = operation or tags.get("operation") or verb(sql)
+
+        key = (model, operation)
+        if key not in self.operations:
+            self.operations[key] = OperationStats()
+        stats = self.operations[key]
+        stats.observe(seconds)
+
+        if seconds < self.threshold:
+            return None
+
+        stats.slow += 1
+        if sql not in self.statements:
+            self.statements[sql] = SlowStatement(sql, model, operation)
+        entry = self.statements[sql]
+        entry.observe(seconds)
+
+        logger.warning(
+            f"(QueryLog) slow {operation} on {model or 'unknown model'} ({round(seconds, 3)}s)",  # noqa
+            extra={"model": model, "operation": operation, "duration": seconds},
+        )
+
+        if self.explainable(sql, many) and random.random() < self.sample_rate:
+            self.schedule_explain(entry, args or ())
+
+        self.trim()
+        return entry
+
+    @staticmethod
+    def explainable(sql: str, many: bool = False) -> bool:
+        """ Whether a statement can be explained without side effects """
+        return not many and verb(sql) == "select"
+
+    def schedule_explain(self, entry: SlowStatement, args: Sequence):
+        if len(self._explaining) >= self.max_explaining:
+            return
+        try:
+            future = asyncio.ensure_future(self.explain(entry, args))
+        except RuntimeError:  # no running event loop
+            return
+        self._explaining.add(future)
+        future.add_done_callback(self._explaining.discard)
+
+    async def explain(self, entry: SlowStatement, args: Sequence):
+        """ Capture the plan of a slow statement on a separate connection """
+        from db import db
+
+        try:
+            async with pool.acquire(db.bind, reuse=False) as conn:
+                plan = await conn.raw_connection.fetchval(
+                    f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {entry.sql}", *args
+                )
+            entry.plan = json.loads(plan) if isinstance(plan, str) else plan
+            entry.explained_at = utcnow()
+        except Exception as e:
+            logger.warning(f"(QueryLog) failed to explain statement -- {e}")
+
+    async def wait(self):
+        """ Wait for the plans being captured """
+        if self._explaining:
+            await asyncio.gather(*list(self._explaining))
+
+    def trim(self):
+        """ Keep the slowest statements, up to the log's size """
+        if len(self.statements) > self.size:
+            slowest = sorted(
+                self.statements.values(), key=lambda x: x.max_seconds, reverse=True
+            )[: self.size]
+            self.statements = {x.sql: x for x in slowest}
+
+    def slowest(self, n: int = None) -> List[SlowStatement]:
+        ordered = sorted(
+            self.statements.values(), key=lambda x: x.max_seconds, reverse=True
+        )
+        return ordered[:n] if n else ordered
+
+    def to_records(self) -> List[Dict]:
+        return [
+            {"model": model, "operation": operation, **stats.to_dict()}
+            for (model, operation), stats in self.operations.items()
+        ]
+
+    def to_dict(self, n: int = None) -> Dict:
+        return {
+            "threshold": self.threshold,
+            "sample_rate": self.sample_rate,
+            "operations": self.to_records(),
+            "slow": [x.to_dict() for x in self.slowest(n)],
+        }
+
+    def reset(self):
+        """ Clear the recorded operations and slow statements """
+        self.operations = {}
+        self.statements = {}
+
+
+query_log = QueryLog()  # process-wide
+
+
+def observe(
+    sql: str,
+    seconds: float,
+    args: Sequence = None,
+    many: bool = False,
+    model: str = None,
+    operation: str = None,
+) -> Optional[SlowStatement]:
+    """ Record a statement executed outside of gino in the process-wide log """
+    return query_log.record(
+        sql, seconds, args=args, many=many, model=model, operation=operation
+    )
+
+
+class TimedCursor(DBAPICursor):
+    """ gino cursor recording the execution time of each statement in the
+        process-wide log """
+
+    async def async_execute(self, query, timeout, args, limit=0, many=False):
+        ts = timer()
+        try:
+            return await super().async_execute(
+                query, timeout, args, limit=limit, many=many
+            )
+        finally:
+            observe(query, timer() - ts, args=args, many=many)
+
+
+def install(dialect=AsyncpgDialect):
+    """ Time the statements executed through engines of the dialect """
+    dialect.cursor_cls = TimedCursor
+
+
+def series(tags: Dict[str, str] = None, reset: bool = True) -> List[Dict]:
+    """ The statement timings recorded since the last reset, as a batch of
+        ext.metrics payloads """
+    series: List[Dict] = []
+    for (model, operation), stats in query_log.operations.items():
+        op_tags = {**(tags or {}), "model": model or "unknown", "operation": operation}
+        tag_list = metrics.to_tags(op_tags)
+
+        series += [
+            metrics.metric("db.statements", stats.statements, tags=tag_list),
+            metrics.metric("db.statements.slow", stats.slow, tags=tag_list),
+        ]
+
+        for name, q in [("p50", 50), ("p95", 95), ("max", 100)]:
+            value = stats.percentile(q)
+            if value is not None:
+                series.append(
+                    metrics.metric(
+                        f"db.statement.latency.{name}",
+                        value,
+                        metric_type="gauge",
+                        tags=tag_list,
+                    )
+                )
+
+        for le, count in stats.histogram().items():
+            series.append(
+                metrics.metric(
+                    "db.statement.latency.bucket",
+                    count,
+                    tags=metrics.to_tags({**op_tags, "le": le}),
+                )
+            )
+
+    if reset:
+        query_log.operations = {}
+
+    return series
+
+
+def post(tags: Dict[str, str] = None, reset: bool = True):
+    """ Export the statement timings recorded since the last post through
+        ext.metrics, in a single request """
+    metrics.send(series(tags=tags, reset=reset))
@@ -1,17 +1,20 @@
 import asyncio
 import logging
 from timeit import default_timer as timer
-from typing import Coroutine, Dict, List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import pandas as pd
 import shortuuid
 
 import calc  # noqa
+import config as conf
 import db.models as models
+import ext.metrics as metrics
 import util
 from calc.sets import DataSet, ProdSet, WellGeometrySet, WellSet
+from collector.instrumentation import RequestRecorder, recording
 from const import HoleDirection, IHSPath, ProdStatRange
-from db import db
+from db import db, pool, querylog
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +31,8 @@ class BaseExecutor:
         download_kwargs: Dict = None,
         process_kwargs: Dict = None,
         persist_kwargs: Dict = None,
+        transactional: bool = None,
+        refresh_summary: bool = None,
     ):
 
         self.exec_id = shortuuid.uuid()
@@ -35,6 +40,12 @@ class BaseExecutor:
         self.download_kwargs = download_kwargs or {}
         self.process_kwargs = process_kwargs or {}
         self.persist_kwargs = persist_kwargs or {}
+        self.transactional = (
+            conf.PERSIST_TRANSACTIONAL if transactional is None else transactional
+        )
+        self.refresh_summary = (
+            conf.REFRESH_WELL_SUMMARY if refresh_summary is None else refresh_summary
+        )
 
         self.metrics: pd.DataFrame = pd.DataFrame(
             columns=[
@@ -81,6 +92,37 @@ class BaseExecutor:
             )
         )
 
+    async def add_request_metrics(self, recorder: RequestRecorder):
+        """ Add the upstream requests captured during a download to the executor's
+            metrics and export them, in one request sent off the event loop """
+        for (provider, path), stats in recorder:
+            self.add_metric(
+                operation="request",
+                name=f"{provider}.{path}",
+                seconds=round(stats.seconds, 2),
+                count=stats.requests,
+            )
+        await metrics.send_async(
+            recorder.series(
+                tags={
+                    "executor": self.__exec_name__,
+                    "hole_direction": self.hole_dir.value,
+                }
+            )
+        )
+
+    async def add_pool_metrics(self):
+        """ Export the connection pool's state and acquire waits, and the statement
+            timings recorded by the query log, in one request sent off the event
+            loop """
+        status = pool.status()
+        logger.debug(
+            f"[{self.exec_id}] {self} - connection pool: {status}",
+            extra={**status, **pool.pool_stats.to_dict()},
+        )
+        tags = {"executor": self.__exec_name__, "hole_direction": self.hole_dir.value}
+        await metrics.send_async(pool.series(tags=tags) + querylog.series(tags=tags))
+
     async def download(self, **kwargs,) -> DataSet:
         raise NotImplementedError
 
@@ -98,8 +140,13 @@ class BaseExecutor:
             )
 
             ts = timer()
-            count = await model.bulk_upsert(df, **kwargs)
+            counts = await model.bulk_upsert(df, return_counts=True, **kwargs)
+            count = counts.total
             exc_time = round(timer() - ts, 2)
+            logger.info(
+                f"[{self.exec_id}] {self} - {name}: {counts.inserted} inserted, {counts.updated} updated, {counts.unchanged} unchanged, {counts.failed} failed",  # noqa
+                extra={"name": name, **counts.to_dict()},
+            )
             self.add_metric(
                 operation="persist", name=name, seconds=exc_time, count=df.shape[0],
             )
@@ -107,6 +154,53 @@ class BaseExecutor:
             logger.info(f"[{self.exec_id}] {self} - nothing to persist")
         return count
 
+    async def _persist_many(
+        self, items: List[Tuple[str, models.Model, Optional[pd.DataFrame], Dict]]
+    ) -> int:
+        """ Persist the frames of a dataset, given as (name, model, frame, kwargs).
+
+            Frames are persisted concurrently, each batch on its own pooled
+            connection, unless the executor is transactional. The pool's capacity
+            is shared between the frames, unless their kwargs set a concurrency.
+
+            In transactional mode, all frames are persisted one after the other
+            through a single connection in a single transaction, so the dataset
+            is either persisted in full or not at all. """
+        if not self.transactional:
+            share = max(pool.capacity() // max(len(items), 1), 1)
+            coros = [
+                self._persist(name, model, df, **{"concurrency": share, **kw})
+                for name, model, df, kw in items
+            ]
+            return sum(await asyncio.gather(*coros))
+
+        count = 0
+        ts = timer()
+        async with db.transaction():
+            for name, model, df, kw in items:
+                count += await self._persist(name, model, df, **kw)
+        logger.debug(
+            f"[{self.exec_id}] {self} - committed {count} records ({round(timer() - ts, 2)}s)"  # noqa
+        )
+        return count
+
+    async def _refresh_summary(self, df: Optional[pd.DataFrame]) -> int:
+        """ Refresh the well summary rows of the api10s in a persisted frame """
+        if not self.refresh_summary or df is None:
+            return 0
+
+        ts = timer()
+        count = await models.WellSummary.refresh(df.util.column_as_set("api10"))
+        exc_time = round(timer() - ts, 2)
+        logger.info(
+            f"[{self.exec_id}] {self} - summary: {count} refreshed ({exc_time}s)",
+            extra={"name": "summary", "refreshed": count},
+        )
+        self.add_metric(
+            operation="refresh", name="summary", seconds=exc_time, count=count,
+        )
+        return count
+
     async def persist(self, dataset: DataSet, **kwargs) -> int:
         raise NotImplementedError
 
@@ -119,10 +213,13 @@ class BaseExecutor:
         try:
             ts = timer()
             logger.info(f"[{self.exec_id}] {self} - execution started")
-            ds: DataSet = await self.download(**kwargs)
+            with recording() as requests:
+                ds: DataSet = await self.download(**kwargs)
+            await self.add_request_metrics(requests)
             ds_proc = await self.process(ds)
             if persist:
                 ct = await self.persist(ds_proc)
+                await self.add_pool_metrics()
             else:
                 logger.info(f"[{self.exec_id}] {self} - skipping persistance")
                 ct = 0
@@ -156,13 +253,27 @@ class ProdExecutor(BaseExecutor):
         header_kwargs: Dict = None,
         monthly_kwargs: Dict = None,
         stats_kwargs: Dict = None,
+        persist_derived: bool = None,
         **kwargs,
     ):
         super().__init__(hole_dir, **kwargs)
+        self.persist_derived = (
+            conf.PERSIST_DERIVED_MONTHLY if persist_derived is None else persist_derived
+        )
         self.model_kwargs = {
             "header": {**(header_kwargs or {})},
-            "monthly": {**(monthly_kwargs or {})},
-            "stats": {"batch_size": 1000, **(stats_kwargs or {})},
+            "monthly": {
+                "method": "copy",
+                "skip_unchanged": True,
+                "delta": True,
+                **(monthly_kwargs or {}),
+            },
+            "stats": {
+                "method": "copy",
+                "skip_unchanged": True,
+                "delta": True,
+                **(stats_kwargs or {}),
+            },
         }
 
     async def download(
@@ -485,7 +596,7 @@ class ProdExecutor(BaseExecutor):
     ) -> int:
 
         try:
-            coros: List[Coroutine] = []
+            items: List[Tuple] = []
             for name, model, df in dataset.items():
                 if name == "header" and header_kwargs:
                     kwargs.update(header_kwargs)
@@ -494,13 +605,14 @@ class ProdExecutor(BaseExecutor):
                 elif name == "stats" and stats_kwargs:
                     kwargs.update(stats_kwargs)
 
-                coros.append(
-                    self._persist(
-                        name, model, df, **{**self.model_kwargs[name], **kwargs}
-                    )
-                )
+                if name == "monthly" and df is not None and not self.persist_derived:
+                    df = df.drop(columns=model.derived_columns, errors="ignore")
 
-            return sum(await asyncio.gather(*coros))
+                items.append((name, model, df, {**self.model_kwargs[name], **kwargs}))
+
+            count = await self._persist_many(items)
+            await self._refresh_summary(dataset.header)
+            return count
 
         except Exception as e:
             api10s = dataset.header.util.column_as_set("api10")
@@ -584,7 +696,7 @@ class GeomExecutor(BaseExecutor):
         self.model_kwargs = {
             "locations": {**(locations_kwargs or {})},
             "surveys": {**(surveys_kwargs or {})},
-            "points": {"batch_size": 1000, **(points_kwargs or {})},
+            "points": {"delta": True, **(points_kwargs or {})},
         }
 
     async def download(
@@ -701,7 +813,7 @@ class GeomExecutor(BaseExecutor):
         try:
             dataset = dataset.shapes_as_wkb()
 
-            coros: List[Coroutine] = []
+            items: List[Tuple] = []
             for name, model, df in dataset.items():
                 kwargs = {}
                 if name == "locations" and locations_kwargs:
@@ -711,13 +823,9 @@ class GeomExecutor(BaseExecutor):
                 elif name == "points" and points_kwargs:
                     kwargs = points_kwargs
 
-                coros.append(
-                    self._persist(
-                        name, model, df, **{**self.model_kwargs[name], **kwargs}
-                    )
-                )
+                items.append((name, model, df, {**self.model_kwargs[name], **kwargs}))
 
-            result: int = sum(await asyncio.gather(*coros))
+            result: int = await self._persist_many(items)
 
         except Exception as e:
             api14s = dataset.locations.util.column_as_set("api14")
@@ -779,7 +887,7 @@ class WellExecutor(BaseExecutor):
 
         self.model_kwargs = {
             "wells": {**(wells_kwargs or {})},
-            "depths": {**(depths_kwargs or {})},
+            "depths": {"delta": True, **(depths_kwargs or {})},
             "fracs": {**(fracs_kwargs or {})},
             "ips": {**(ips_kwargs or {})},
             "stats": {**(stats_kwargs or {})},
@@ -949,7 +1057,7 @@ class WellExecutor(BaseExecutor):
     ) -> int:
 
         try:
-            coros: List[Coroutine] = []
+            items: List[Tuple] = []
             for name, model, df in dataset.items():
                 if df is not None and not df.empty:
                     kwargs = {}
@@ -969,17 +1077,16 @@ class WellExecutor(BaseExecutor):
                     logger.info(
                         f"[{self.exec_id}] {self} - {name}: scheduling peristance to {model.__name__}"  # noqa
                     )
-                    coros.append(
-                        self._persist(
-                            name, model, df, **{**self.model_kwargs[name], **kwargs}
-                        )
+                    items.append(
+                        (name, model, df, {**self.model_kwargs[name], **kwargs})
                     )
                 else:
                     logger.debug(
                         f"[{self.exec_id}] {self} - {name}: no records to persist"
                     )
 
-            result: int = sum(await asyncio.gather(*coros))
+            result: int = await self._persist_many(items)
+            await self._refresh_summary(dataset.wells)
 
         except Exception as e:
             api14s = dataset.wells.util.column_as_set("api14")
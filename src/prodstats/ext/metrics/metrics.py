@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import Dict, List, Tuple, Union
 
@@ -9,7 +10,16 @@ logger = logging.getLogger(__name__)
 datadog = None
 api_endpoint = "https://api.datadoghq.com/api/"
 
-__all__ = ["load", "post", "post_event", "post_heartbeat", "to_tags"]
+__all__ = [
+    "load",
+    "metric",
+    "post",
+    "post_event",
+    "post_heartbeat",
+    "send",
+    "send_async",
+    "to_tags",
+]
 
 
 def load():
@@ -56,40 +66,84 @@ def post(
         points {Union[int, float, List[Tuple]]} -- metric value(s)
     """
     try:
-        # name = f"{project}.{name}".lower()
-        name = name.lower()
-        tags = (
-            to_tags(conf.DATADOG_DEFAULT_TAGS)
-            + to_tags(tags or [])
-            + to_tags({"service_name": {conf.project}})
-        )
+        series = metric(name, points, metric_type=metric_type, tags=tags)
         if datadog:
-            result = datadog.api.Metric.send(
-                metric=name, points=points, type=str(metric_type).lower(), tags=tags,
-            )
+            result = datadog.api.Metric.send(**series)
             if result.get("status") == "ok":
                 logger.debug(
                     "Datadog metric successfully sent: name=%s, points=%s",
-                    name,
+                    series["metric"],
                     points,
                 )
             else:
                 logger.debug(
                     "Problem sending Datadog metric: status=%s, name=%s, points=%s",
                     result.get("status"),
-                    name,
+                    series["metric"],
                     points,
                 )
         else:
             logger.debug(
                 "Datadog not configured. Suppressing metric name=%s, points=%s",
-                name,
+                series["metric"],
                 points,
             )
     except Exception as e:
         logger.debug("Failed to send Datadog metric: %s", e)
 
 
+def metric(
+    name: str,
+    points: Union[int, float, List[Tuple]],
+    metric_type: str = "count",
+    tags: list = None,
+) -> Dict:
+    """ Build a metric payload, with the default tags applied, for send() """
+    # name = f"{project}.{name}".lower()
+    return {
+        "metric": name.lower(),
+        "points": points,
+        "type": str(metric_type).lower(),
+        "tags": (
+            to_tags(conf.DATADOG_DEFAULT_TAGS)
+            + to_tags(tags or [])
+            + to_tags({"service_name": {conf.project}})
+        ),
+    }
+
+
+def send(series: List[Dict]):
+    """ Send a batch of metrics (see metric()) through the Datadog http api in a
+        single request """
+    if not series:
+        return
+    try:
+        if datadog:
+            result = datadog.api.Metric.send(metrics=series)
+            if result.get("status") == "ok":
+                logger.debug("Datadog metrics successfully sent: count=%s", len(series))
+            else:
+                logger.debug(
+                    "Problem sending Datadog metrics: status=%s, count=%s",
+                    result.get("status"),
+                    len(series),
+                )
+        else:
+            logger.debug(
+                "Datadog not configured. Suppressing %s metrics", len(series),
+            )
+    except Exception as e:
+        logger.debug("Failed to send Datadog metrics: %s", e)
+
+
+async def send_async(series: List[Dict]):
+    """ send() in the loop's default executor, so the request doesn't block the
+        event loop """
+    if series:
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, send, series)
+
+
 def post_event(title: str, text: str, tags: Union[Dict, List, str] = None):
     """ Send an event through the Datadog http api. """
     try:
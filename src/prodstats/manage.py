@@ -1,7 +1,9 @@
+import asyncio
 import logging
 import shutil
 import subprocess
 import sys
+from datetime import datetime
 from pathlib import Path
 from typing import List
 
@@ -9,7 +11,9 @@ import click
 import typer
 
 import config as conf
+import db
 import loggers
+from const import ExportDataset, ExportFormat
 from prodstats.main import app
 
 loggers.config()
@@ -164,6 +168,51 @@ def flower(celery_args):
     subprocess.call(cmd)
 
 
+@run_cli.command(
+    help="Launch a local stand-in for the IHS and FracFocus services serving synthetic data"  # noqa
+)
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8081, show_default=True)
+@click.option("--areas", default=2, show_default=True, help="number of areas")
+@click.option("--wells", default=100, show_default=True, help="wells per area")
+@click.option(
+    "--months", default=36, show_default=True, help="max months of production"
+)
+@click.option("--seed", default=0, show_default=True)
+@click.option("--latency", default=0.0, show_default=True, help="seconds per response")
+@click.option("--jitter", default=0.0, show_default=True, help="max additional seconds")
+@click.option(
+    "--error-rate", default=0.0, show_default=True, help="fraction of failures"
+)
+@click.option("--error-status", default=503, show_default=True)
+def standin(
+    host: str,
+    port: int,
+    areas: int,
+    wells: int,
+    months: int,
+    seed: int,
+    latency: float,
+    jitter: float,
+    error_rate: float,
+    error_status: int,
+):
+    import uvicorn
+    from standin import FaultConfig, SyntheticDataset, create_app
+
+    dataset = SyntheticDataset(
+        areas=areas, wells_per_area=wells, months=months, seed=seed
+    )
+    faults = FaultConfig(
+        latency=latency, jitter=jitter, error_rate=error_rate, error_status=error_status
+    )
+    typer.secho(
+        f"Serving {dataset} -- set PRODSTATS_IHS_URL and PRODSTATS_FRACFOCUS_URL to http://{host}:{port}",  # noqa
+        fg="green",
+    )
+    uvicorn.run(create_app(dataset, faults), host=host, port=port)  # nocover
+
+
 @run_cli.command(help="Manually send a task to the worker cluster")
 @click.argument("task")
 def task(task: str):
@@ -190,6 +239,64 @@ def routes():
         typer.echo(f"{r.name:<25} {r.path:<30} {r.methods}")
 
 
+@cli.command(help="Export monthly production or prodstats to an Arrow or Parquet file")
+@click.argument("dataset", type=click.Choice([x.value for x in ExportDataset]))
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice([x.value for x in ExportFormat]),
+    default=ExportFormat.PARQUET.value,
+    show_default=True,
+)
+@click.option("--column", "columns", multiple=True, help="columns to export")
+@click.option("--api10", "api10s", multiple=True, help="wells to export")
+@click.option("--basin", default=None, help="basin of the wells to export")
+@click.option("--name", "names", multiple=True, help="prodstat names to export")
+@click.option("--start-date", type=click.DateTime(["%Y-%m-%d"]), default=None)
+@click.option("--end-date", type=click.DateTime(["%Y-%m-%d"]), default=None)
+@click.option("--chunk-size", type=int, default=None, help="rows per row group")
+def export(
+    dataset: str,
+    path: str,
+    format_: str,
+    columns: List[str],
+    api10s: List[str],
+    basin: str,
+    names: List[str],
+    start_date: datetime,
+    end_date: datetime,
+    chunk_size: int,
+):
+    from db.export import Export
+
+    try:
+        exporter = Export(
+            dataset,
+            format_,
+            columns=list(columns) or None,
+            api10s=list(api10s) or None,
+            basin=basin,
+            names=list(names) or None,
+            start_date=start_date.date() if start_date else None,
+            end_date=end_date.date() if end_date else None,
+            chunk_size=chunk_size,
+        )
+    except (ImportError, ValueError) as e:
+        typer.secho(str(e), fg="red")
+        sys.exit(1)
+
+    async def run() -> int:
+        await db.startup()
+        try:
+            return await exporter.to_file(path)
+        finally:
+            await db.shutdown()
+
+    n = asyncio.get_event_loop().run_until_complete(run())
+    typer.secho(f"Exported {n} {dataset} records to {path}", fg="green")
+
+
 # --- attach groups ---------------------------------------------------------- #
 
 
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import inspect
 from datetime import datetime
-from typing import Any, Dict, List, Union
+from typing import Any, ClassVar, Dict, List, Tuple, Type, Union
 
 import orjson
 import pandas as pd
@@ -143,6 +144,134 @@ class CustomBaseSetModel(CustomBaseModel):
             df = df.set_index(index_columns)
         return df
 
+    @classmethod
+    def builder(cls) -> SetBuilder:
+        """ Get a builder to incrementally assemble a DataFrame of this set from
+            successive batches of raw records """
+        return SetBuilder(cls)
+
+
+class SetBuilder:
+    """ Accumulate the records of a set model one batch of raw records at a time. Each
+        batch is validated and flattened as it is added, so the raw batch (and the
+        response it came from) can be released before the next one arrives.
+
+        Rows are held as tuples in column order rather than as dicts, and the
+        DataFrame is assembled once at the end.
+
+        Example:
+            >>> builder = WellLocationSet.builder()
+            >>> async for data in IHSClient.iter_wells(path, api14s=api14s):
+                    builder.extend(data)
+            >>> builder.df()
+    """
+
+    def __init__(self, model: Type[CustomBaseSetModel]):
+        self.model: Type[CustomBaseSetModel] = model
+        self.field_name: str = model.__first_field__.name
+        self.columns: List[str] = model.__dataframe_columns__
+        self.rows: List[Tuple] = []
+
+    def __repr__(self):
+        return f"SetBuilder: model={self.model.__name__} records={len(self)}"
+
+    def __len__(self):
+        return len(self.rows)
+
+    def extend(self, data: List[Dict[str, Any]]) -> int:
+        """ Parse a batch of raw records and append the results to the builder.
+            Returns the number of records added. """
+        if not data:
+            return 0
+
+        return self.add(self.model(**{self.field_name: data}).records())
+
+    def add(self, records: List[Dict[str, Any]]) -> int:
+        """ Append records already parsed into the shape of the set model's records().
+            Returns the number of records added. """
+        columns = self.columns
+        self.rows.extend(tuple(rec.get(col) for col in columns) for rec in records)
+        return len(records)
+
+    def df(
+        self, create_index: bool = True, index_columns: Union[str, List[str]] = None
+    ) -> pd.DataFrame:
+        """ Build a DataFrame from the accumulated rows, using the same default
+            index as the set model's df() """
+        if index_columns is None:
+            param = inspect.signature(self.model.df).parameters.get("index_columns")
+            if param is not None and param.default is not inspect.Parameter.empty:
+                index_columns = param.default
+
+        df = pd.DataFrame.from_records(self.rows, columns=self.columns)
+        if create_index and index_columns:
+            df = df.set_index(index_columns)
+        return df
+
+
+class CustomBasePartsModel(CustomBaseModel):
+    """ A raw record parsed once into the records of several set models, so a
+        batch shared by the sets is validated a single time.
+
+        __sets__ maps the name of each part to the set model whose records it holds;
+        parts() returns the parsed records of each part by name.
+    """
+
+    __sets__: ClassVar[Dict[str, Type[CustomBaseSetModel]]] = {}
+
+    def parts(self) -> Dict[str, List[Dict[str, Any]]]:
+        raise NotImplementedError
+
+    @classmethod
+    def builder(cls) -> PartsBuilder:
+        """ Get a builder to incrementally assemble a DataFrame of each of the model's
+            sets from successive batches of raw records """
+        return PartsBuilder(cls)
+
+
+class PartsBuilder:
+    """ Accumulate the records of each set of a parts model one batch of raw records
+        at a time. Each batch is parsed once through the parts model and its parts
+        are handed to a SetBuilder per set.
+
+        Example:
+            >>> builder = WellGeometryParts.builder()
+            >>> async for data in IHSClient.iter_wells(path, api14s=api14s):
+                    builder.extend(data)
+            >>> builder.dfs()
+            {"locations": ..., "surveys": ..., "points": ...}
+    """
+
+    def __init__(self, model: Type[CustomBasePartsModel]):
+        self.model: Type[CustomBasePartsModel] = model
+        self.builders: Dict[str, SetBuilder] = {
+            name: set_model.builder() for name, set_model in model.__sets__.items()
+        }
+
+    def __repr__(self):
+        return f"PartsBuilder: model={self.model.__name__} sets={list(self.builders)}"
+
+    def __getitem__(self, name: str) -> SetBuilder:
+        return self.builders[name]
+
+    def extend(self, data: List[Dict[str, Any]]) -> int:
+        """ Parse a batch of raw records and append their parts to the builders of
+            each set. Returns the number of raw records parsed. """
+        if not data:
+            return 0
+
+        for item in parse_obj_as(List[self.model], data):  # type: ignore
+            for name, records in item.parts().items():
+                self.builders[name].add(records)
+        return len(data)
+
+    def dfs(self, create_index: bool = True) -> Dict[str, pd.DataFrame]:
+        """ Build a DataFrame of each set, by name """
+        return {
+            name: builder.df(create_index=create_index)
+            for name, builder in self.builders.items()
+        }
+
 
 class ORMBase(CustomBaseModel):
     created_at: datetime
@@ -2,11 +2,18 @@ from datetime import date, datetime
 from typing import Any, Dict, List, Optional, Union
 
 import pandas as pd
-from pydantic import Field, validator
+from pydantic import Field, constr, root_validator, validator
 
 from schemas.bases import CustomBaseModel, CustomBaseSetModel
 
-__all__ = ["ProductionRecord", "ProductionWell", "ProductionWellSet"]
+__all__ = [
+    "ProductionRecord",
+    "ProductionWell",
+    "ProductionWellSet",
+    "WellIds",
+    "WellLookup",
+    "ExportRequest",
+]
 
 
 class ProdBase(CustomBaseModel):
@@ -94,6 +101,40 @@ class ProductionWellSet(ProdSetBase):
     #     return df
 
 
+class WellIds(ProdBase):
+    """ Wells identified by api10 or api14, where an api14 stands for the well of
+        its leading ten digits, and a date range """
+
+    api10s: List[constr(min_length=10, max_length=10)] = []
+    api14s: List[constr(min_length=14, max_length=14)] = []
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+    @property
+    def all_api10s(self) -> List[str]:
+        """ The requested api10s, including those of the requested api14s """
+        return sorted({*self.api10s, *[x[:10] for x in self.api14s]})
+
+
+class WellLookup(WellIds):
+    """ Request body of the production lookups, which require at least one well """
+
+    @root_validator(skip_on_failure=True)
+    def check_ids(cls, values):
+        if not values["api10s"] and not values["api14s"]:
+            raise ValueError("at least one api10 or api14 is required")
+        return values
+
+
+class ExportRequest(WellIds):
+    """ Request body of the columnar exports. Every well is exported when no
+        api10s or api14s are given. """
+
+    columns: Optional[List[str]] = None  # all columns if omitted
+    basin: Optional[str] = None
+    names: Optional[List[str]] = None  # prodstats only
+
+
 if __name__ == "__main__":
     prodwell = {
         "api10": "1234567890",
@@ -1,7 +1,11 @@
+from typing import List, Optional
+
 from schemas.bases import CustomBaseModel, ORMBase
+from schemas.prod import WellLookup
 
 __all__ = [
     "ProdStat",
+    "ProdStatLookup",
     "ProdStatCreateIn",
     "ProdStatCreateOut",
     "ProdStatUpdateIn",
@@ -33,3 +37,7 @@ class ProdStatUpdateIn(ProdStatBase):
 
 class ProdStatUpdateOut(ProdStatBase):
     pass
+
+
+class ProdStatLookup(WellLookup):
+    names: Optional[List[str]] = None  # stat names; all stats if omitted
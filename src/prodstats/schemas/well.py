@@ -6,7 +6,7 @@ import pandas as pd
 from pydantic import Field, root_validator, validator
 from shapely.geometry import LineString, Point, asShape
 
-from schemas.bases import CustomBaseModel, CustomBaseSetModel
+from schemas.bases import CustomBaseModel, CustomBasePartsModel, CustomBaseSetModel
 from util.deco import classproperty
 
 __all__ = [
@@ -27,6 +27,8 @@ __all__ = [
     "WellSurveyPointSet",
     "WellLocation",
     "WellLocationSet",
+    "WellParts",
+    "WellGeometryParts",
 ]
 
 logger = logging.getLogger(__name__)
@@ -231,6 +233,34 @@ class WellRecordSet(WellSetBase):
         return records
 
 
+class WellParts(WellBase, CustomBasePartsModel):
+    """ A raw well parsed once into its record, depths, frac parameters and ip tests """
+
+    __sets__ = {
+        "wells": WellRecordSet,
+        "depths": WellDepthSet,
+        "fracs": FracParameterSet,
+        "ips": IPTestSet,
+    }
+
+    record: WellRecord
+    depths: WellDepths
+    frac: FracParameters
+    ips: IPTests
+
+    @root_validator(pre=True)
+    def preprocess(cls, values) -> Dict[str, Any]:
+        return {"record": values, "depths": values, "frac": values, "ips": values}
+
+    def parts(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            "wells": [self.record.record()],
+            "depths": [self.depths.dict()],
+            "fracs": [self.frac.dict()],
+            "ips": self.ips.records(),
+        }
+
+
 class WellGeometryBase(WellBase):
     class Config:
         arbitrary_types_allowed = True
@@ -378,6 +408,49 @@ class WellLocationSet(WellGeometrySetBase):
         return locations
 
 
+class WellGeometryParts(WellGeometryBase, CustomBasePartsModel):
+    """ A raw well parsed once into its locations, survey and survey points """
+
+    __sets__ = {
+        "locations": WellLocationSet,
+        "surveys": WellSurveySet,
+        "points": WellSurveyPointSet,
+    }
+
+    api14: Optional[str] = None
+    locations: List[WellLocation] = []
+    survey: Optional[WellSurvey] = None
+    points: Optional[WellSurveyPoints] = None
+
+    @root_validator(pre=True)
+    def preprocess(cls, values) -> Dict[str, Any]:
+        api14 = values.get("api14")
+
+        try:
+            survey = WellSurvey(**values) if values else None
+        except Exception:
+            logger.debug(f"{api14}: filtered row from surveys")
+            survey = None
+
+        return {
+            "api14": api14,
+            "locations": [
+                {"api14": api14, "name": key, **values[key]}
+                for key in ["shl", "bhl", "pbhl"]
+                if api14 and values.get(key)
+            ],
+            "survey": survey,
+            "points": values,
+        }
+
+    def parts(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            "locations": [x.dict() for x in self.locations],
+            "surveys": [self.survey.dict()] if self.survey else [],
+            "points": self.points.records() if self.points else [],
+        }
+
+
 if __name__ == "__main__":
     from util.jsontools import load_json
 
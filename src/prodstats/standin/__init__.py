@@ -0,0 +1,3 @@
+# flake8: noqa
+from standin.app import *
+from standin.data import *
@@ -0,0 +1,204 @@
+""" ASGI stand-in for the IHS and FracFocus services.
+
+    Serves every IHSPath and FracFocusPath endpoint from a SyntheticDataset, with
+    optional injected latency and errors. Both services are served from the same
+    app, so PRODSTATS_IHS_URL and PRODSTATS_FRACFOCUS_URL can point at the same
+    address.
+"""
+import asyncio
+import logging
+import math
+import random
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
+from starlette.requests import Request
+
+from const import FracFocusPath, IHSPath
+from standin.data import SyntheticDataset
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["FaultConfig", "create_app"]
+
+ID_PARAMS = ["api14", "api10", "id", "entity12"]
+
+
+class FaultConfig(BaseModel):
+    """ Faults injected into every response of the stand-in service """
+
+    latency: float = Field(0, ge=0)  # seconds added to each response
+    jitter: float = Field(0, ge=0)  # maximum random seconds added on top of latency
+    error_rate: float = Field(0, ge=0, le=1)  # fraction of requests that fail
+    error_status: int = Field(503, ge=400, le=599)
+
+
+def _records(
+    dataset: SyntheticDataset, hole_dir: str, func: Callable[[str], Any]
+) -> Callable:
+    async def endpoint(request: Request):
+        data: List[Dict[str, Any]] = []
+        for name in ID_PARAMS:
+            value = request.query_params.get(name)
+            if value:
+                for id in value.split(","):
+                    for api14 in dataset.resolve(name, id, hole_dir=hole_dir):
+                        data.append(func(api14))
+                break
+        return {"data": data}
+
+    return endpoint
+
+
+def _sample(
+    dataset: SyntheticDataset, hole_dir: str, func: Callable[[str], Any]
+) -> Callable:
+    async def endpoint(n: int = 5, area: str = None):
+        return {"data": [func(x) for x in dataset.sample(n, area, hole_dir=hole_dir)]}
+
+    return endpoint
+
+
+def _areas(dataset: SyntheticDataset, hole_dir: str) -> Callable:
+    async def endpoint(exclude: str = None):
+        data: List[Dict[str, Any]] = []
+        for area in dataset.areas:
+            record: Dict[str, Any] = {"name": area}
+            if exclude != "ids":
+                record["ids"] = dataset.ids(area, hole_dir)
+            data.append(record)
+        return {"data": data}
+
+    return endpoint
+
+
+def _area_ids(dataset: SyntheticDataset, hole_dir: str) -> Callable:
+    async def endpoint(area: str):
+        return {"data": [{"name": area, "ids": dataset.ids(area, hole_dir)}]}
+
+    return endpoint
+
+
+def _frac_jobs(dataset: SyntheticDataset, param_name: str) -> Callable:
+    async def endpoint(id: str):
+        jobs = [dataset.frac(api14) for api14 in dataset.resolve(param_name, id)]
+        return {"data": [x for x in jobs if x]}
+
+    return endpoint
+
+
+def _frac_registry(dataset: SyntheticDataset) -> Callable:
+    async def endpoint(Page: int = 1, pagesize: int = 5000, updated_since: str = None):
+        total_pages = max(math.ceil(len(dataset) / pagesize), 1)
+        since = datetime.fromisoformat(updated_since) if updated_since else None
+
+        data: List[Dict[str, Any]] = []
+        for api14 in dataset.iter_api14s(offset=(Page - 1) * pagesize, limit=pagesize):
+            job = dataset.frac(api14)
+            if job and (
+                since is None
+                or datetime.fromisoformat(job["provider_last_update_at"]) > since
+            ):
+                data.append(job)
+
+        return {"data": data, "Page": Page, "TotalPages": total_pages}
+
+    return endpoint
+
+
+def create_app(dataset: SyntheticDataset = None, faults: FaultConfig = None) -> FastAPI:
+    """ Create the stand-in app serving the given dataset """
+
+    dataset = dataset or SyntheticDataset()
+    app: FastAPI = FastAPI(
+        title="prodstats-standin", default_response_class=ORJSONResponse
+    )
+    app.state.dataset = dataset
+    app.state.faults = faults or FaultConfig()
+    rng = random.Random(dataset.seed)  # reproducible fault sequence
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        faults: FaultConfig = request.app.state.faults
+        if request.url.path.startswith("/_standin"):
+            return await call_next(request)
+
+        delay = faults.latency + (rng.uniform(0, faults.jitter) if faults.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if faults.error_rate and rng.random() < faults.error_rate:
+            return ORJSONResponse(
+                {"detail": "injected error"}, status_code=faults.error_status
+            )
+
+        return await call_next(request)
+
+    # --- ihs ---------------------------------------------------------------- #
+
+    for path in IHSPath.members():
+        kind, hole_dir, *rest = path.value.split("/")
+        hole_dir = hole_dir.upper()
+        suffix = rest[0] if rest else None
+
+        if kind == "prod":
+            func = (
+                dataset.production_header if suffix == "headers" else dataset.production
+            )
+        elif suffix == "geoms":
+            func = dataset.geom
+        else:
+            func = dataset.well
+
+        url = f"/{path.value}"
+        if suffix == "ids":
+            app.add_api_route(url, _areas(dataset, hole_dir), name=path.name)
+            app.add_api_route(
+                f"{url}/{{area}}",
+                _area_ids(dataset, hole_dir),
+                name=f"{path.name}_area",
+            )
+        elif suffix == "sample":
+            app.add_api_route(url, _sample(dataset, hole_dir, func), name=path.name)
+        else:
+            app.add_api_route(url, _records(dataset, hole_dir, func), name=path.name)
+
+    # --- fracfocus ---------------------------------------------------------- #
+
+    for path in [FracFocusPath.api14, FracFocusPath.api10]:
+        app.add_api_route(
+            f"/{path.value}/{{id}}",
+            _frac_jobs(dataset, path.value),
+            name=f"fracfocus_{path.name}",
+        )
+    app.add_api_route(
+        f"/{FracFocusPath.jobs.value}",
+        _frac_registry(dataset),
+        name=f"fracfocus_{FracFocusPath.jobs.name}",
+    )
+
+    # --- control ------------------------------------------------------------ #
+
+    @app.get("/_standin/dataset")
+    async def get_dataset():
+        return {
+            "areas": dataset.areas,
+            "wells_per_area": dataset.wells_per_area,
+            "months": dataset.months,
+            "seed": dataset.seed,
+        }
+
+    @app.get("/_standin/faults")
+    async def get_faults():
+        return app.state.faults.dict()
+
+    @app.put("/_standin/faults")
+    async def set_faults(faults: FaultConfig):
+        app.state.faults = faults
+        logger.warning(f"(standin) injecting faults: {faults}")
+        return faults.dict()
+
+    return app
@@ -0,0 +1,446 @@
+""" Deterministic synthetic records shaped like the responses of the IHS and
+    FracFocus services (see tests/fixtures/*.json).
+
+    Every record is derived from its identifiers and the dataset seed, so any
+    well can be generated on demand without materializing the whole dataset and
+    the same request always returns the same data.
+"""
+import calendar
+import math
+import random
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+__all__ = ["SyntheticDataset"]
+
+STATE_CODE = 42
+COUNTY_CODE_START = 301
+OPERATORS = [
+    "PIONEER NATURAL RES USA INC",
+    "CHEVRON U S A INC",
+    "DIAMONDBACK E&P LLC",
+    "ENDEAVOR ENERGY RESOURCES LP",
+    "OVINTIV USA INC",
+]
+STATUSES = {
+    "H": ["OIL PRODUCER", "OIL PRODUCER", "OIL PRODUCER", "TREATD", "WELL PERMIT"],
+    "V": ["OIL PRODUCER", "OIL PRODUCER", "DRY & ABANDONED", "OIL-WO"],
+}
+FT_PER_DEGREE = 364000  # approximate, at permian latitudes
+MAX_WELLS_PER_AREA = 100000  # 5 digit well number within a county
+
+
+class SyntheticDataset:
+    """ A synthetic universe of wells spread across a number of areas (counties).
+
+        Wells are identified as 42{county}{well number}0000. Every fifth well is
+        vertical, the rest are horizontal. Production runs for up to `months` months
+        ending on `end_date`.
+    """
+
+    def __init__(
+        self,
+        areas: int = 2,
+        wells_per_area: int = 100,
+        months: int = 36,
+        seed: int = 0,
+        end_date: date = date(2020, 3, 1),
+        frac_coverage: float = 0.6,
+        survey_interval: int = 100,
+    ):
+        if wells_per_area > MAX_WELLS_PER_AREA:
+            raise ValueError(f"wells_per_area cannot exceed {MAX_WELLS_PER_AREA}")
+        self.area_count = areas
+        self.wells_per_area = wells_per_area
+        self.months = months
+        self.seed = seed
+        self.end_date = end_date.replace(day=1)
+        self.frac_coverage = frac_coverage
+        self.survey_interval = survey_interval
+
+    def __repr__(self):
+        return (
+            f"SyntheticDataset: {self.area_count} areas x {self.wells_per_area} wells "
+            f"(seed={self.seed})"
+        )
+
+    def __len__(self):
+        return self.area_count * self.wells_per_area
+
+    def _rng(self, *keys: Any) -> random.Random:
+        return random.Random(":".join([str(self.seed), *[str(k) for k in keys]]))
+
+    # --- identifiers -------------------------------------------------------- #
+
+    @property
+    def areas(self) -> List[str]:
+        return [f"tx-synthetic{idx:02d}" for idx in range(self.area_count)]
+
+    def _county_code(self, area_idx: int) -> int:
+        return COUNTY_CODE_START + area_idx * 2
+
+    def _api14(self, area_idx: int, well_idx: int) -> str:
+        return f"{STATE_CODE}{self._county_code(area_idx):03d}{well_idx:05d}0000"
+
+    def _parse_api(self, api: str) -> Optional[Tuple[int, int]]:
+        """ Get the (area index, well index) of an api10/api14, or None if the well
+            is not part of the dataset """
+        api = str(api)
+        if len(api) < 10 or not api[:10].isdigit() or int(api[:2]) != STATE_CODE:
+            return None
+        area_idx, remainder = divmod(int(api[2:5]) - COUNTY_CODE_START, 2)
+        well_idx = int(api[5:10])
+        if remainder or not 0 <= area_idx < self.area_count:
+            return None
+        if well_idx >= self.wells_per_area:
+            return None
+        return area_idx, well_idx
+
+    def _entity12(self, area_idx: int, well_idx: int) -> str:
+        return f"14{self._county_code(area_idx):03d}{well_idx:07d}"
+
+    def _parse_entity(self, entity: str) -> Optional[Tuple[int, int]]:
+        entity = str(entity)[:12]
+        if len(entity) < 12 or not entity.isdigit():
+            return None
+        return self._parse_api(f"{STATE_CODE}{entity[2:5]}{entity[7:12]}")
+
+    def hole_direction(self, well_idx: int) -> str:
+        return "V" if well_idx % 5 == 0 else "H"
+
+    def ids(self, area: str, hole_dir: str) -> List[str]:
+        """ All api14s in an area with the given hole direction """
+        if area not in self.areas:
+            return []
+        area_idx = self.areas.index(area)
+        return [
+            self._api14(area_idx, idx)
+            for idx in range(self.wells_per_area)
+            if self.hole_direction(idx) == hole_dir
+        ]
+
+    def iter_api14s(self, offset: int = 0, limit: int = None) -> Iterator[str]:
+        """ Iterate the api14s of all wells in the dataset """
+        stop = len(self) if limit is None else min(offset + limit, len(self))
+        for idx in range(offset, stop):
+            yield self._api14(*divmod(idx, self.wells_per_area))
+
+    def resolve(self, param_name: str, value: str, hole_dir: str = None) -> List[str]:
+        """ Resolve the value of a request parameter (api14, api10, id, entity12) to
+            the api14s it refers to, optionally limited to a hole direction """
+        if param_name in ["id", "entity12"]:
+            parsed = self._parse_entity(value)
+        else:
+            parsed = self._parse_api(value)
+
+        if not parsed:
+            return []
+        if hole_dir and self.hole_direction(parsed[1]) != hole_dir:
+            return []
+        return [self._api14(*parsed)]
+
+    # --- records ------------------------------------------------------------ #
+
+    def _profile(self, api14: str) -> Dict[str, Any]:
+        """ The attributes shared by every record of a well """
+        area_idx, well_idx = self._parse_api(api14)  # type: ignore
+        rng = self._rng(api14)
+        hole_dir = self.hole_direction(well_idx)
+        tvd = rng.randint(6500, 11000)
+        lateral = rng.randint(4500, 12500) if hole_dir == "H" else 0
+        prod_months = rng.randint(1, self.months)
+        first_prod = _add_months(self.end_date, -(prod_months - 1))
+        spud = first_prod - timedelta(days=rng.randint(90, 240))
+        operator = rng.choice(OPERATORS)
+        return {
+            "area_idx": area_idx,
+            "well_idx": well_idx,
+            "hole_dir": hole_dir,
+            "tvd": tvd,
+            "md": tvd + lateral + (rng.randint(300, 900) if lateral else 0),
+            "lateral": lateral,
+            "bearing": rng.uniform(0, 2 * math.pi),
+            "lon": -102.5 + area_idx * 0.3 + (well_idx % 100) * 0.002,
+            "lat": 31.5 + (well_idx // 100) * 0.002,
+            "operator": operator,
+            "status": rng.choice(STATUSES[hole_dir]),
+            "permit": spud - timedelta(days=rng.randint(30, 180)),
+            "spud": spud,
+            "comp": spud + timedelta(days=rng.randint(30, 90)),
+            "first_prod": first_prod,
+            "prod_months": prod_months,
+            "last_update_at": datetime(
+                self.end_date.year, self.end_date.month, 1, tzinfo=timezone.utc
+            )
+            + timedelta(minutes=rng.randint(0, 60 * 24 * 28)),
+        }
+
+    def _base(self, api14: str, p: Dict[str, Any]) -> Dict[str, Any]:
+        county_code = self._county_code(p["area_idx"])
+        return {
+            "api14": api14,
+            "api10": api14[:10],
+            "status": p["status"],
+            "provider": "IHS",
+            "last_update_at": p["last_update_at"].replace(tzinfo=None).isoformat(),
+            "hole_direction": p["hole_dir"],
+            "county_code": county_code,
+            "state_code": STATE_CODE,
+        }
+
+    def well(self, api14: str) -> Dict[str, Any]:
+        p = self._profile(api14)
+        rng = self._rng(api14, "well")
+        fluid = rng.randint(150000, 450000) if p["lateral"] else None
+        proppant = rng.randint(8000000, 30000000) if p["lateral"] else None
+        perf_upper = p["tvd"] + 300 if p["lateral"] else None
+        perf_lower = p["md"] if p["lateral"] else None
+        return {
+            **self._base(api14, p),
+            "well_name": f"SYNTHETIC {p['well_idx']:05d}{p['hole_dir']}",
+            "products": "O&G",
+            "county": self.areas[p["area_idx"]].split("-")[-1].upper(),
+            "state": "TEXAS",
+            "operator": p["operator"],
+            "operator_alias": p["operator"],
+            "operator_original": p["operator"],
+            "operator_city": "MIDLAND",
+            "operator_original_alias": p["operator"],
+            "operator_original_code": str(1000 + OPERATORS.index(p["operator"])),
+            "operator_original_city": "MIDLAND",
+            "basin": "PERMIAN BASIN",
+            "sub_basin": "MIDLAND BASIN (PERMIAN BASIN)",
+            "permit_number": str(800000 + p["well_idx"]),
+            "permit_status": "APPROVED",
+            "tvd": p["tvd"],
+            "tvd_uom": "FT",
+            "md": p["md"],
+            "md_uom": "FT",
+            "plugback_depth": None,
+            "plugback_depth_uom": None,
+            "dates": {
+                "permit": p["permit"].isoformat(),
+                "spud": p["spud"].isoformat(),
+                "comp": p["comp"].isoformat(),
+                "rig_release": None,
+                "ihs_last_update": p["last_update_at"].date().isoformat(),
+            },
+            "statuses": {"current": p["status"], "current_code": p["status"]},
+            "elevations": {
+                "ground": rng.randint(2500, 3200),
+                "ground_uom": "FT",
+                "kb": None,
+                "kb_uom": None,
+            },
+            "frac": {
+                "fluid_total": fluid,
+                "fluid_total_uom": "BBL" if fluid else None,
+                "proppant_total": proppant,
+                "proppant_total_uom": "LB" if proppant else None,
+            },
+            "area_rights_value": rng.randint(320, 6400),
+            "area_rights_uom": "ACRE",
+            "product_primary": "O&G",
+            "perf_upper": perf_upper,
+            "perf_upper_uom": "FT" if perf_upper else None,
+            "perf_lower": perf_lower,
+            "perf_lower_uom": "FT" if perf_lower else None,
+            "perfll": p["lateral"] or None,
+            "ip": [],
+        }
+
+    def geom(self, api14: str) -> Dict[str, Any]:
+        p = self._profile(api14)
+        shl = (p["lon"], p["lat"])
+        points: List[Dict[str, Any]] = []
+        for md in [
+            *range(self.survey_interval, p["md"], self.survey_interval),
+            p["md"],
+        ]:
+            if md <= p["tvd"] or not p["lateral"]:  # vertical section, slight drift
+                tvd, dip = md, 0.3
+            else:
+                tvd, dip = p["tvd"], 90.0
+            points.append(
+                {
+                    "dip": dip,
+                    "md": md,
+                    "geom": _point(*self._survey_offset(shl, p, md)),
+                    "tvd": tvd,
+                }
+            )
+        bhl = self._survey_offset(shl, p, p["md"])
+        location = {
+            "block": "40",
+            "section": "22",
+            "abstract": "1115",
+            "survey": "T&P RR CO",
+        }
+        return {
+            **self._base(api14, p),
+            "well_name": f"SYNTHETIC {p['well_idx']:05d}{p['hole_dir']}",
+            "shl": {**location, "metes_bounds": None, "geom": _point(*shl)},
+            "bhl": {**location, "metes_bounds": None, "geom": _point(*bhl)},
+            "pbhl": {**location, "metes_bounds": None, "geom": _point(*bhl)},
+            "survey": {
+                "survey_type": "DIR SURVEY",
+                "survey_method": "MWD",
+                "survey_end_date": p["comp"].isoformat(),
+                "survey_top": points[0]["md"] if points else None,
+                "survey_top_uom": "FT",
+                "survey_base": p["md"],
+                "survey_base_uom": "FT",
+                "line": {
+                    "type": "LineString",
+                    "coordinates": [shl] + [pt["geom"]["coordinates"] for pt in points],
+                },
+                "points": points,
+            },
+        }
+
+    @staticmethod
+    def _survey_offset(
+        shl: Tuple[float, float], p: Dict[str, Any], md: int
+    ) -> Tuple[float, float]:
+        drift = min(md, p["tvd"]) * 0.005
+        lateral = max(md - p["tvd"], 0) if p["lateral"] else 0
+        return _offset(shl, drift + lateral, p["bearing"])
+
+    def production_header(self, api14: str) -> Dict[str, Any]:
+        p = self._profile(api14)
+        entity12 = self._entity12(p["area_idx"], p["well_idx"])
+        last_prod = _add_months(p["first_prod"], p["prod_months"] - 1)
+        return {
+            **self._base(api14, p),
+            "entity": f"{entity12}{p['hole_dir']}",
+            "entity12": entity12,
+            "status": "ACTIVE",
+            "operator_alias": p["operator"],
+            "products": "O",
+            "production_type": "ALLOCATED",
+            "product_primary": "CRUDE OIL",
+            "perf_upper": None,
+            "perf_upper_uom": None,
+            "perf_lower": None,
+            "perf_lower_uom": None,
+            "perfll": p["lateral"] or None,
+            "dates": {
+                "first_prod": p["first_prod"].isoformat(),
+                "last_prod": _month_end(last_prod).isoformat(),
+                "first_oil": p["first_prod"].isoformat(),
+                "first_gas": p["first_prod"].isoformat(),
+                "first_water": None,
+                "ihs_last_update": p["last_update_at"].date().isoformat(),
+            },
+            "statuses": {
+                "current": "ACTIVE",
+                "current_code": "A",
+                "original": "ACTIVE",
+                "original_code": "A",
+            },
+            "gatherers": {
+                "liquid_name": "UNKNOWN",
+                "liquid_alias": "UNKWN",
+                "gas_name": p["operator"],
+                "gas_alias": p["operator"][:5],
+            },
+            "well_counts": {"active_producing": 1, "active_total": 1, "total": 1},
+        }
+
+    def production(self, api14: str) -> Dict[str, Any]:
+        """ Production header with monthly volumes following a hyperbolic decline """
+        p = self._profile(api14)
+        rng = self._rng(api14, "production")
+        qi = rng.randint(2000, 30000) * (2 if p["lateral"] else 1)
+        di, b = rng.uniform(0.08, 0.2), rng.uniform(0.8, 1.4)
+        gor = rng.randint(400, 3000)
+        water_ratio = rng.uniform(0.5, 3.0)
+
+        monthly: List[Dict[str, Any]] = []
+        for t in range(p["prod_months"]):
+            first = _add_months(p["first_prod"], t)
+            last = _month_end(first)
+            oil = int(qi / (1 + b * di * t) ** (1 / b) * rng.uniform(0.9, 1.1))
+            gas = int(oil * gor / 1000)
+            water = int(oil * water_ratio)
+            monthly.append(
+                {
+                    "year": first.year,
+                    "month": first.month,
+                    "last_day": last.day,
+                    "first_date": first.isoformat(),
+                    "last_date": last.isoformat(),
+                    "liquid": oil,
+                    "liquid_uom": "BBL",
+                    "gas": gas,
+                    "gas_uom": "MCF",
+                    "casinghead_gas": gas,
+                    "casinghead_gas_uom": "MCF",
+                    "water": water,
+                    "water_uom": "BBL",
+                    "gor": gor,
+                    "gor_uom": "CFB",
+                    "water_cut": round(water / (oil + water), 2)
+                    if oil + water
+                    else None,
+                    "well_count": 1,
+                    "oil_well_count": 1,
+                }
+            )
+        return {**self.production_header(api14), "production": monthly}
+
+    def frac(self, api14: str) -> Optional[Dict[str, Any]]:
+        """ FracFocus job for the well, if the well has one """
+        rng = self._rng(api14, "frac")
+        if rng.random() >= self.frac_coverage:
+            return None
+        p = self._profile(api14)
+        fluid = rng.randint(100000, 450000)
+        proppant = rng.randint(5000000, 30000000)
+        return {
+            "total_base_water_volume": fluid * 42,
+            "provider_last_update_at": p["last_update_at"].isoformat(),
+            "ingredient_mass": proppant,
+            "mass_diff_pct": round(rng.uniform(-1, 1), 2),
+            "water_mass": fluid * 350,
+            "hf_job_pct": round(rng.uniform(10, 25), 2),
+            "api14": api14,
+            "prop_mass": proppant,
+            "api10": api14[:10],
+            "total_base_water_uom": "GAL",
+            "fluid": fluid,
+            "fluid_uom": "BBL",
+            "proppant": proppant,
+            "proppant_uom": "LB",
+            "provider": "FracFocus",
+        }
+
+    def sample(self, n: int, area: str = None, hole_dir: str = "H") -> List[str]:
+        """ Reproducible sample of api14s """
+        areas = [area] if area else self.areas
+        population = [api14 for a in areas for api14 in self.ids(a, hole_dir)]
+        return self._rng("sample", n, area, hole_dir).sample(
+            population, min(n, len(population))
+        )
+
+
+def _add_months(dt: date, months: int) -> date:
+    idx = dt.year * 12 + dt.month - 1 + months
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def _month_end(dt: date) -> date:
+    return dt.replace(day=calendar.monthrange(dt.year, dt.month)[1])
+
+
+def _offset(
+    origin: Tuple[float, float], feet: float, bearing: float
+) -> Tuple[float, float]:
+    lon, lat = origin
+    dlat = feet * math.cos(bearing) / FT_PER_DEGREE
+    dlon = feet * math.sin(bearing) / (FT_PER_DEGREE * math.cos(math.radians(lat)))
+    return lon + dlon, lat + dlat
+
+
+def _point(lon: float, lat: float) -> Dict[str, Any]:
+    return {"type": "Point", "coordinates": [lon, lat]}
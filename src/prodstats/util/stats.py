@@ -0,0 +1,64 @@
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class Histogram:
+    """ Counts of observed values in fixed buckets, with their total count, sum and
+        maximum. Memory is constant however many values are observed.
+
+        Percentiles are estimated by interpolating within the bucket holding the
+        rank, and never exceed the largest value observed.
+
+        Example:
+            >>> h = Histogram(buckets=(0.1, 1, math.inf))
+            >>> h.observe(0.05)
+            >>> h.cumulative()
+            {"0.1": 1, "1": 1, "inf": 1}
+    """
+
+    def __init__(self, buckets: Iterable[float]):
+        bounds = sorted(set(buckets))
+        if not bounds or bounds[-1] != math.inf:
+            bounds.append(math.inf)
+        self.buckets: Tuple[float, ...] = tuple(bounds)
+        self.counts: List[int] = [0] * len(self.buckets)
+        self.count: int = 0
+        self.sum: float = 0
+        self.max: Optional[float] = None
+
+    def __repr__(self):
+        return f"Histogram: {self.count} values"
+
+    def observe(self, value: float):
+        for idx, le in enumerate(self.buckets):
+            if value <= le:
+                self.counts[idx] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """ Estimated percentile of the observed values (0 < q <= 100) """
+        if not self.count:
+            return None
+
+        rank = q / 100 * self.count
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[idx - 1] if idx > 0 else 0
+                upper = min(self.buckets[idx], self.max)
+                value = lower + (upper - lower) * (rank - seen) / n
+                return min(max(value, 0), self.max)
+            seen += n
+        return self.max
+
+    def cumulative(self) -> Dict[str, int]:
+        """ Cumulative counts keyed by bucket upper bound """
+        result: Dict[str, int] = {}
+        total = 0
+        for le, n in zip(self.buckets, self.counts):
+            total += n
+            result[str(le)] = total
+        return result
@@ -0,0 +1,47 @@
+import logging
+
+import pytest
+import starlette.status as codes
+
+import db.export
+from const import ExportFormat
+
+logger = logging.getLogger(__name__)
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestExportEndpoint:
+    path: str = "/api/v1/export"
+
+    async def test_export(self, client):
+        pa = pytest.importorskip("pyarrow")
+        response = await client.post(
+            f"{self.path}/prodstats",
+            json={"columns": ["api10", "name", "value"]},
+            query_string={"format": "arrow"},
+        )
+        assert response.status_code == codes.HTTP_200_OK
+        assert (
+            response.headers["content-type"]
+            == db.export.MEDIA_TYPES[ExportFormat.ARROW]
+        )
+        assert "prodstats.arrows" in response.headers["content-disposition"]
+        table = pa.ipc.open_stream(response.content).read_all()
+        assert table.schema.names == ["api10", "name", "value"]
+
+    async def test_export_unknown_column(self, client):
+        pytest.importorskip("pyarrow")
+        response = await client.post(
+            f"{self.path}/production_monthly", json={"columns": ["zaza"]}
+        )
+        assert response.status_code == codes.HTTP_400_BAD_REQUEST
+
+    async def test_export_unknown_dataset(self, client):
+        response = await client.post(f"{self.path}/zaza")
+        assert response.status_code == codes.HTTP_422_UNPROCESSABLE_ENTITY
+
+    async def test_export_without_pyarrow(self, client, monkeypatch):
+        monkeypatch.setattr(db.export, "pa", None)
+        response = await client.post(f"{self.path}/prodstats")
+        assert response.status_code == codes.HTTP_501_NOT_IMPLEMENTED
@@ -12,3 +12,19 @@ async def test_healthcheck(client):
     response = await client.get("/api/v1/health")
     assert response.status_code == codes.HTTP_200_OK
     assert {"status": "ok"} == response.json()
+
+
+async def test_db_healthcheck(client):
+    response = await client.get("/api/v1/health/db")
+    assert response.status_code == codes.HTTP_200_OK
+    data = response.json()
+    assert {"size", "in_use", "idle", "waiting"} <= set(data["pool"])
+    assert "wait_p95" in data["acquire"]
+
+
+async def test_db_queries(client):
+    response = await client.get("/api/v1/health/db/queries", query_string={"limit": 5})
+    assert response.status_code == codes.HTTP_200_OK
+    data = response.json()
+    assert {"threshold", "sample_rate", "operations", "slow"} <= set(data)
+    assert len(data["slow"]) <= 5
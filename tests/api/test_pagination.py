@@ -1,6 +1,10 @@
 import logging
+import time
+from datetime import date
+from decimal import Decimal
 
 import pytest
+import sqlalchemy as sa
 from async_asgi_testclient import TestClient
 from asyncpg.exceptions import UndefinedColumnError
 from fastapi import Depends, FastAPI
@@ -8,7 +12,16 @@ from httpx import URL
 from starlette.requests import Request
 from starlette.responses import Response
 
-from api.helpers import Pagination
+from api.dependencies import Pagination
+from api.dependencies.pagination import (
+    CountCache,
+    count_cache,
+    decode_cursor,
+    encode_cursor,
+    sortable_columns,
+)
+from const import CountMode
+from db import db
 from tests.models import TestModel as Model
 from tests.schemas import Test as ModelSchema
 
@@ -53,6 +66,13 @@ def request_obj():
     )
 
 
+@pytest.fixture(autouse=True)
+def clear_count_cache():
+    count_cache.clear()
+    yield
+    count_cache.clear()
+
+
 @pytest.fixture(autouse=True)
 async def seed_model(bind):
     for x in range(0, 30):
@@ -153,7 +173,7 @@ class TestPaginationCore:
         limit = 10
 
         result = await Pagination(
-            request_obj, offset=0, limit=limit, sort="created_at", desc=True, filter="",
+            request_obj, offset=0, limit=limit, sort="updated_at", desc=True, filter="",
         ).paginate(Model, serializer=ModelSchema)
 
         assert result["count"] == 30
@@ -168,7 +188,7 @@ class TestPaginationCore:
             request_obj,
             offset=20,
             limit=limit,
-            sort="created_at",
+            sort="updated_at",
             desc=True,
             filter="",
         ).paginate(Model, serializer=ModelSchema)
@@ -185,7 +205,7 @@ class TestPaginationCore:
             request_obj,
             offset=10,
             limit=limit,
-            sort="created_at",
+            sort="updated_at",
             desc=True,
             filter="",
         ).paginate(Model, serializer=ModelSchema)
@@ -202,7 +222,7 @@ class TestPaginationCore:
             request_obj,
             offset=0,
             limit=limit,
-            sort="created_at",
+            sort="updated_at",
             desc=True,
             filter="id < 10",
         ).paginate(Model, serializer=ModelSchema)
@@ -219,7 +239,7 @@ class TestPaginationCore:
             request_obj,
             offset=5,
             limit=limit,
-            sort="created_at",
+            sort="updated_at",
             desc=True,
             filter="id < 15",
         ).paginate(Model, serializer=ModelSchema)
@@ -236,7 +256,7 @@ class TestPaginationCore:
             request_obj,
             offset=5,
             limit=limit,
-            sort="created_at",
+            sort="updated_at",
             desc=True,
             filter="id < 15",
         ).paginate(Model, serializer=None)
@@ -254,7 +274,7 @@ class TestPaginationCore:
                 request_obj,
                 offset=5,
                 limit=limit,
-                sort="created_at",
+                sort="updated_at",
                 desc=True,
                 filter="fake_column < 15",
             ).paginate(Model, serializer=None)
@@ -270,7 +290,7 @@ class TestPaginationWithLinks:
         limit = 10
 
         result, headers = await Pagination(
-            request_obj, offset=0, limit=limit, sort="created_at", desc=True, filter="",
+            request_obj, offset=0, limit=limit, sort="updated_at", desc=True, filter="",
         ).paginate_links(Model, serializer=ModelSchema)
 
         links = headers["link"]
@@ -289,7 +309,7 @@ class TestPaginationWithLinks:
             request_obj,
             offset=20,
             limit=limit,
-            sort="created_at",
+            sort="updated_at",
             desc=True,
             filter="",
         ).paginate_links(Model, serializer=ModelSchema)
@@ -310,7 +330,7 @@ class TestPaginationWithLinks:
             request_obj,
             offset=10,
             limit=limit,
-            sort="created_at",
+            sort="updated_at",
             desc=True,
             filter="",
         ).paginate_links(Model, serializer=ModelSchema)
@@ -330,7 +350,7 @@ class TestPaginationWithLinks:
             request_obj,
             offset=0,
             limit=limit,
-            sort="created_at",
+            sort="updated_at",
             desc=True,
             filter=f"id < {limit}",
         ).paginate_links(Model, serializer=ModelSchema)
@@ -352,7 +372,7 @@ class TestPaginationWithLinks:
             request_obj,
             offset=5,
             limit=limit,
-            sort="created_at",
+            sort="updated_at",
             desc=True,
             filter="id < 15",
         ).paginate_links(Model, serializer=ModelSchema)
@@ -364,3 +384,206 @@ class TestPaginationWithLinks:
         assert headers["x-total-count"] == 15
         assert prev is not None
         assert next is not None
+
+
+class TestKeysetPagination:
+    async def test_next_link_carries_cursor(self, bind, request_obj):
+        result = await Pagination(
+            request_obj, offset=0, limit=10, sort="id", desc=False, filter=None,
+        ).paginate(Model, serializer=ModelSchema)
+
+        assert "cursor=" in result["next"]
+        assert "offset=" not in result["next"]
+        assert [x.id for x in result["data"]] == list(range(10))
+
+    async def test_cursor_pages(self, bind, request_obj):
+        first = Pagination(
+            request_obj, offset=0, limit=10, sort="id", desc=False, filter=None,
+        )
+        await first.paginate(Model)
+
+        second = Pagination(
+            request_obj,
+            offset=0,
+            limit=10,
+            sort="id",
+            desc=False,
+            filter=None,
+            cursor=first.next_cursor,
+        )
+        result = await second.paginate(Model)
+        assert [x.id for x in result["data"]] == list(range(10, 20))
+        assert result["prev"] is not None
+
+        previous = Pagination(
+            request_obj,
+            offset=0,
+            limit=10,
+            sort="id",
+            desc=False,
+            filter=None,
+            cursor=second.prev_cursor,
+        )
+        result = await previous.paginate(Model)
+        assert [x.id for x in result["data"]] == list(range(10))
+        assert result["prev"] is None
+        assert result["next"] is not None
+
+    async def test_cursor_pages_descending_with_filter(self, bind, request_obj):
+        kwargs = dict(offset=0, limit=4, sort="updated_at", desc=True)
+        kwargs["filter"] = "id < 10"
+        pages = []
+        cursor = None
+        while True:
+            pager = Pagination(request_obj, cursor=cursor, **kwargs)
+            result = await pager.paginate(Model)
+            pages.append([x.id for x in result["data"]])
+            cursor = pager.next_cursor
+            if cursor is None:
+                break
+
+        assert [len(x) for x in pages] == [4, 4, 2]
+        assert sorted(sum(pages, [])) == list(range(10))
+
+    @pytest.mark.parametrize("desc", [True, False])
+    async def test_cursor_pages_across_null_sort_values(self, bind, request_obj, desc):
+        await Model.update.values(updated_at=None).where(
+            Model.id % 3 == 0
+        ).gino.status()
+        kwargs = dict(offset=0, limit=4, sort="updated_at", desc=desc, filter=None)
+
+        pages = []
+        pager = None
+        while pager is None or pager.next_cursor:
+            cursor = pager.next_cursor if pager else None
+            pager = Pagination(request_obj, cursor=cursor, **kwargs)
+            result = await pager.paginate(Model)
+            pages.append([x.id for x in result["data"]])
+
+        ids = sum(pages, [])
+        assert sorted(ids) == list(range(30))
+        assert {x for x in ids[-10:]} == {x for x in range(30) if x % 3 == 0}
+
+        # and back to the first page
+        backward = [pages[-1]]
+        while pager.prev_cursor:
+            pager = Pagination(request_obj, cursor=pager.prev_cursor, **kwargs)
+            result = await pager.paginate(Model)
+            backward.insert(0, [x.id for x in result["data"]])
+        assert backward == pages
+
+    async def test_follow_cursor_links(self):
+        async with TestClient(app) as client:
+            response = await client.get("/test/pagination/?limit=7&sort=id&desc=false")
+            ids = [x["id"] for x in response.json()["data"]]
+            while response.json()["next"]:
+                url = URL(response.json()["next"])
+                response = await client.get(f"{url.path}?{url.query}")
+                assert response.status_code == 200
+                ids += [x["id"] for x in response.json()["data"]]
+
+            assert ids == list(range(30))
+
+    async def test_sort_restricted_to_indexed_columns(self):
+        async with TestClient(app) as client:
+            response = await client.get("/test/pagination/?sort=name")
+            assert response.status_code == 400
+
+            response = await client.get("/test/pagination/?sort=id;drop table x")
+            assert response.status_code == 400
+
+    async def test_invalid_cursor(self):
+        async with TestClient(app) as client:
+            response = await client.get("/test/pagination/?cursor=zaza")
+            assert response.status_code == 400
+
+    async def test_sortable_columns(self):
+        assert sortable_columns(Model) == ["id", "updated_at"]
+
+    @pytest.mark.parametrize(
+        "types,values",
+        [
+            ([sa.Integer(), sa.String()], [1, "a"]),
+            (
+                [sa.Date(), sa.Numeric(), sa.String()],
+                [date(2020, 1, 1), Decimal("1.5"), None],
+            ),
+        ],
+    )
+    async def test_cursor_roundtrip(self, types, values):
+        columns = [sa.Column(f"c{i}", x) for i, x in enumerate(types)]
+        cursor = encode_cursor("prev", values)
+        assert decode_cursor(cursor, columns) == ("prev", values)
+
+
+class TestCountModes:
+    async def test_exact_count_cached(self, bind, request_obj):
+        result = await Pagination(
+            request_obj, offset=0, limit=10, sort="id", desc=True, filter="id < 20"
+        ).paginate(Model)
+        assert result["count"] == 20
+        assert result["count_mode"] == "exact"
+
+        await Model.create(id=-1)
+        pager = Pagination(
+            request_obj, offset=0, limit=10, sort="id", desc=True, filter="id < 20"
+        )
+        result = await pager.paginate(Model)
+        assert result["count"] == 20
+
+        count_cache.clear()
+        assert await pager.count() == 21
+
+    async def test_estimated_count(self, bind, request_obj):
+        await db.status("ANALYZE test_model")
+        pager = Pagination(
+            request_obj,
+            offset=0,
+            limit=10,
+            sort="id",
+            desc=True,
+            filter=None,
+            count=CountMode.ESTIMATED,
+        )
+        result = await pager.paginate(Model)
+        assert result["count"] == 30
+        assert result["count_mode"] == "estimated"
+
+        assert await pager.estimate("id < 15") > 0
+
+    async def test_no_count(self, bind, request_obj):
+        data, headers = await Pagination(
+            request_obj,
+            offset=0,
+            limit=10,
+            sort="id",
+            desc=True,
+            filter=None,
+            count=CountMode.NONE,
+        ).paginate_links(Model)
+        assert headers["x-total-count"] is None
+        assert any('rel="next"' in x for x in headers["link"])
+
+        response = Pagination(request_obj).set_headers(Response(""), headers)
+        assert "x-total-count" not in response.headers
+        assert response.headers["x-total-count-mode"] == "none"
+
+    async def test_count_mode_query_param(self):
+        async with TestClient(app) as client:
+            response = await client.get("/test/pagination/links/?count=none")
+            assert response.status_code == 200
+            assert response.headers["x-total-count"] == "None"
+
+            response = await client.get("/test/pagination/?count=zaza")
+            assert response.status_code == 422
+
+    async def test_count_cache_expires(self):
+        cache = CountCache(ttl=0.01, size=2)
+        cache.set(Model, "id < 1", 1)
+        assert cache.get(Model, "id < 1") == 1
+        cache.set(Model, "id < 2", 2)
+        cache.set(Model, "id < 3", 3)
+        assert len(cache.counts) == 2
+
+        time.sleep(0.02)
+        assert cache.get(Model, "id < 3") is None
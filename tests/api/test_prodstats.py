@@ -1,82 +1,94 @@
-# import logging
-
-# import pandas as pd
-# import pytest
-# import starlette.status as codes
-
-# from db.models import ProdStat as Model
-
-# from tests.utils import rand_str
-
-
-# logger = logging.getLogger(__name__)
-
-# pytestmark = pytest.mark.asyncio
-
-
-# @pytest.fixture(scope="session")
-# def prodstat_records(json_fixture):
-#     yield json_fixture("prodstats.json")
-
-
-# @pytest.fixture
-# def prodstat_df(prodstat_records):
-#     yield pd.DataFrame(prodstat_records).set_index(["api10", "prod_date"])
-
-
-# @pytest.fixture(autouse=True)
-# async def seed_prodstats(bind, prodstat_records):
-#     await Model.bulk_insert(prodstat_records)
-
-
-# class TestPlaceEndpoint:
-#     path: str = "/api/v1/prodstats"
-
-#     async def test_create_prodstat(self, client):
-#         prodstat_name = "test"
-#         response = await client.post(self.path, json=[{"name": prodstat_name}])
-#         assert response.status_code == codes.HTTP_202_ACCEPTED
-
-#     async def test_list_prodstats(self, client):
-#         expected_record_count = 25
-#         response = await client.get(self.path)
-#         assert response.status_code == codes.HTTP_200_OK
-#         data = response.json()
-#         assert len(data) == expected_record_count
-#         assert response.links["next"] is not None
-
-#     async def test_get_prodstat(self, client):
-#         id = 20
-#         response = await client.get(f"{self.path}/{id}")
-#         assert response.status_code == codes.HTTP_200_OK
-#         data = response.json()
-#         assert data["id"] == 20
-
-#     async def test_update_exising_prodstat(self, client):
-#         id = 10
-#         value = rand_str(length=8)
-#         response = await client.put(f"{self.path}/{id}", json={"state": value})
-#         assert response.status_code == codes.HTTP_200_OK
-#         data = response.json()
-#         assert data["id"] == id
-#         assert data["state"] == value
-
-#     async def test_update_prodstat_not_found(self, client):
-#         id = 99999
-#         value = rand_str(length=8)
-#         response = await client.put(f"{self.path}/{id}", json={"state": value})
-#         assert response.status_code == codes.HTTP_404_NOT_FOUND
-
-#     async def test_delete_existing_prodstat(self, client):
-#         id = 20
-#         response = await client.delete(f"{self.path}/{id}")
-#         assert response.status_code == codes.HTTP_200_OK
-#         data = response.json()
-#         assert data["id"] == id
-
-#     async def test_delete_prodstat_not_found(self, client):
-#         id = 99999
-#         response = await client.delete(f"{self.path}/{id}")
-#         assert response.status_code == codes.HTTP_404_NOT_FOUND
-#         data = response.json()
-#         assert data["detail"] == "prodstat not found"
+import logging
+from datetime import date
+
+import orjson
+import pandas as pd
+import pytest
+import starlette.status as codes
+
+from db.models import ProdStat
+from tests.utils import rand_str
+
+logger = logging.getLogger(__name__)
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+async def api10s(bind):
+    api10s = sorted(rand_str(length=10) for i in range(3))
+    await ProdStat.bulk_upsert(
+        pd.DataFrame(
+            [
+                {
+                    "api10": api10,
+                    "name": name,
+                    "value": i,
+                    "start_date": date(2020, 1 + i, 1),
+                    "end_date": date(2020, 2 + i, 1),
+                }
+                for api10 in api10s
+                for i, name in enumerate(["oil_sum", "gas_sum", "boe_sum"])
+            ]
+        ),
+        reset_index=False,
+    )
+    yield api10s
+
+
+class TestProdStatLookup:
+    path: str = "/api/v1/prodstats/lookup"
+
+    def parse(self, response):
+        return [orjson.loads(x) for x in response.text.splitlines()]
+
+    async def test_lookup(self, client, api10s):
+        response = await client.post(self.path, json={"api10s": api10s[:2]})
+        assert response.status_code == codes.HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        records = self.parse(response)
+        assert len(records) == 6
+        assert [x["api10"] for x in records] == sorted(x["api10"] for x in records)
+        assert records[0]["name"] == "boe_sum"
+        assert records[0]["value"] == 2
+
+    async def test_lookup_by_api14(self, client, api10s):
+        response = await client.post(self.path, json={"api14s": [f"{api10s[0]}00"]})
+        assert {x["api10"] for x in self.parse(response)} == {api10s[0]}
+
+    async def test_lookup_filters(self, client, api10s):
+        response = await client.post(
+            self.path,
+            json={
+                "api10s": api10s,
+                "names": ["oil_sum", "gas_sum"],
+                "start_date": "2020-02-15",
+            },
+        )
+        records = self.parse(response)
+        assert {x["name"] for x in records} == {"gas_sum"}
+        assert len(records) == 3
+
+    async def test_lookup_json_array(self, client, api10s):
+        response = await client.post(
+            self.path, json={"api10s": api10s}, query_string={"format": "json"}
+        )
+        assert response.headers["content-type"] == "application/json"
+        assert len(response.json()) == 9
+
+    async def test_lookup_no_results(self, client, api10s):
+        response = await client.post(
+            self.path, json={"api10s": ["0000000000"]}, query_string={"format": "json"}
+        )
+        assert response.json() == []
+
+    async def test_lookup_requires_ids(self, client):
+        response = await client.post(self.path, json={"names": ["oil_sum"]})
+        assert response.status_code == codes.HTTP_422_UNPROCESSABLE_ENTITY
+
+    async def test_lookup_too_many_ids(self, client, conf, monkeypatch):
+        monkeypatch.setattr(conf, "API_LOOKUP_MAX_IDS", 2)
+        response = await client.post(
+            self.path, json={"api10s": [rand_str(length=10) for i in range(3)]}
+        )
+        assert response.status_code == codes.HTTP_413_REQUEST_ENTITY_TOO_LARGE
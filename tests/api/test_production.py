@@ -0,0 +1,96 @@
+import logging
+from datetime import date
+
+import orjson
+import pytest
+import starlette.status as codes
+
+from db.models import ProdHeader, ProdMonthly
+from tests.utils import rand_str
+
+logger = logging.getLogger(__name__)
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+async def api10s(bind):
+    api10s = sorted(rand_str(length=10) for i in range(3))
+    await ProdHeader.bulk_upsert(
+        [
+            {
+                "api10": api10,
+                "entity12": rand_str(length=12),
+                "first_prod_date": date(2019 + i, 1, 1),
+                "last_prod_date": date(2019 + i, 12, 1),
+                "perfll": 5000,
+            }
+            for i, api10 in enumerate(api10s)
+        ]
+    )
+    await ProdMonthly.bulk_upsert(
+        [
+            {
+                "api10": api10,
+                "prod_date": date(2020, month, 1),
+                "days_in_month": 30,
+                "oil": 3000,
+            }
+            for api10 in api10s
+            for month in range(1, 7)
+        ]
+    )
+    yield api10s
+
+
+def parse(response):
+    return [orjson.loads(x) for x in response.text.splitlines()]
+
+
+class TestHeaderLookup:
+    path: str = "/api/v1/production/headers/lookup"
+
+    async def test_lookup(self, client, api10s):
+        response = await client.post(self.path, json={"api10s": api10s})
+        assert response.status_code == codes.HTTP_200_OK
+        records = parse(response)
+        assert [x["api10"] for x in records] == api10s
+        assert records[0]["first_prod_date"] == "2019-01-01"
+
+    async def test_lookup_date_range(self, client, api10s):
+        response = await client.post(
+            self.path,
+            json={
+                "api10s": api10s,
+                "start_date": "2020-06-01",
+                "end_date": "2020-12-31",
+            },
+        )
+        assert [x["api10"] for x in parse(response)] == [api10s[1]]
+
+
+class TestMonthlyLookup:
+    path: str = "/api/v1/production/monthly/lookup"
+
+    async def test_lookup(self, client, api10s):
+        response = await client.post(self.path, json={"api14s": [f"{api10s[0]}00"]})
+        assert response.status_code == codes.HTTP_200_OK
+        records = parse(response)
+        assert [x["prod_date"] for x in records] == [
+            f"2020-0{m}-01" for m in range(1, 7)
+        ]
+        assert records[0]["oil_per1k"] == 600
+        assert records[0]["oil_avg_daily"] == 100
+
+    async def test_lookup_date_range(self, client, api10s):
+        response = await client.post(
+            self.path,
+            json={
+                "api10s": api10s,
+                "start_date": "2020-02-01",
+                "end_date": "2020-03-31",
+            },
+        )
+        records = parse(response)
+        assert len(records) == 6
+        assert {x["prod_date"] for x in records} == {"2020-02-01", "2020-03-01"}
@@ -4,7 +4,9 @@ import numpy as np
 import pandas as pd
 import pytest
 
+import schemas as sch
 from const import HoleDirection, IHSPath
+from db.models import FracFocusJob
 from tests.utils import MockAsyncDispatch
 
 logger = logging.getLogger(__name__)
@@ -47,6 +49,31 @@ class TestWells:
         )
         assert {*wellset.fracs.index} == set(api14s)
 
+    @pytest.mark.asyncio
+    async def test_from_fracfocus_registry(self, bind, fracs_h):
+        df = sch.FracParameterSet(wells=fracs_h).df(create_index=False)
+        df["api10"] = df.api14.str[:10]
+        await FracFocusJob.bulk_upsert(df, reset_index=False)
+
+        api14s = [x["api14"] for x in fracs_h][:5]
+        wellset = await pd.DataFrame.wells.from_fracfocus(
+            api14s=api14s, use_registry=True
+        )
+        assert {*wellset.fracs.index} == set(api14s)
+
+        api10s = [x[:10] for x in api14s]
+        wellset = await pd.DataFrame.wells.from_fracfocus(
+            api10s=api10s, use_registry=True
+        )
+        assert {*wellset.fracs.index} == set(api14s)
+
+    @pytest.mark.asyncio
+    async def test_from_fracfocus_registry_no_match(self, bind):
+        wellset = await pd.DataFrame.wells.from_fracfocus(
+            api14s=["00000000000000"], use_registry=True
+        )
+        assert wellset.fracs is None
+
     @pytest.mark.parametrize("hole_dir", HoleDirection.members())
     @pytest.mark.asyncio
     async def test_from_multiple(self, hole_dir, wells_h, wells_v, fracs_h, fracs_v):
@@ -13,7 +13,7 @@ from api.helpers import Pagination
 from collector import AsyncClient
 from db.models import ProdStat as Model
 from schemas.credentials import BasicAuth
-from tests.utils import MockAsyncDispatch, get_open_port, rand_str
+from tests.utils import MockAsyncDispatch, get_open_port, rand_int, rand_str
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +32,7 @@ def port():
 @pytest.fixture
 async def seed_model(bind):
     for x in range(0, 15):
-        await Model.create(api10=rand_str(length=10), name=rand_str(length=20))
+        await Model.create(api10=rand_str(length=10), stat_id=rand_int(length=4))
 
 
 app = FastAPI()
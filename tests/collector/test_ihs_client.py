@@ -101,6 +101,46 @@ class TestGetWells:
             )
 
 
+class TestIterResponses:
+    @pytest.mark.parametrize("idname", ["api10s", "api14s"])
+    async def test_iter_wells(self, idname, well_dispatcher):
+        ids = ["a", "b", "c"]
+
+        kwargs = {
+            "path": IHSClient.paths.well_h,
+            "dispatch": well_dispatcher,
+            idname: ids,
+        }
+
+        batches = []
+        async for data in IHSClient.iter_wells(**kwargs):
+            batches.append(data)
+
+        assert len(batches) == len(ids)
+        x = sum([sum(x.values()) for batch in batches for x in batch])
+        assert x == 38 * len(ids)
+
+    @pytest.mark.parametrize("idname", ["api10s", "entities", "entity12s"])
+    async def test_iter_production(self, idname, well_dispatcher):
+        ids = ["a", "b"]
+
+        kwargs = {
+            "path": IHSClient.paths.prod_h,
+            "dispatch": well_dispatcher,
+            idname: ids,
+        }
+
+        result = []
+        async for data in IHSClient.iter_production(**kwargs):
+            result += data
+
+        assert len(result) == 3 * len(ids)
+
+    async def test_iter_no_id_opt(self):
+        with pytest.raises(ValueError):
+            IHSClient.iter_wells(path=IHSClient.paths.well_h)
+
+
 class TestGetOther:
     async def test_get_ids_by_area(self, id_dispatcher):
 
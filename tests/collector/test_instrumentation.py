@@ -0,0 +1,129 @@
+import logging
+
+import httpx
+import pytest
+
+from collector import AsyncClient, FracFocusClient, IHSClient
+from collector.instrumentation import PathStats, active_recorders, recording
+from tests.utils import MockAsyncDispatch
+
+logger = logging.getLogger(__name__)
+
+
+base_url = httpx.URL("http://127.0.0.1")
+
+
+@pytest.fixture
+def stats():
+    stats = PathStats()
+    stats.latencies = [0.05, 0.2, 0.3, 0.4, 1.5, 3, 7, 12, 45, 120]
+    yield stats
+
+
+class TestPathStats:
+    @pytest.mark.parametrize("q,expected", [(50, 1.5), (95, 120), (100, 120)])
+    def test_percentile(self, stats, q, expected):
+        assert stats.percentile(q) == expected
+
+    def test_percentile_empty(self):
+        assert PathStats().percentile(50) is None
+
+    def test_histogram_is_cumulative(self, stats):
+        histogram = stats.histogram(buckets=(0.1, 1, 10, float("inf")))
+        assert histogram == {"0.1": 1, "1": 4, "10": 7, "inf": 10}
+
+
+class TestPathName:
+    @pytest.mark.parametrize(
+        "url,expected",
+        [
+            ("well/h/ids", "well_h_ids"),
+            ("well/h/ids/tx-upton", "well_h_ids"),
+            ("/prod/h?api14=42461409160000", "prod_h"),
+            ("prod/h/headers", "prod_h_headers"),
+            ("unknown/path", "other"),
+        ],
+    )
+    def test_ihs(self, url, expected):
+        assert IHSClient(base_url=base_url).path_name(url) == expected
+
+    def test_fracfocus(self):
+        client = FracFocusClient(base_url=base_url)
+        assert client.path_name("api14/42461409160000") == "api14"
+        assert client.path_name(f"{base_url}/api10/4246140916") == "api10"
+
+    def test_no_paths(self):
+        assert AsyncClient(base_url=base_url).path_name("well/h") == "other"
+
+
+@pytest.mark.asyncio
+class TestRecording:
+    async def test_records_requests(self):
+        dispatch = MockAsyncDispatch({"data": [{"api14": "42461409160000"}]})
+        with recording() as recorder:
+            async with IHSClient(base_url=base_url, dispatch=dispatch) as client:
+                await client.get("prod/h", params={"api14": "42461409160000"})
+                await client.get("prod/h", params={"api14": "42461409160000"})
+
+        stats = recorder.get("ihs", "prod_h")
+        assert stats.requests == 2
+        assert stats.errors == 0
+        assert stats.bytes > 0
+        assert stats.statuses == {"200": 2}
+        assert stats.max_in_flight == 1
+        assert stats.in_flight == 0
+
+    async def test_nested_recorders(self):
+        dispatch = MockAsyncDispatch({}, status_code=404)
+        with recording() as outer:
+            async with FracFocusClient(base_url=base_url, dispatch=dispatch) as client:
+                await client.get("api14/42461409160000")
+                with recording() as inner:
+                    await client.get("api10/4246140916")
+
+        assert {k for k, _ in outer} == {("fracfocus", "api14"), ("fracfocus", "api10")}
+        assert {k for k, _ in inner} == {("fracfocus", "api10")}
+        assert inner.get("fracfocus", "api10").errors == 1
+
+    async def test_not_recorded_after_exit(self):
+        async with IHSClient(
+            base_url=base_url, dispatch=MockAsyncDispatch({})
+        ) as client:
+            with recording() as recorder:
+                await client.get("well/h")
+            await client.get("well/h")
+
+        assert active_recorders() == ()
+        assert recorder.get("ihs", "well_h").requests == 1
+
+    async def test_retries(self, monkeypatch):
+        monkeypatch.setattr("config.HTTP_MAX_RETRIES", 2)
+        monkeypatch.setattr("config.HTTP_RETRY_BACKOFF", 0)
+
+        dispatch = MockAsyncDispatch({}, status_code=503)
+        with recording() as recorder:
+            async with IHSClient(base_url=base_url, dispatch=dispatch) as client:
+                response = await client.get("well/h")
+
+        assert response.status_code == 503
+        stats = recorder.get("ihs", "well_h")
+        assert stats.requests == 3
+        assert stats.retries == 2
+        assert stats.errors == 3
+
+    async def test_post(self, monkeypatch):
+        batches = []
+        monkeypatch.setattr("ext.metrics.send", lambda series: batches.append(series))
+
+        with recording() as recorder:
+            async with IHSClient(
+                base_url=base_url, dispatch=MockAsyncDispatch({"data": []})
+            ) as client:
+                await client.get("well/h")
+
+        recorder.post(tags={"executor": "test"})
+        assert len(batches) == 1  # one request for every metric
+        posted = [x["metric"] for x in batches[0]]
+        assert "http.requests" in posted
+        assert "http.request.latency.p95" in posted
+        assert "http.request.latency.bucket" in posted
@@ -0,0 +1,162 @@
+import logging
+
+import httpx
+import pytest
+
+from collector import AsyncClient
+from collector.throttle import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LocalStateStore,
+    TokenBucket,
+    get_circuit_breaker,
+    get_rate_limiter,
+)
+from const import Provider
+from tests.utils import MockAsyncDispatch
+
+logger = logging.getLogger(__name__)
+
+
+pytestmark = pytest.mark.asyncio
+
+
+base_url = httpx.URL("http://127.0.0.1")
+
+
+@pytest.fixture
+def breaker():
+    yield CircuitBreaker(
+        "test", failure_threshold=2, recovery_timeout=30, failure_window=60
+    )
+
+
+class TestLocalStateStore:
+    async def test_set_nx(self):
+        store = LocalStateStore()
+        assert await store.set("key", 1, nx=True) is True
+        assert await store.set("key", 2, nx=True) is False
+        assert await store.get("key") == 1
+
+    async def test_expired_key(self):
+        store = LocalStateStore()
+        store.data["key"] = (1, 0)
+        assert await store.get("key") is None
+
+    async def test_incr_keeps_expiration(self):
+        store = LocalStateStore()
+        assert await store.incr("key", ttl=60) == 1
+        expires_at = store.data["key"][1]
+        assert await store.incr("key", ttl=60) == 2
+        assert store.data["key"][1] == expires_at
+
+
+class TestTokenBucket:
+    async def test_burst_does_not_wait(self):
+        bucket = TokenBucket("test", rate=1, capacity=5)
+        for _ in range(5):
+            assert await bucket.acquire() == 0
+
+    async def test_wait_when_empty(self):
+        bucket = TokenBucket("test", rate=100, capacity=1)
+        await bucket.acquire()
+        waited = await bucket.acquire()
+        assert waited > 0
+
+    async def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            TokenBucket("test", rate=0, capacity=1)
+
+    async def test_fail_open(self):
+        class BrokenStore(LocalStateStore):
+            async def take_token(self, *args, **kwargs):
+                raise ConnectionError("unreachable")
+
+        bucket = TokenBucket("test", rate=1, capacity=1, store=BrokenStore())
+        assert await bucket.acquire() == 0
+
+
+class TestCircuitBreaker:
+    async def test_opens_at_threshold(self, breaker):
+        assert await breaker.state() == "closed"
+        await breaker.record_failure()
+        assert await breaker.state() == "closed"
+        await breaker.record_failure()
+        assert await breaker.state() == "open"
+
+        with pytest.raises(CircuitOpenError):
+            await breaker.before_request()
+
+    async def test_half_open_single_trial(self, breaker):
+        await breaker.open()
+        await breaker.store.delete(breaker._key("open"))  # recovery timeout elapsed
+        assert await breaker.state() == "half_open"
+
+        assert await breaker.before_request() is True
+        with pytest.raises(CircuitOpenError):
+            await breaker.before_request()
+
+    async def test_trial_success_closes(self, breaker):
+        await breaker.open()
+        await breaker.store.delete(breaker._key("open"))
+        trial = await breaker.before_request()
+        await breaker.record_success(trial)
+        assert await breaker.state() == "closed"
+        assert await breaker.before_request() is False
+
+    async def test_trial_failure_reopens(self, breaker):
+        await breaker.open()
+        await breaker.store.delete(breaker._key("open"))
+        trial = await breaker.before_request()
+        await breaker.record_failure(trial)
+        assert await breaker.state() == "open"
+
+
+class TestRegistry:
+    async def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.setattr("config.RATE_LIMIT_ENABLED", False)
+        monkeypatch.setattr("config.CIRCUIT_BREAKER_ENABLED", False)
+        assert get_rate_limiter(Provider.IHS) is None
+        assert get_circuit_breaker(Provider.IHS) is None
+
+    async def test_enabled(self, monkeypatch):
+        monkeypatch.setattr("config.RATE_LIMIT_ENABLED", True)
+        monkeypatch.setattr("config.CIRCUIT_BREAKER_ENABLED", True)
+        monkeypatch.setattr("config.THROTTLE_STATE_URL", None)
+        monkeypatch.setattr("collector.throttle._store", None)
+        monkeypatch.setattr("collector.throttle._limiters", {})
+        monkeypatch.setattr("collector.throttle._breakers", {})
+
+        limiter = get_rate_limiter(Provider.FRACFOCUS)
+        assert limiter.name == "fracfocus"
+        assert get_rate_limiter(Provider.FRACFOCUS) is limiter
+        assert get_circuit_breaker(Provider.FRACFOCUS).name == "fracfocus"
+
+    async def test_no_provider(self, monkeypatch):
+        monkeypatch.setattr("config.RATE_LIMIT_ENABLED", True)
+        assert get_rate_limiter(None) is None
+
+
+class TestClientThrottling:
+    async def test_server_error_recorded_as_failure(self, breaker):
+        async with AsyncClient(
+            base_url=base_url,
+            dispatch=MockAsyncDispatch({}, status_code=503),
+            circuit_breaker=breaker,
+        ) as client:
+            await client.get("/")
+            await client.get("/")
+
+            with pytest.raises(CircuitOpenError):
+                await client.get("/")
+
+    async def test_success_not_recorded_as_failure(self, breaker):
+        async with AsyncClient(
+            base_url=base_url,
+            dispatch=MockAsyncDispatch({"data": []}),
+            circuit_breaker=breaker,
+            rate_limiter=TokenBucket("test", rate=1, capacity=5),
+        ) as client:
+            for _ in range(3):
+                await client.get("/")
+        assert await breaker.state() == "closed"
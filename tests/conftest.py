@@ -32,6 +32,7 @@ import pandas as pd
 import config
 from db import db
 from main import app
+from standin import SyntheticDataset, create_app
 
 from tests.models import TestModel  # noqa
 from tests.utils import MockAsyncDispatch
@@ -257,6 +258,15 @@ def geoms_v_dispatcher(geoms_v):
     yield MockAsyncDispatch({"data": geoms_v})
 
 
+# --- stand-in service ------------------------------------------------------- #
+
+
+@pytest.fixture
+def standin_app():
+    """ Stand-in IHS/FracFocus service. Pass as app=standin_app to a client. """
+    yield create_app(SyntheticDataset(areas=2, wells_per_area=20, months=12))
+
+
 # --- other ------------------------------------------------------------------ #
 
 
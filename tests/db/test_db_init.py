@@ -5,7 +5,7 @@ from db import db
 
 
 def test_custom_db_attrs():
-    for x in ["startup", "shutdown", "create_engine", "qsize", "url"]:
+    for x in ["startup", "shutdown", "create_engine", "qsize", "pool_status", "url"]:
         assert hasattr(db, x)
 
 
@@ -0,0 +1,137 @@
+import io
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import db.export
+from db.export import ChunkSink, Export
+from db.models import ProdMonthly, ProdStat, WellHeader
+from tests.utils import rand_str
+
+
+@pytest.fixture
+def pa():
+    yield pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+async def api10s(bind):
+    api10s = sorted(rand_str(length=10) for i in range(3))
+    await WellHeader.bulk_upsert(
+        [
+            {"api14": f"{api10}00", "api10": api10, "basin": basin}
+            for api10, basin in zip(api10s, ["permian", "permian", "dj"])
+        ]
+    )
+    await ProdMonthly.bulk_upsert(
+        [
+            {
+                "api10": api10,
+                "prod_date": date(2020, month, 1),
+                "days_in_month": 30,
+                "oil": 3000 + month,
+                "comments": {"month": month},
+            }
+            for api10 in api10s
+            for month in range(1, 13)
+        ]
+    )
+    await ProdStat.bulk_upsert(
+        pd.DataFrame(
+            [
+                {"api10": api10, "name": name, "value": i + 0.5}
+                for api10 in api10s
+                for i, name in enumerate(["oil_sum", "gas_sum"])
+            ]
+        ),
+        reset_index=False,
+    )
+    yield api10s
+
+
+def test_chunk_sink():
+    sink = ChunkSink()
+    sink.write(b"abc")
+    sink.write(memoryview(b"de"))
+    assert sink.tell() == 5
+    assert sink.drain() == b"abcde"
+    assert sink.drain() == b""
+    assert sink.tell() == 5
+
+
+def test_export_requires_pyarrow(monkeypatch):
+    monkeypatch.setattr(db.export, "pa", None)
+    with pytest.raises(ImportError):
+        Export("prodstats")
+
+
+class TestExport:
+    def test_unknown_columns(self, pa):
+        with pytest.raises(ValueError):
+            Export("production_monthly", columns=["oil", "zaza"])
+
+    def test_names_only_filter_prodstats(self, pa):
+        with pytest.raises(ValueError):
+            Export("production_monthly", names=["oil_sum"])
+
+    def test_schema(self, pa):
+        export = Export("production_monthly", columns=["api10", "prod_date", "oil"])
+        assert export.schema.names == ["api10", "prod_date", "oil"]
+        assert export.schema.field("prod_date").type == pa.date32()
+        assert export.filename == "production_monthly.parquet"
+
+    @pytest.mark.asyncio
+    async def test_parquet_row_groups(self, pa, api10s):
+        import pyarrow.parquet as pq
+
+        export = Export(
+            "production_monthly",
+            "parquet",
+            columns=["api10", "prod_date", "oil", "oil_avg_daily", "comments"],
+            chunk_size=10,
+        )
+        data = b"".join([x async for x in export])
+        assert export.rows == 36
+
+        f = pq.ParquetFile(io.BytesIO(data))
+        assert f.num_row_groups == 4
+        df = f.read().to_pandas()
+        assert df.api10.tolist() == sorted(df.api10.tolist())
+        assert df.oil_avg_daily.iloc[0] == 100
+        assert df.comments.iloc[0] == '{"month": 1}'
+
+    @pytest.mark.asyncio
+    async def test_arrow_stream_filters(self, pa, api10s):
+        export = Export(
+            "production_monthly",
+            "arrow",
+            columns=["api10", "oil"],
+            basin="permian",
+            start_date=date(2020, 6, 1),
+            end_date=date(2020, 7, 1),
+        )
+        data = b"".join([x async for x in export])
+        df = pa.ipc.open_stream(data).read_all().to_pandas()
+        assert df.api10.tolist() == [api10s[0], api10s[0], api10s[1], api10s[1]]
+        assert df.oil.tolist() == [3006, 3007, 3006, 3007]
+
+    @pytest.mark.asyncio
+    async def test_prodstats(self, pa, api10s, tmp_path):
+        export = Export("prodstats", "parquet", api10s=api10s[:2], names=["gas_sum"])
+        path = tmp_path / export.filename
+        assert await export.to_file(path) == 2
+
+        import pyarrow.parquet as pq
+
+        df = pq.read_table(str(path)).to_pandas()
+        assert set(df.name) == {"gas_sum"}
+        assert df.value.tolist() == [1.5, 1.5]
+
+    @pytest.mark.asyncio
+    async def test_empty_export(self, pa, bind):
+        export = Export("prodstats", "arrow", columns=["api10", "value"])
+        data = b"".join([x async for x in export])
+        table = pa.ipc.open_stream(data).read_all()
+        assert table.num_rows == 0
+        assert table.schema.names == ["api10", "value"]
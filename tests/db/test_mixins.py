@@ -1,12 +1,25 @@
 import logging
+from datetime import date
 
+import numpy as np
 import pandas as pd
 import pytest
-from asyncpg.exceptions import DataError, UniqueViolationError
+from asyncpg.exceptions import (
+    DataError,
+    DeadlockDetectedError,
+    SerializationError,
+    UniqueViolationError,
+)
+from shapely.geometry import Point
 from sqlalchemy.exc import IntegrityError
 
+import util.geo
+from db import db
+from db.mixins import MAX_BIND_PARAMS, BatchSizer, UpsertCounts
+from db.models import DeadLetter, ProdMonthly
 from db.models import ProdStat as Model
-from tests.utils import rand_str
+from db.models import SurveyPoint
+from tests.utils import rand_int, rand_str
 
 logger = logging.getLogger(__name__)
 
@@ -14,69 +27,81 @@ logger = logging.getLogger(__name__)
 @pytest.mark.asyncio
 class TestMixins:
     async def test_bulk_upsert_update_on_conflict(self, bind):
-        ids = [(rand_str(length=10), rand_str(length=20)) for i in range(1, 5)]
-        records = [{"api10": i, "name": v} for i, v in ids]
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 5)]
+        records = [{"api10": i, "stat_id": v} for i, v in ids]
         await Model.bulk_upsert(records, update_on_conflict=True)
 
-        records2 = [{"api10": i, "name": v} for i, v in ids]
+        records2 = [{"api10": i, "stat_id": v} for i, v in ids]
         await Model.bulk_upsert(records2)
 
-        results = await Model.query.gino.load((Model.api10, Model.name)).all()
+        results = await Model.query.gino.load((Model.api10, Model.stat_id)).all()
 
-        expected = [(d["api10"], d["name"]) for d in records2]
-        assert results == expected
+        expected = [(d["api10"], d["stat_id"]) for d in records2]
+        assert sorted(results) == sorted(expected)
         # assert sorted(ids) == sorted(await Model.pk.values)
 
     async def test_bulk_upsert_ignore_on_conflict(self, bind):
-        ids = [(rand_str(length=10), rand_str(length=20)) for i in range(1, 5)]
-        records = [{"api10": i, "name": v} for i, v in ids]
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 5)]
+        records = [{"api10": i, "stat_id": v} for i, v in ids]
         await Model.bulk_upsert(
             records, update_on_conflict=False, ignore_on_conflict=True
         )
 
-        records2 = [{"api10": i, "name": v} for i, v in ids]
+        records2 = [{"api10": i, "stat_id": v} for i, v in ids]
         await Model.bulk_upsert(records2)
 
-        results = await Model.query.gino.load((Model.api10, Model.name)).all()
+        results = await Model.query.gino.load((Model.api10, Model.stat_id)).all()
 
-        expected = [(d["api10"], d["name"]) for d in records]
-        assert results == expected
+        expected = [(d["api10"], d["stat_id"]) for d in records]
+        assert sorted(results) == sorted(expected)
 
     async def test_bulk_insert(self, bind):
-        ids = [(rand_str(length=10), rand_str(length=20)) for i in range(1, 5)]
-        records = [{"api10": i, "name": v} for i, v in ids]
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 5)]
+        records = [{"api10": i, "stat_id": v} for i, v in ids]
         await Model.bulk_insert(records)
 
-        results = await Model.query.gino.load((Model.api10, Model.name)).all()
+        results = await Model.query.gino.load((Model.api10, Model.stat_id)).all()
 
-        expected = [(d["api10"], d["name"]) for d in records]
+        expected = [(d["api10"], d["stat_id"]) for d in records]
         assert results == expected
 
     async def test_bulk_insert_raise_integrity_error(self, bind):
-        ids = [(rand_str(length=10), rand_str(length=20)) for i in range(1, 50)]
-        records = [{"api10": i, "name": v} for i, v in ids]
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 50)]
+        records = [{"api10": i, "stat_id": v} for i, v in ids]
         await Model.bulk_insert(records)
 
         with pytest.raises((IntegrityError, UniqueViolationError)):
             await Model.bulk_insert(records)
 
     async def test_bulk_upsert_fracture_on_data_error(self, bind):
-        ids = [(rand_str(length=10), rand_str(length=20)) for i in range(1, 11)]
-        good = [{"api10": i, "name": v} for i, v in ids]
-        mixed = good + [
-            {"api10": 99999999999999999999, "name": "lets hope this record fails"}
-        ]
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 11)]
+        good = [{"api10": i, "stat_id": v} for i, v in ids]
+        mixed = good + [{"api10": 99999999999999999999, "stat_id": 1}]
 
         expected = [tuple(x.values()) for x in good]
         await Model.bulk_upsert(mixed, errors="fractionalize")
         assert len(await Model.pk.values) == len(expected)
 
+    async def test_bulk_upsert_capture_dead_letters(self, bind):
+        good = [{"api10": rand_str(length=10), "stat_id": i} for i in range(20)]
+        bad = [{"api10": "x" * 20, "stat_id": 1}, {"api10": "y" * 20, "stat_id": 2}]
+        records = good[:7] + bad[:1] + good[7:] + bad[1:]
+
+        counts = await Model.bulk_upsert(records, batch_size=0, return_counts=True)
+        assert counts == UpsertCounts(inserted=20, failed=2)
+
+        letters = await DeadLetter.query.gino.all()
+        letters = sorted(letters, key=lambda x: x.primary_key["api10"])
+        assert [x.primary_key for x in letters] == bad
+        assert {x.model_name for x in letters} == {Model.__name__}
+        assert {x.table_name for x in letters} == {Model.__table__.name}
+        assert all(x.error_type == "StringDataRightTruncationError" for x in letters)
+        assert letters[0].payload["api10"] == bad[0]["api10"]
+
     async def test_bulk_upsert_fail_batch_on_data_error(self, bind):
-        ids = [(rand_str(length=10), rand_str(length=20)) for i in range(1, 11)]
-        good = [{"api10": i, "name": v} for i, v in ids]
-        mixed = good + [
-            {"api10": 99999999999999999999, "name": "lets hope this record fails"}
-        ]
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 11)]
+        good = [{"api10": i, "stat_id": v} for i, v in ids]
+        mixed = good + [{"api10": 99999999999999999999, "stat_id": 1}]
 
         with pytest.raises(DataError):
             await Model.bulk_upsert(mixed, errors="raise")
@@ -86,20 +111,212 @@ class TestMixins:
 
         with pytest.raises(Exception):
             records = [
-                {"api10": rand_str(), "name": rand_str()},
-                {"api10": 9999999999999999, "name": rand_str()},
+                {"api10": rand_str(), "stat_id": rand_int(length=4)},
+                {"api10": 9999999999999999, "stat_id": rand_int(length=4)},
             ]
             await Model.bulk_upsert(records)
 
             assert await Model.pk.values == []
 
 
+@pytest.mark.asyncio
+class TestPreparedUpsert:
+    @pytest.fixture
+    def columns(self):
+        yield Model.to_rows([{"api10": "a", "stat_id": 1, "value": 1}])[0]
+
+    async def test_cached_per_columns_and_conflict_mode(self, bind, columns):
+        stmt = Model.prepare_upsert(columns)
+        assert Model.prepare_upsert(columns) is stmt
+        assert Model.prepare_upsert([x for x in columns if x != "value"]) is not stmt
+        assert (
+            Model.prepare_upsert(
+                columns, update_on_conflict=False, ignore_on_conflict=True
+            )
+            is not stmt
+        )
+
+    async def test_compiled_statement(self, bind, columns):
+        stmt = Model.prepare_upsert(columns, exclude_cols=["value"])
+        assert "$1" in stmt.sql
+        assert "ON CONFLICT ON CONSTRAINT pk_prodstats DO UPDATE" in stmt.sql
+        assert "value = excluded.value" not in stmt.sql
+        assert "stat_id = excluded.stat_id" not in stmt.sql  # primary key
+
+    async def test_missing_default_columns(self, bind):
+        with pytest.raises(ValueError):
+            Model.prepare_upsert(["api10", "stat_id"])
+
+    async def test_args_in_statement_order(self, bind, columns):
+        stmt = Model.prepare_upsert(columns)
+        row = tuple(range(len(columns)))
+        names = [stmt.columns[idx] for idx in stmt.positions]
+        assert dict(zip(names, stmt.args([row])[0])) == dict(zip(columns, row))
+
+    async def test_python_defaults(self, bind):
+        columns, rows = Model.to_rows([{"api10": "a", "stat_id": 1}])
+        assert columns[:2] == ["api10", "stat_id"]
+        assert {"created_at", "updated_at"} <= set(columns)
+        assert len(rows[0]) == len(columns)
+
+    async def test_upsert_with_row_tuples(self, bind):
+        rows = [(rand_str(length=10), rand_int(length=4), i) for i in range(5)]
+        await Model.bulk_upsert(
+            rows, columns=["api10", "stat_id", "value"], batch_size=2
+        )
+        await Model.bulk_upsert(
+            [(x, y, 10) for x, y, _ in rows], columns=["api10", "stat_id", "value"]
+        )
+
+        results = await Model.query.gino.load((Model.value)).all()
+        assert len(results) == 5
+        assert {x[0] for x in results} == {10}
+
+
+class TestUpsertCounts:
+    def test_sum(self):
+        counts = sum([UpsertCounts(inserted=1, updated=2), UpsertCounts(unchanged=3)])
+        assert counts == UpsertCounts(inserted=1, updated=2, unchanged=3)
+        assert counts.changed == 3
+        assert counts.total == 6
+
+
+@pytest.mark.asyncio
+class TestSkipUnchanged:
+    @pytest.fixture
+    def records(self):
+        yield [
+            {"api10": rand_str(length=10), "stat_id": rand_int(length=4), "value": i}
+            for i in range(4)
+        ]
+
+    async def test_compiled_guard(self, bind, records):
+        columns, _ = Model.to_rows(records)
+        sql = Model.prepare_upsert(columns, skip_unchanged=True).sql
+        assert "IS DISTINCT FROM" in sql
+        guard = sql.split("WHERE")[-1]
+        assert "value" in guard
+        assert "updated_at" not in guard
+
+    @pytest.mark.parametrize("method", ["values", "copy"])
+    async def test_counts(self, bind, records, method):
+        kwargs = {"method": method, "skip_unchanged": True, "return_counts": True}
+
+        counts = await Model.bulk_upsert(records, **kwargs)
+        assert counts == UpsertCounts(inserted=4)
+        before = {x.api10: x.updated_at for x in await Model.query.gino.all()}
+
+        records[0]["value"] = 10
+        counts = await Model.bulk_upsert(records, **kwargs)
+        assert counts == UpsertCounts(updated=1, unchanged=3)
+
+        after = {x.api10: x.updated_at for x in await Model.query.gino.all()}
+        changed = {k for k, v in after.items() if v != before[k]}
+        assert changed == {records[0]["api10"]}
+
+    async def test_counts_without_guard(self, bind, records):
+        await Model.bulk_upsert(records)
+        counts = await Model.bulk_upsert(records, return_counts=True)
+        assert counts == UpsertCounts(updated=4)
+
+    async def test_returns_total_by_default(self, bind, records):
+        assert await Model.bulk_upsert(records, skip_unchanged=True) == 4
+
+
+@pytest.mark.asyncio
+class TestCopyUpsert:
+    async def test_update_on_conflict(self, bind):
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 5)]
+        records = [{"api10": i, "stat_id": v, "value": 1} for i, v in ids]
+        await Model.bulk_upsert(records, method="copy")
+
+        records2 = [{"api10": i, "stat_id": v, "value": 2} for i, v in ids]
+        await Model.bulk_upsert(records2, method="copy", batch_size=2)
+
+        results = await Model.query.gino.load(
+            (Model.api10, Model.stat_id, Model.value)
+        ).all()
+
+        expected = [(d["api10"], d["stat_id"], d["value"]) for d in records2]
+        assert sorted(results) == sorted(expected)
+
+    async def test_ignore_on_conflict(self, bind):
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 5)]
+        records = [{"api10": i, "stat_id": v, "value": 1} for i, v in ids]
+        await Model.bulk_upsert(records, method="copy")
+
+        records2 = [{"api10": i, "stat_id": v, "value": 2} for i, v in ids]
+        await Model.bulk_upsert(
+            records2, method="copy", update_on_conflict=False, ignore_on_conflict=True,
+        )
+
+        results = await Model.query.gino.load((Model.value)).all()
+        assert {x[0] for x in results} == {1}
+
+    async def test_json_and_defaults(self, bind):
+        await ProdMonthly.bulk_upsert(
+            [
+                {
+                    "api10": rand_str(length=10),
+                    "prod_date": date(2020, 1, 1),
+                    "comments": {"a": 1},
+                }
+            ],
+            method="copy",
+        )
+        await ProdMonthly.bulk_upsert(
+            [{"api10": rand_str(length=10), "prod_date": date(2020, 2, 1)}],
+            method="copy",
+        )
+
+        results = await ProdMonthly.query.order_by(ProdMonthly.prod_date).gino.all()
+        assert results[0].comments == {"a": 1}
+        assert results[1].comments == {}  # server default
+        assert all(x.created_at is not None for x in results)
+
+    async def test_geometry_and_python_defaults(self, bind):
+        records = [
+            {
+                "api14": rand_str(length=14),
+                "md": i,
+                "geom": util.geo.shape_to_wkb(Point(-102.1, 31.9)),
+            }
+            for i in range(3)
+        ]
+        await SurveyPoint.bulk_upsert(records, method="copy")
+
+        results = await SurveyPoint.query.gino.all()
+        assert len(results) == 3
+        assert all(x.is_in_lateral is False for x in results)
+        assert util.geo.wkb_to_shape(results[0].geom).equals(Point(-102.1, 31.9))
+
+    async def test_fall_back_on_data_error(self, bind):
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 11)]
+        good = [{"api10": i, "stat_id": v} for i, v in ids]
+        mixed = good + [{"api10": "x" * 20, "stat_id": 1}]
+
+        await Model.bulk_upsert(mixed, method="copy", errors="fractionalize")
+        assert len(await Model.pk.values) == len(good)
+
+    async def test_raise_on_data_error(self, bind):
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 11)]
+        good = [{"api10": i, "stat_id": v} for i, v in ids]
+        mixed = good + [{"api10": "x" * 20, "stat_id": 1}]
+
+        with pytest.raises(DataError):
+            await Model.bulk_upsert(mixed, method="copy", errors="raise")
+
+    async def test_invalid_method(self):
+        with pytest.raises(ValueError):
+            await Model.bulk_upsert([], method="merge")
+
+
 class TestDataFrameMixin:
     @pytest.fixture
     def records(self):
         yield [
-            {"api10": "22222", "name": "test1", "value": 1, "other_value": "v"},
-            {"api10": "11111", "name": "test2", "value": 2, "other_value": "v"},
+            {"api10": "22222", "stat_id": 1, "value": 1, "other_value": "v"},
+            {"api10": "11111", "stat_id": 2, "value": 2, "other_value": "v"},
         ]
 
     def test_prepare_df_keep_index(self, records):
@@ -108,33 +325,383 @@ class TestDataFrameMixin:
         assert records == Model._prepare(df, reset_index=False)
 
     def test_prepare_df_reset_index(self, records):
-        df = pd.DataFrame(records).set_index("name")
+        df = pd.DataFrame(records).set_index("stat_id")
 
         assert records == Model._prepare(df, reset_index=True)
 
+    def test_prepare_rows(self):
+        df = pd.DataFrame(
+            {
+                "other_value": ["v", "v", "v", "v"],
+                "api10": ["22222", "11111", None, "33333"],
+                "stat_id": [1, 2, 3, 4],
+                "value": [1.5, np.inf, 2.0, np.nan],
+                "start_month": [1.0, np.nan, 2.0, 3.0],
+                "start_date": pd.to_datetime(["2020-01-01", None, None, "2020-03-01"]),
+            }
+        )
+
+        columns, rows = Model._prepare_rows(df, reset_index=False)
+
+        assert columns == ["api10", "stat_id", "value", "start_date", "start_month"]
+        assert rows == [
+            ("22222", 1, 1.5, date(2020, 1, 1), 1),
+            ("11111", 2, None, None, None),
+            ("33333", 4, None, date(2020, 3, 1), 3),
+        ]
+        assert type(rows[0][4]) is int
+
+    def test_non_integral_rows(self):
+        df = pd.DataFrame(
+            {
+                "api10": ["22222", "11111", "33333"],
+                "stat_id": [1, 2, 3],
+                "value": [1.5, 2.5, 3.5],
+                "start_month": [1.5, 2.0, np.nan],
+            }
+        )
+
+        mask, names = Model.non_integral_rows(df)
+        assert mask.tolist() == [True, False, False]
+        assert names == ["start_month"]
+
+        with pytest.raises(ValueError):
+            Model._prepare_rows(df, reset_index=False)
+
+    def test_prepare_rows_object_numbers(self):
+        df = pd.DataFrame(
+            {"api10": ["22222", "11111"], "stat_id": [1, 2], "start_month": [1, None]}
+        ).astype(object)
+
+        _, rows = Model._prepare_rows(df, reset_index=False)
+        assert rows == [("22222", 1, 1), ("11111", 2, None)]
+
+    def test_prepare_rows_reset_index(self, records):
+        df = pd.DataFrame(records).set_index(["api10", "stat_id"])
+        columns, rows = Model._prepare_rows(df, reset_index=True)
+        assert columns == ["api10", "stat_id", "value"]
+        assert rows[0] == ("22222", 1, 1)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("method", ["values", "copy"])
+    async def test_bulk_upsert_columnar(self, bind, method):
+        df = pd.DataFrame(
+            {
+                "api10": [rand_str(length=10) for i in range(3)],
+                "stat_id": [1, 2, 3],
+                "value": [1.0, np.nan, np.inf],
+                "start_month": [1.0, 2.0, np.nan],
+            }
+        ).set_index(["api10", "stat_id"])
+        await Model.bulk_upsert(df, method=method)
+
+        results = await Model.query.order_by(Model.stat_id).gino.all()
+        assert [x.value for x in results] == [1, None, None]
+        assert [x.start_month for x in results] == [1, 2, None]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("method", ["values", "copy"])
+    async def test_bulk_upsert_columnar_non_integral(self, bind, method):
+        df = pd.DataFrame(
+            {
+                "api10": [rand_str(length=10) for i in range(3)],
+                "stat_id": [1, 2, 3],
+                "start_month": [1.0, 2.5, np.nan],
+            }
+        ).set_index(["api10", "stat_id"])
+
+        counts = await Model.bulk_upsert(
+            df, method=method, batch_size=0, return_counts=True
+        )
+        assert counts == UpsertCounts(inserted=2, failed=1)
+
+        results = await Model.query.order_by(Model.stat_id).gino.all()
+        assert [x.start_month for x in results] == [1, None]
+
+        letters = await DeadLetter.query.gino.all()
+        assert [x.primary_key["stat_id"] for x in letters] == [2]
+        assert {x.error_type for x in letters} == {"DataError"}
+
+        with pytest.raises(DataError):
+            await Model.bulk_upsert(df, method=method, errors="raise")
+
     @pytest.mark.asyncio
     async def test_bulk_upsert(self, bind):
-        ids = [(rand_str(length=10), rand_str(length=20)) for i in range(1, 5)]
-        records = [{"api10": i, "name": v} for i, v in ids]
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 5)]
+        records = [{"api10": i, "stat_id": v} for i, v in ids]
         await Model.bulk_upsert(
             pd.DataFrame(records), reset_index=False, update_on_conflict=True
         )
 
-        records2 = [{"api10": i, "name": v} for i, v in ids]
+        records2 = [{"api10": i, "stat_id": v} for i, v in ids]
         await Model.bulk_upsert(pd.DataFrame(records2), reset_index=False)
 
-        results = await Model.query.gino.load((Model.api10, Model.name)).all()
+        results = await Model.query.gino.load((Model.api10, Model.stat_id)).all()
 
-        expected = [(d["api10"], d["name"]) for d in records2]
-        assert results == expected
+        expected = [(d["api10"], d["stat_id"]) for d in records2]
+        assert sorted(results) == sorted(expected)
 
     @pytest.mark.asyncio
     async def test_bulk_insert(self, bind):
-        ids = [(rand_str(length=10), rand_str(length=20)) for i in range(1, 5)]
-        records = [{"api10": i, "name": v} for i, v in ids]
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 5)]
+        records = [{"api10": i, "stat_id": v} for i, v in ids]
         await Model.bulk_insert(pd.DataFrame(records), reset_index=False)
 
-        results = await Model.query.gino.load((Model.api10, Model.name)).all()
+        results = await Model.query.gino.load((Model.api10, Model.stat_id)).all()
 
-        expected = [(d["api10"], d["name"]) for d in records]
+        expected = [(d["api10"], d["stat_id"]) for d in records]
         assert results == expected
+
+    def test_hash_rows(self, records):
+        df = pd.DataFrame(records)
+        hashes = Model.hash_rows(df)
+        assert hashes.dtype == np.int64
+        assert hashes.equals(Model.hash_rows(df.copy()))
+
+        df.loc[0, "value"] = 10
+        changed = Model.hash_rows(df) != hashes
+        assert changed.tolist() == [True, False]
+
+    def test_hash_rows_ignores_audit_columns(self, records):
+        df = pd.DataFrame(records)
+        hashes = Model.hash_rows(df)
+        assert hashes.equals(Model.hash_rows(df.assign(updated_at=pd.Timestamp.now())))
+
+    @pytest.mark.asyncio
+    async def test_bulk_upsert_delta(self, bind):
+        df = pd.DataFrame(
+            {
+                "api10": [rand_str(length=10) for i in range(4)],
+                "stat_id": [1, 2, 3, 4],
+                "value": [1.0, 2.0, 3.0, 4.0],
+            }
+        ).set_index(["api10", "stat_id"])
+
+        counts = await Model.bulk_upsert(df, delta=True, return_counts=True)
+        assert counts == UpsertCounts(inserted=4)
+        assert all(x.row_hash is not None for x in await Model.query.gino.all())
+
+        df.iloc[0, 0] = 10.0
+        counts = await Model.bulk_upsert(df, delta=True, return_counts=True)
+        assert counts == UpsertCounts(updated=1, unchanged=3)
+
+        assert await Model.bulk_upsert(df, delta=True) == 4
+
+    @pytest.mark.asyncio
+    async def test_bulk_upsert_delta_missing_hash(self, bind):
+        df = pd.DataFrame(
+            {"api10": [rand_str(length=10) for i in range(2)], "stat_id": [1, 2]}
+        )
+        await Model.bulk_upsert(df, reset_index=False)
+        await Model.update.values(row_hash=None).gino.status()
+
+        counts = await Model.bulk_upsert(
+            df, reset_index=False, delta=True, return_counts=True
+        )
+        assert counts == UpsertCounts(updated=2)
+
+
+class TestBatchSizer:
+    def test_initial_size_from_payload(self):
+        sizer = BatchSizer(row_bytes=100, ncols=4, target_bytes=10000)
+        assert sizer.size == 100
+        assert sizer.max_size == 400
+
+    def test_bind_param_limit(self):
+        sizer = BatchSizer(row_bytes=1, ncols=100, target_bytes=10 ** 6)
+        assert sizer.max_size == MAX_BIND_PARAMS // 100
+        assert sizer.size * 100 <= MAX_BIND_PARAMS
+
+    def test_no_bind_param_limit(self):
+        sizer = BatchSizer(
+            row_bytes=1, ncols=100, bind_params=False, target_bytes=10 ** 6
+        )
+        assert sizer.size == 10 ** 6
+
+    @pytest.mark.parametrize(
+        "seconds,expected", [(0.1, 150), (1, 100), (1.1, 100), (4, 50), (2, 50)]
+    )
+    def test_observe(self, seconds, expected):
+        sizer = BatchSizer(row_bytes=100, ncols=4, target_bytes=10000, target_seconds=1)
+        assert sizer.observe(100, seconds) == expected
+
+    def test_observe_ignores_small_batches(self):
+        sizer = BatchSizer(row_bytes=100, ncols=4, target_bytes=10000, target_seconds=1)
+        assert sizer.observe(10, 5) == 100
+
+    def test_observe_bounds(self):
+        sizer = BatchSizer(row_bytes=100, ncols=4, target_bytes=10000, target_seconds=1)
+        for _ in range(10):
+            sizer.observe(sizer.size, 0.01)
+        assert sizer.size == sizer.max_size
+
+        for _ in range(20):
+            sizer.observe(sizer.size, 100)
+        assert sizer.size == sizer.min_size
+
+    def test_model_sizer(self):
+        columns = ["api10", "stat_id", "value"]
+        sizer = Model.batch_sizer("values", columns)
+        assert Model.batch_sizer("values", columns) is sizer
+        assert Model.batch_sizer("copy", columns) is not sizer
+
+    def test_model_sizer_bind_param_limit(self):
+        columns = ProdMonthly.columns.names
+        insert = ProdMonthly.batch_sizer("insert", columns)
+        assert insert.max_size <= MAX_BIND_PARAMS // len(columns)
+
+        # one-row statements per row and COPY aren't limited by bind parameters
+        values = ProdMonthly.batch_sizer("values", columns)
+        copy = ProdMonthly.batch_sizer("copy", columns)
+        assert values.max_size == copy.max_size > insert.max_size
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("method", ["values", "copy"])
+    async def test_bulk_upsert_adapts(self, bind, monkeypatch, method):
+        records = [
+            {"api10": rand_str(length=10), "stat_id": rand_int(length=4)}
+            for i in range(50)
+        ]
+        columns, _ = Model.to_rows(records)
+        sizer = Model.batch_sizer(method, columns)
+        monkeypatch.setattr(sizer, "size", 10)
+        monkeypatch.setattr(sizer, "min_size", 1)
+        monkeypatch.setattr(sizer, "target_seconds", 10 ** -9)
+
+        assert await Model.bulk_upsert(records, method=method, concurrency=1) == 50
+        assert sizer.size < 10
+
+
+class TestOrderedUpserts:
+    def test_sort_rows(self):
+        columns = ["value", "stat_id", "api10"]
+        rows = [(1, 2, "2"), (2, 1, "2"), (3, None, "1"), (4, 3, "1")]
+        assert Model.sort_rows(columns, rows) == [
+            (4, 3, "1"),
+            (3, None, "1"),
+            (2, 1, "2"),
+            (1, 2, "2"),
+        ]
+
+    def test_sort_rows_without_pk(self):
+        rows = [(2,), (1,)]
+        assert Model.sort_rows(["stat_id"], rows) == rows
+
+    def test_merge_ordered_by_pk(self, bind):
+        sql = Model.prepare_merge("_staging_prodstats")
+        assert "ORDER BY" in sql
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("error", [DeadlockDetectedError, SerializationError])
+    async def test_retry_transient(self, monkeypatch, error):
+        monkeypatch.setattr("config.DATABASE_RETRY_BACKOFF", 0)
+        calls = []
+
+        async def func():
+            calls.append(1)
+            if len(calls) < 3:
+                raise error("transient")
+            return "ok"
+
+        assert await Model.retry_transient(func) == "ok"
+        assert len(calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_retry_transient_gives_up(self, monkeypatch):
+        monkeypatch.setattr("config.DATABASE_MAX_RETRIES", 2)
+        monkeypatch.setattr("config.DATABASE_RETRY_BACKOFF", 0)
+        calls = []
+
+        async def func():
+            calls.append(1)
+            raise DeadlockDetectedError("deadlock")
+
+        with pytest.raises(DeadlockDetectedError):
+            await Model.retry_transient(func)
+        assert len(calls) == 3
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("method", ["values", "copy"])
+    async def test_bulk_upsert_retries_deadlock(self, bind, monkeypatch, method):
+        monkeypatch.setattr("config.DATABASE_RETRY_BACKOFF", 0)
+        retry_transient = Model.retry_transient
+        failures = [DeadlockDetectedError("deadlock")]
+
+        async def flaky(func):
+            async def wrapped():
+                if failures:
+                    raise failures.pop()
+                return await func()
+
+            return await retry_transient(wrapped)
+
+        monkeypatch.setattr(Model, "retry_transient", flaky)
+        records = [{"api10": rand_str(length=10), "stat_id": i} for i in range(5)]
+        counts = await Model.bulk_upsert(records, method=method, return_counts=True)
+        assert counts == UpsertCounts(inserted=5)
+        assert not failures
+
+
+@pytest.mark.asyncio
+class TestStreamingReads:
+    @pytest.fixture
+    async def records(self, bind):
+        records = [
+            {
+                "api10": f"{i:010}",
+                "prod_date": date(2020, 1, 1),
+                "oil": i,
+                "comments": {"n": i},
+            }
+            for i in range(25)
+        ]
+        await ProdMonthly.bulk_upsert(records)
+        yield records
+
+    async def test_iter_df_chunks(self, records):
+        frames = [
+            x async for x in ProdMonthly.iter_df(chunk_size=10, order_by=["api10"])
+        ]
+        assert [x.shape[0] for x in frames] == [10, 10, 5]
+        assert frames[0].index.names == ProdMonthly.pk.names
+        assert frames[0].index[0] == ("0000000000", date(2020, 1, 1))
+
+    async def test_iter_df_projection_and_filter(self, records):
+        frames = [
+            x
+            async for x in ProdMonthly.iter_df(
+                columns=["oil", "comments"],
+                where=ProdMonthly.oil >= 20,
+                create_index=False,
+            )
+        ]
+        df = pd.concat(frames)
+        assert list(df.columns) == ["oil", "comments"]
+        assert sorted(df.oil) == [20, 21, 22, 23, 24]
+        assert {x["n"] for x in df.comments} == {20, 21, 22, 23, 24}
+
+    async def test_iter_rows(self, records):
+        stmt = db.select(
+            [ProdMonthly.api10, ProdMonthly.oil, ProdMonthly.comments]
+        ).where(ProdMonthly.oil < 15)
+        batches = [x async for x in ProdMonthly.iter_rows(stmt, chunk_size=10)]
+        assert [len(x) for x in batches] == [10, 5]
+        rows = sorted(batches[0] + batches[1], key=lambda x: x[1])
+        assert rows[3] == ("0000000003", 3, {"n": 3})
+
+    async def test_iter_df_index_columns_added(self, records):
+        df = await ProdMonthly.df(
+            columns=["oil"], where=ProdMonthly.api10 == "0000000003"
+        )
+        assert df.index.tolist() == [("0000000003", date(2020, 1, 1))]
+        assert df.columns.tolist() == ["oil"]
+
+    async def test_df(self, records):
+        df = await ProdMonthly.df()
+        assert df.shape[0] == 25
+        assert sorted(df.oil) == list(range(25))
+
+    async def test_df_empty(self, bind):
+        df = await ProdMonthly.df(columns=["oil"])
+        assert df.empty
+        assert df.index.names == ProdMonthly.pk.names
@@ -1,12 +1,18 @@
 import logging
+from datetime import date
 
+import pandas as pd
 import pytest
 from sqlalchemy import String
 
+from db import db
+from db.models import MONTHLY_VIEW, PRODSTATS_VIEW
 from db.models import ProdHeader as SinglePKModel
+from db.models import ProdMonthly
 from db.models import ProdStat as Model
+from db.models import ProdStatDefinition
 from db.models.bases import Base
-from tests.utils import rand_str
+from tests.utils import rand_int, rand_str
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +23,7 @@ class TestModel:
     @pytest.mark.asyncio
     async def test_create_instance(self, bind):
         x = rand_str(length=10)
-        result = await Model.create(api10=x, name=rand_str(length=20))
+        result = await Model.create(api10=x, stat_id=rand_int(length=4))
         assert result.to_dict()["api10"] == x
 
     def test_model_repr(self):
@@ -35,16 +41,16 @@ class TestModel:
 
 class TestPrimaryKeyProxy:
     def test_access_pk_names(self, bind):
-        assert Model.pk.names == ["api10", "name"]
+        assert Model.pk.names == ["api10", "stat_id"]
 
     def test_pk_repr(self, bind):
         assert repr(Model.pk)
 
     @pytest.mark.asyncio
     async def test_pk_values(self, bind):
-        ids = [(rand_str(length=10), rand_str(length=20)) for i in range(1, 5)]
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 5)]
         for i, v in ids:
-            await Model.create(api10=i, name=v)
+            await Model.create(api10=i, stat_id=v)
         assert sorted(await Model.pk.values) == sorted(ids)
 
     @pytest.mark.asyncio
@@ -58,9 +64,9 @@ class TestPrimaryKeyProxy:
 class TestAggregateProxy:
     @pytest.mark.asyncio
     async def test_agg_count(self, bind):
-        ids = [(rand_str(length=10), rand_str(length=20)) for i in range(1, 5)]
+        ids = [(rand_str(length=10), rand_int(length=4)) for i in range(1, 5)]
         for i, v in ids:
-            await Model.create(api10=i, name=v)
+            await Model.create(api10=i, stat_id=v)
         result = await Model.agg.count()
         assert result == len(ids)
 
@@ -74,3 +80,126 @@ class TestColumnProxy:
 
     def test_get_column_dtype(self):
         assert isinstance(Model.c.dtypes["api10"], String)
+
+
+@pytest.mark.asyncio
+class TestProdStatDefinitions:
+    @pytest.fixture
+    def stats(self):
+        api10s = [rand_str(length=10) for i in range(3)]
+        yield pd.DataFrame(
+            {
+                "api10": api10s * 2,
+                "name": ["oil_sum"] * 3 + ["gas_sum"] * 3,
+                "value": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+                "property_name": ["oil"] * 3 + ["gas"] * 3,
+                "aggregate_type": ["sum"] * 6,
+                "start_month": [1] * 6,
+                "comments": [None] * 6,
+            }
+        ).set_index(["api10", "name"])
+
+    async def test_resolve_registers_once(self, bind, stats):
+        df = stats.reset_index()
+        ids = await ProdStatDefinition.resolve(df)
+        assert set(ids.index) == {"oil_sum", "gas_sum"}
+        assert (await ProdStatDefinition.resolve(df)).equals(ids)
+        assert await ProdStatDefinition.agg.count() == 2
+
+    async def test_resolve_updates_changed(self, bind, stats):
+        df = stats.reset_index()
+        ids = await ProdStatDefinition.resolve(df)
+
+        df.loc[df["name"] == "gas_sum", "property_name"] = "gas_total"
+        assert (await ProdStatDefinition.resolve(df)).equals(ids)
+
+        definitions = await ProdStatDefinition.query.order_by(
+            ProdStatDefinition.id
+        ).gino.all()
+        assert {x.name: x.property_name for x in definitions} == {
+            "oil_sum": "oil",
+            "gas_sum": "gas_total",
+        }
+
+        # registering a new name draws only one value from the id sequence
+        other = df.loc[df["name"] == "oil_sum"].assign(name="water_sum")
+        new_ids = await ProdStatDefinition.resolve(pd.concat([df, other]))
+        assert new_ids["water_sum"] == ids.max() + 1
+
+    async def test_bulk_upsert_encodes_names(self, bind, stats):
+        assert await Model.bulk_upsert(stats) == 6
+        assert await Model.agg.count() == 6
+
+        definition = await ProdStatDefinition.query.where(
+            ProdStatDefinition.name == "gas_sum"
+        ).gino.first()
+        assert definition.property_name == "gas"
+        assert definition.comments == {}
+        stored = await Model.query.where(Model.stat_id == definition.id).gino.all()
+        assert sorted(x.value for x in stored) == [4, 5, 6]
+
+    async def test_expanded(self, bind, stats):
+        await Model.bulk_upsert(stats)
+        df = await Model.expanded_df(where=ProdStatDefinition.name == "oil_sum")
+        assert df.index.names == ["api10", "name"]
+        assert df.shape[0] == 3
+        assert set(df.property_name) == {"oil"}
+        assert set(df.start_month) == {1}
+
+        view = await db.all(f"SELECT name, value FROM {PRODSTATS_VIEW}")
+        assert len(view) == 6
+
+
+@pytest.mark.asyncio
+class TestNormalizedMonthly:
+    @pytest.fixture
+    async def api10(self, bind):
+        api10 = rand_str(length=10)
+        await SinglePKModel.bulk_upsert(
+            [{"api10": api10, "entity12": rand_str(length=12), "perfll": 5000}]
+        )
+        yield api10
+
+    def test_derived_columns(self):
+        assert len(ProdMonthly.derived_columns) == 24
+        assert "oil_per7500" in ProdMonthly.derived_columns
+        assert "boe_avg_daily" in ProdMonthly.derived_columns
+
+    async def test_computes_missing_columns(self, api10):
+        await ProdMonthly.bulk_upsert(
+            [
+                {
+                    "api10": api10,
+                    "prod_date": date(2020, 1, 1),
+                    "days_in_month": 31,
+                    "oil": 1001,
+                    "gas": 2000,
+                }
+            ]
+        )
+        df = await ProdMonthly.normalized_df(where=ProdMonthly.api10 == api10)
+        row = df.iloc[0]
+        assert row.oil_per1k == 200
+        assert row.gas_per10k == 4000
+        assert row.oil_avg_daily == 32
+        assert float(row.gas_avg_daily) == 64.52
+        assert pd.isnull(row.water_per1k)
+
+    async def test_stored_columns_take_precedence(self, api10):
+        await ProdMonthly.bulk_upsert(
+            [
+                {
+                    "api10": api10,
+                    "prod_date": date(2020, 1, 1),
+                    "days_in_month": 31,
+                    "oil": 1000,
+                    "oil_per1k": 1,
+                }
+            ]
+        )
+        df = await ProdMonthly.normalized_df(where=ProdMonthly.api10 == api10)
+        assert df.iloc[0].oil_per1k == 1
+        assert df.iloc[0].oil_per3k == 600
+
+        view = await db.all(f"SELECT oil_per1k FROM {MONTHLY_VIEW}")
+        assert [x[0] for x in view] == [1]
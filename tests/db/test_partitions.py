@@ -0,0 +1,112 @@
+import pytest
+
+from db import db, partitions
+from db.models import ProdMonthly
+from db.models import ProdStat as Model
+from db.models import ProdHeader
+from tests.utils import rand_str
+
+
+class TestHashPartitioned:
+    def test_table_args(self):
+        args = partitions.hash_partitioned("api10", partitions=4)
+        assert args["postgresql_partition_by"] == "HASH (api10)"
+        assert args["info"] == {"partitions": 4}
+
+    def test_invalid_partitions(self):
+        with pytest.raises(ValueError):
+            partitions.hash_partitioned("api10", partitions=0)
+
+    @pytest.mark.parametrize("model", [Model, ProdMonthly])
+    def test_partitioned_models(self, model):
+        table = model.__table__
+        assert table.dialect_options["postgresql"]["partition_by"] == "HASH (api10)"
+        assert "api10" in model.pk.names  # partition key is part of the conflict target
+        assert partitions.partition_count(table) == partitions.DEFAULT_PARTITIONS
+
+    def test_unpartitioned_model(self):
+        assert partitions.partition_names(ProdHeader.__table__) == []
+        assert partitions.create_partitions_ddl(ProdHeader.__table__) == []
+
+    def test_create_partitions_ddl(self):
+        ddl = partitions.create_partitions_ddl(Model.__table__)
+        assert len(ddl) == partitions.DEFAULT_PARTITIONS
+        assert ddl[1] == (
+            "CREATE TABLE prodstats_p1 PARTITION OF prodstats FOR VALUES WITH "
+            f"(MODULUS {partitions.DEFAULT_PARTITIONS}, REMAINDER 1)"
+        )
+
+
+@pytest.mark.asyncio
+class TestPartitions:
+    @pytest.fixture
+    def records(self):
+        yield [
+            {"api10": rand_str(length=10), "stat_id": i, "value": i} for i in range(50)
+        ]
+
+    async def row_counts(self):
+        rows = await db.all(
+            "SELECT tableoid::regclass::text, count(*) FROM prodstats GROUP BY 1"
+        )
+        return dict(rows)
+
+    async def test_partitions_created(self, bind):
+        names = await db.all(
+            "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'prodstats'::regclass"  # noqa
+        )
+        assert {x[0] for x in names} == set(partitions.partition_names(Model.__table__))
+
+    @pytest.mark.parametrize("method", ["values", "copy"])
+    async def test_upsert_counts(self, bind, records, method):
+        kwargs = {"method": method, "return_counts": True}
+        counts = await Model.bulk_upsert(records, **kwargs)
+        assert counts.inserted == 50
+
+        counts = await Model.bulk_upsert(
+            [{**x, "value": 100} for x in records], **kwargs
+        )
+        assert counts.updated == 50
+        assert sum((await self.row_counts()).values()) == 50
+
+    async def test_maintain(self, bind, records):
+        await Model.bulk_upsert(records)
+        names = await partitions.maintain(Model, "ANALYZE", concurrency=2)
+        assert names == partitions.partition_names(Model.__table__)
+
+    async def test_swap(self, bind, records):
+        await Model.bulk_upsert(records)
+        before = await self.row_counts()
+        name, n = next(iter(before.items()))
+        remainder = int(name.rsplit("_p", 1)[1])
+
+        staged = await partitions.stage(Model, remainder)
+        await db.status(
+            f"INSERT INTO {staged} SELECT * FROM {name} WHERE value >= 25"  # noqa
+        )
+        retired = await partitions.swap(Model, remainder, staged, keep=True)
+
+        after = await self.row_counts()
+        assert after.get(name, 0) == await db.scalar(
+            f"SELECT count(*) FROM {retired} WHERE value >= 25"
+        )
+        assert {k: v for k, v in after.items() if k != name} == {
+            k: v for k, v in before.items() if k != name
+        }
+
+    async def test_swap_rejects_rows_of_other_partitions(self, bind, records):
+        await Model.bulk_upsert(records)
+        by_partition = await self.row_counts()
+        assert len(by_partition) > 1
+        (name, _), (other, _) = list(by_partition.items())[:2]
+        remainder = int(name.rsplit("_p", 1)[1])
+
+        staged = await partitions.stage(Model, remainder)
+        await db.status(f"INSERT INTO {staged} SELECT * FROM {other}")
+        with pytest.raises(Exception):
+            await partitions.swap(Model, remainder, staged)
+        assert await self.row_counts() == by_partition
+
+    async def test_swap_invalid_remainder(self, bind):
+        with pytest.raises(ValueError):
+            await partitions.swap(Model, partitions.DEFAULT_PARTITIONS, "staged")
@@ -0,0 +1,105 @@
+import pytest
+
+from db import db, pool
+from db.models import ProdStat as Model
+from tests.utils import rand_str
+
+
+@pytest.fixture
+def stats():
+    stats = pool.PoolStats(buckets=(0.001, 0.1, 1))
+    for x in [0.0005, 0.002, 0.02, 0.03, 0.2, 0.7, 2]:
+        stats.observe(x)
+    yield stats
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    pool.pool_stats.reset()
+    yield
+    pool.pool_stats.reset()
+
+
+class TestPoolStats:
+    def test_percentile(self, stats):
+        assert 0.001 < stats.percentile(50) <= 0.1
+        assert 1 < stats.percentile(95) <= 2
+        assert stats.percentile(100) == 2
+
+    def test_histogram_is_cumulative(self, stats):
+        histogram = stats.histogram()
+        assert histogram == {"0.001": 1, "0.1": 4, "1": 6, "inf": 7}
+
+    def test_waits_bounded(self, stats):
+        for i in range(1000):
+            stats.observe(0.05)
+        assert stats.acquisitions == 1007
+        assert len(stats.waits.counts) == 4
+
+    def test_reset(self, stats):
+        stats.reset()
+        assert stats.to_dict()["acquisitions"] == 0
+        assert stats.waits.count == 0
+        assert stats.buckets == (0.001, 0.1, 1)
+
+
+@pytest.mark.asyncio
+class TestPool:
+    async def test_status(self, bind):
+        status = pool.status()
+        assert status["max_size"] == pool.capacity()
+        assert status["idle"] == status["size"] - status["in_use"]
+
+        async with db.acquire():
+            assert pool.status()["in_use"] == status["in_use"] + 1
+
+    async def test_acquire_records_waits(self, bind):
+        async with pool.acquire(db.bind) as conn:
+            assert await conn.scalar("SELECT 1") == 1
+        assert pool.pool_stats.acquisitions == 1
+        assert pool.pool_stats.waits.count == 1
+
+    async def test_status_unreadable(self, bind, monkeypatch):
+        monkeypatch.setattr(db.bind.raw_pool, "_holders", None)
+        assert pool.status() == {}
+
+    async def test_acquire_reused_not_recorded(self, bind):
+        async with db.acquire():
+            async with pool.acquire(db.bind):
+                pass
+        assert pool.pool_stats.acquisitions == 0
+
+    async def test_bulk_upsert_capped_to_capacity(self, bind, monkeypatch):
+        running = []
+        max_running = []
+        execute_statement = Model.execute_statement
+
+        async def spy(*args, **kwargs):
+            running.append(1)
+            max_running.append(len(running))
+            try:
+                return await execute_statement(*args, **kwargs)
+            finally:
+                running.pop()
+
+        monkeypatch.setattr(pool, "capacity", lambda engine=None: 2)
+        monkeypatch.setattr(Model, "execute_statement", spy)
+
+        records = [{"api10": rand_str(length=10), "stat_id": i} for i in range(9)]
+        assert await Model.bulk_upsert(records, batch_size=1, concurrency=50) == 9
+        assert max(max_running) == 2
+        assert pool.pool_stats.acquisitions == 9
+
+    async def test_post(self, bind, monkeypatch):
+        batches = []
+        monkeypatch.setattr("ext.metrics.send", lambda series: batches.append(series))
+        async with pool.acquire(db.bind):
+            pass
+
+        pool.post(tags={"executor": "test"})
+        assert len(batches) == 1
+        posted = [x["metric"] for x in batches[0]]
+        assert "db.pool.in_use" in posted
+        assert "db.pool.acquire.wait.p95" in posted
+        assert "db.pool.acquire.wait.bucket" in posted
+        assert pool.pool_stats.acquisitions == 0
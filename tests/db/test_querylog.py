@@ -0,0 +1,117 @@
+import pytest
+
+from db import db, querylog
+from db.models import ProdHeader as Model
+
+
+@pytest.fixture
+def log():
+    yield querylog.QueryLog(threshold=0.5, size=2, sample_rate=0)
+
+
+@pytest.fixture
+def installed(monkeypatch):
+    log = querylog.QueryLog(threshold=0, size=10, sample_rate=1, max_explaining=10)
+    monkeypatch.setattr(querylog, "query_log", log)
+    yield log
+
+
+class TestOperationStats:
+    def test_latencies_bounded(self):
+        stats = querylog.OperationStats(buckets=(0.1, 1))
+        for i in range(1000):
+            stats.observe(0.05 if i % 2 else 0.5)
+        assert stats.statements == 1000
+        assert stats.histogram() == {"0.1": 500, "1": 1000, "inf": 1000}
+        assert len(stats.latencies.counts) == 3
+        assert stats.to_dict()["max"] == 0.5
+
+
+class TestQueryLog:
+    def test_record_fast_statement(self, log):
+        assert log.record("SELECT 1", 0.1) is None
+        assert log.operations[(None, "select")].statements == 1
+        assert log.statements == {}
+
+    def test_record_slow_statement(self, log):
+        entry = log.record("SELECT 1", 1)
+        log.record("SELECT 1", 2)
+        assert entry.calls == 2
+        assert entry.max_seconds == 2
+        assert log.operations[(None, "select")].slow == 2
+
+    def test_keeps_slowest(self, log):
+        for i, sql in enumerate(["SELECT 1", "SELECT 2", "SELECT 3"]):
+            log.record(sql, i + 1)
+        assert [x.sql for x in log.slowest()] == ["SELECT 3", "SELECT 2"]
+
+    def test_tagged(self, log):
+        with querylog.tagged(model="ProdHeader", operation="paginate"):
+            with querylog.tagged(operation="count"):
+                log.record("SELECT count(*) FROM production_header", 0)
+            log.record("SELECT * FROM production_header", 0)
+        log.record("SELECT 1", 0, model="ProdStat", operation="upsert")
+
+        assert set(log.operations) == {
+            ("ProdHeader", "count"),
+            ("ProdHeader", "paginate"),
+            ("ProdStat", "upsert"),
+        }
+
+    @pytest.mark.parametrize(
+        "sql,many,expected",
+        [
+            ("SELECT 1", False, True),
+            ("  select * from wells", False, True),
+            ("SELECT 1", True, False),
+            ("INSERT INTO wells VALUES (1)", False, False),
+            ("WITH merged AS (INSERT INTO wells VALUES (1)) SELECT 1", False, False),
+        ],
+    )
+    def test_explainable(self, sql, many, expected):
+        assert querylog.QueryLog.explainable(sql, many) is expected
+
+    def test_explain_off_by_default(self, conf):
+        assert conf.DATABASE_EXPLAIN_SAMPLE_RATE == 0
+
+    def test_explains_capped(self, monkeypatch):
+        log = querylog.QueryLog(threshold=0, sample_rate=1, max_explaining=1)
+        scheduled = []
+        monkeypatch.setattr(
+            querylog.asyncio, "ensure_future", lambda coro: scheduled.append(coro)
+        )
+        log._explaining = {object()}  # one plan already being captured
+        log.record("SELECT 1", 1)
+        assert scheduled == []
+
+    def test_to_dict(self, log):
+        log.record("SELECT 1", 1)
+        result = log.to_dict()
+        assert result["threshold"] == 0.5
+        assert 0.5 < result["operations"][0]["p95"] <= 1
+        assert result["operations"][0]["max"] == 1
+        assert result["slow"][0]["sql"] == "SELECT 1"
+
+        log.reset()
+        assert log.to_dict()["slow"] == []
+
+
+@pytest.mark.asyncio
+class TestTimedCursor:
+    async def test_statements_recorded(self, bind, installed):
+        with querylog.tagged(model="ProdHeader", operation="read"):
+            await Model.query.where(Model.api10 == "0").gino.all()
+        assert installed.operations[("ProdHeader", "read")].statements == 1
+
+    async def test_slow_read_explained(self, bind, installed):
+        await db.scalar(db.select([db.func.count(Model.api10)]))
+        await installed.wait()
+
+        (entry,) = [x for x in installed.slowest() if "production_header" in x.sql]
+        assert entry.plan[0]["Plan"]["Actual Rows"] >= 0
+        assert entry.explained_at is not None
+
+    async def test_bulk_writes_recorded(self, bind, installed):
+        await Model.bulk_upsert([{"api10": "0123456789", "entity12": "012345678901"}])
+        assert installed.operations[("ProdHeader", "upsert")].statements == 1
+        assert all(x.plan is None for x in installed.slowest())
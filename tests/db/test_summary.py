@@ -0,0 +1,98 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from db.models import (
+    FracParameters,
+    ProdHeader,
+    ProdStat,
+    SUMMARY_STATS,
+    WellHeader,
+    WellSummary,
+)
+from tests.utils import rand_str
+
+
+@pytest.mark.asyncio
+class TestWellSummary:
+    @pytest.fixture
+    async def api10s(self, bind):
+        api10s = [rand_str(length=10) for i in range(3)]
+        await WellHeader.bulk_upsert(
+            [
+                {
+                    "api14": f"{api10}00",
+                    "api10": api10,
+                    "basin": "permian",
+                    "hole_direction": "H",
+                }
+                for api10 in api10s
+            ]
+        )
+        await FracParameters.bulk_upsert(
+            [{"api14": f"{api10}00", "fluid_bbl_ft": 50} for api10 in api10s]
+        )
+        await ProdHeader.bulk_upsert(
+            [
+                {
+                    "api10": api10,
+                    "entity12": rand_str(length=12),
+                    "first_prod_date": date(2020, 1, 1),
+                }
+                for api10 in api10s
+            ]
+        )
+        await ProdStat.bulk_upsert(
+            pd.DataFrame(
+                [
+                    {"api10": api10, "name": name, "value": i}
+                    for api10 in api10s
+                    for i, name in enumerate(["oil_sum", "boe_sum_first6mo", "other"])
+                ]
+            ),
+            reset_index=False,
+        )
+        yield api10s
+
+    def test_source_columns(self):
+        names = [c.name for c in WellSummary.source().columns]
+        assert names == [x for x in WellSummary.columns.names if x in names]
+        assert set(SUMMARY_STATS) < set(names)
+
+    async def test_refresh(self, api10s):
+        assert await WellSummary.refresh(api10s[:2]) == 2
+        assert await WellSummary.agg.count() == 2
+
+        row = await WellSummary.get(f"{api10s[0]}00")
+        assert row.basin == "permian"
+        assert row.fluid_bbl_ft == 50
+        assert row.first_prod_date == date(2020, 1, 1)
+        assert row.oil_sum == 0
+        assert row.boe_sum_first6mo == 1
+        assert row.gas_sum is None
+
+    async def test_refresh_skips_unchanged(self, api10s):
+        assert await WellSummary.refresh() == 3
+        assert await WellSummary.refresh(api10s) == 0
+
+        await FracParameters.bulk_upsert(
+            [{"api14": f"{api10s[0]}00", "fluid_bbl_ft": 75}]
+        )
+        assert await WellSummary.refresh(api10s) == 1
+        row = await WellSummary.get(f"{api10s[0]}00")
+        assert row.fluid_bbl_ft == 75
+
+    async def test_refresh_removes_stale(self, api10s):
+        assert await WellSummary.refresh() == 3
+
+        await WellHeader.delete.where(WellHeader.api10 == api10s[0]).gino.status()
+        assert await WellSummary.refresh(api10s[1:]) == 0
+        assert await WellSummary.agg.count() == 3
+
+        assert await WellSummary.refresh(api10s) == 1
+        assert await WellSummary.get(f"{api10s[0]}00") is None
+        assert await WellSummary.agg.count() == 2
+
+    async def test_refresh_nothing(self, bind):
+        assert await WellSummary.refresh([]) == 0
@@ -1,11 +1,21 @@
 import logging
+from types import SimpleNamespace
 
 import pytest
 from requests_mock import ANY
 
 import ext.metrics.metrics as metrics
 import loggers
-from ext.metrics import load, post, post_event, post_heartbeat, to_tags
+from ext.metrics import (
+    load,
+    metric,
+    post,
+    post_event,
+    post_heartbeat,
+    send,
+    send_async,
+    to_tags,
+)
 from tests.utils import get_open_port
 
 api_endpoint = f"http://localhost:{get_open_port}"
@@ -101,6 +111,36 @@ class TestMetrics:
         # actual = captured.err.lower()
         # assert "failed" in actual
 
+    def test_metric(self, conf, monkeypatch):
+        monkeypatch.setattr(conf, "DATADOG_DEFAULT_TAGS", {"env": "test"})
+        actual = metric("Test.Count", 10, tags=["tag1:value1"])
+        assert actual["metric"] == "test.count"
+        assert actual["type"] == "count"
+        assert actual["tags"][:2] == ["env:test", "tag1:value1"]
+
+    def test_send_batch(self, monkeypatch):
+        sent = []
+
+        def send_metrics(**kwargs):
+            sent.append(kwargs)
+            return {"status": "ok"}
+
+        datadog = SimpleNamespace(api=SimpleNamespace(Metric=SimpleNamespace()))
+        datadog.api.Metric.send = send_metrics
+        monkeypatch.setattr(metrics, "datadog", datadog)
+
+        send([metric("test", 1), metric("test2", 2, metric_type="gauge")])
+        assert len(sent) == 1
+        assert [x["metric"] for x in sent[0]["metrics"]] == ["test", "test2"]
+
+    @pytest.mark.asyncio
+    async def test_send_async(self, monkeypatch):
+        sent = []
+        monkeypatch.setattr(metrics, "send", lambda series: sent.append(series))
+        await send_async([metric("test", 1)])
+        await send_async([])
+        assert len(sent) == 1
+
     def test_post_event_success(self, conf, monkeypatch, requests_mock):
         requests_mock.register_uri(ANY, ANY, json={"status": "ok"})
         monkeypatch.setattr(conf, "DATADOG_ENABLED", True, raising=True)
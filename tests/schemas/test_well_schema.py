@@ -144,6 +144,50 @@ class TestWellRecordSet:
         assert {*df.index.values} == {x["api14"] for x in wells_h}
 
 
+class TestSetBuilder:
+    def test_builder_matches_df(self, wells_h):
+        builder = sch.WellRecordSet.builder()
+        for chunk in [wells_h[:5], wells_h[5:], []]:
+            builder.extend(chunk)
+
+        expected = sch.WellRecordSet(wells=wells_h).df()
+        actual = builder.df()
+
+        assert len(builder) == len(wells_h)
+        assert actual.index.names == expected.index.names
+        assert actual.shape == expected.shape
+        assert {*actual.index.values} == {*expected.index.values}
+
+    def test_builder_empty(self):
+        df = sch.WellDepthSet.builder().df(create_index=False)
+        assert df.empty
+        assert list(df.columns) == sch.WellDepthSet.__dataframe_columns__
+
+
+class TestPartsBuilder:
+    def test_well_parts_match_sets(self, wells_h):
+        builder = sch.WellParts.builder()
+        for chunk in [wells_h[:5], wells_h[5:], []]:
+            builder.extend(chunk)
+        actual = builder.dfs()
+
+        assert {*actual} == {"wells", "depths", "fracs", "ips"}
+        for name, model in sch.WellParts.__sets__.items():
+            expected = model(wells=wells_h).df()
+            assert actual[name].shape == expected.shape
+            assert list(actual[name].columns) == list(expected.columns)
+            assert actual[name].index.names == expected.index.names
+
+    def test_geometry_parts_match_sets(self, geoms_h):
+        actual = sch.WellGeometryParts.builder()
+        actual.extend(geoms_h)
+
+        for name, model in sch.WellGeometryParts.__sets__.items():
+            expected = model(wells=geoms_h).df()
+            assert actual[name].df().shape == expected.shape
+            assert actual[name].df().index.names == expected.index.names
+
+
 class TestIPTest:
     def test_aliases(self, wells_h, wells_v):
         for row in wells_h + wells_v:
@@ -0,0 +1,155 @@
+import logging
+
+import pandas as pd
+import pytest
+
+import calc.prod  # noqa
+from collector import FracFocusClient, IHSClient
+from const import HoleDirection, IHSPath
+from standin import FaultConfig, SyntheticDataset, create_app
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def dataset():
+    yield SyntheticDataset(areas=2, wells_per_area=20, months=12)
+
+
+def keys(record: dict) -> set:
+    """ Flattened key paths of a (nested) record """
+    result = set()
+    for k, v in record.items():
+        result.add(k)
+        if isinstance(v, dict):
+            result |= {f"{k}.{x}" for x in keys(v)}
+    return result
+
+
+class TestSyntheticDataset:
+    def test_deterministic(self, dataset):
+        api14 = dataset.ids(dataset.areas[0], "H")[0]
+        other = SyntheticDataset(areas=2, wells_per_area=20, months=12)
+        assert dataset.production(api14) == other.production(api14)
+        assert dataset.geom(api14) == other.geom(api14)
+
+    def test_seed_changes_data(self, dataset):
+        api14 = dataset.ids(dataset.areas[0], "H")[0]
+        other = SyntheticDataset(areas=2, wells_per_area=20, months=12, seed=1)
+        assert dataset.production(api14) != other.production(api14)
+
+    @pytest.mark.parametrize(
+        "fixture_name,method",
+        [
+            ("wells_h.json", "well"),
+            ("geoms_h.json", "geom"),
+            ("prod_h.json", "production"),
+            ("prod_headers_h.json", "production_header"),
+        ],
+    )
+    def test_matches_fixture_shape(self, dataset, json_fixture, fixture_name, method):
+        fixture = json_fixture(fixture_name)[0]
+        api14 = dataset.ids(dataset.areas[0], "H")[0]
+        record = getattr(dataset, method)(api14)
+        assert keys(fixture) - keys(record) == set()
+
+    def test_ids_by_hole_direction(self, dataset):
+        area = dataset.areas[0]
+        h = dataset.ids(area, "H")
+        v = dataset.ids(area, "V")
+        assert len(h) + len(v) == dataset.wells_per_area
+        assert not set(h) & set(v)
+
+    def test_resolve(self, dataset):
+        api14 = dataset.ids(dataset.areas[1], "H")[0]
+        entity = dataset.production(api14)["entity"]
+        assert dataset.resolve("api10", api14[:10]) == [api14]
+        assert dataset.resolve("id", entity) == [api14]
+        assert dataset.resolve("api14", api14, hole_dir="V") == []
+        assert dataset.resolve("api14", "42461409160000") == []
+
+    def test_wells_per_area_limit(self):
+        with pytest.raises(ValueError):
+            SyntheticDataset(wells_per_area=100001)
+
+
+@pytest.mark.asyncio
+class TestStandinApp:
+    async def test_get_areas_and_ids(self, standin_app):
+        dataset = standin_app.state.dataset
+        areas = await IHSClient.get_areas(path=IHSPath.well_h_ids, app=standin_app)
+        assert areas == dataset.areas
+
+        ids = await IHSClient.get_ids_by_area(
+            path=IHSPath.well_h_ids, area=areas[0], app=standin_app
+        )
+        assert ids == dataset.ids(areas[0], "H")
+
+    @pytest.mark.parametrize("hole_dir", HoleDirection.members())
+    async def test_wells(self, standin_app, hole_dir):
+        dataset = standin_app.state.dataset
+        api14s = dataset.ids(dataset.areas[0], hole_dir.value)
+        path = IHSPath.well_h if hole_dir == HoleDirection.H else IHSPath.well_v
+
+        wellset = await pd.DataFrame.wells.from_ihs(
+            path, api14s=api14s, app=standin_app
+        )
+        assert {*wellset.wells.index} == set(api14s)
+
+    async def test_geoms(self, standin_app):
+        dataset = standin_app.state.dataset
+        api14s = dataset.ids(dataset.areas[0], "H")
+
+        geoms = await pd.DataFrame.shapes.from_ihs(
+            IHSPath.well_h_geoms, api14s=api14s, app=standin_app
+        )
+        assert {*geoms.locations.index.get_level_values(0)} == set(api14s)
+
+    async def test_production(self, standin_app):
+        dataset = standin_app.state.dataset
+        api14s = dataset.ids(dataset.areas[1], "H")[:5]
+
+        prodset = await pd.DataFrame.prodstats.from_ihs(
+            IHSPath.prod_h, api14s=api14s, app=standin_app
+        )
+        assert prodset.monthly.shape[0] > 0
+
+    async def test_sample(self, standin_app):
+        data = await IHSClient.get_sample(IHSPath.prod_h_sample, n=3, app=standin_app)
+        assert len(data) == 3
+
+    async def test_fracfocus_jobs(self, standin_app):
+        dataset = standin_app.state.dataset
+        api14s = list(dataset.iter_api14s())
+        expected = {x for x in api14s if dataset.frac(x)}
+
+        data = await FracFocusClient.get_jobs(api14s=api14s, app=standin_app)
+        assert {x["api14"] for x in data} == expected
+
+    async def test_fracfocus_registry(self, standin_app):
+        dataset = standin_app.state.dataset
+        expected = {x for x in dataset.iter_api14s() if dataset.frac(x)}
+
+        pages = []
+        async for data in FracFocusClient.iter_registry(page_size=15, app=standin_app):
+            pages.append(data)
+
+        assert len(pages) == 3
+        assert {x["api14"] for page in pages for x in page} == expected
+
+    async def test_inject_errors(self):
+        app = create_app(
+            SyntheticDataset(areas=1, wells_per_area=5),
+            FaultConfig(error_rate=1, error_status=502),
+        )
+        async with IHSClient(app=app) as client:
+            response = await client.get(IHSPath.well_h_ids.value)
+            assert response.status_code == 502
+
+            response = await client.put(
+                "_standin/faults", json={"error_rate": 0, "latency": 0.01}
+            )
+            assert response.json()["latency"] == 0.01
+
+            response = await client.get(IHSPath.well_h_ids.value)
+            assert response.status_code == 200
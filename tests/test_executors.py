@@ -9,7 +9,7 @@ import calc.prod  # noqa
 import calc.well  # noqa
 from calc.sets import DataSet, ProdSet, WellGeometrySet, WellSet  # noqa
 from const import HoleDirection, IHSPath, ProdStatRange  # noqa
-from db.models import ProdHeader
+from db.models import ProdHeader, ProdMonthly, WellSummary
 from db.models import ProdStat as Model
 from executors import BaseExecutor, GeomExecutor, ProdExecutor, WellExecutor
 from tests.utils import MockAsyncDispatch, rand_str
@@ -107,6 +107,34 @@ class TestBaseExecutor:
         assert "nothing to persist" in caplog.text
         assert bexec.metrics.empty  # no metrics added
 
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("transactional", [True, False])
+    async def test_persist_many(self, model_df, bind, transactional):
+        bexec = BaseExecutor(HoleDirection.H, transactional=transactional)
+        other_df = model_df.assign(api10=[rand_str(length=10) for i in range(10)])
+        items = [
+            ("first", Model, model_df, {"reset_index": False}),
+            ("second", Model, other_df, {"reset_index": False, "method": "copy"}),
+        ]
+        assert await bexec._persist_many(items) == 20
+        assert len(await Model.pk.values) == 20
+
+    @pytest.mark.asyncio
+    async def test_persist_many_transactional_rollback(self, model_df, bind):
+        bexec = BaseExecutor(HoleDirection.H, transactional=True)
+        items = [
+            ("first", Model, model_df, {"reset_index": False}),
+            ("second", Model, model_df, {"reset_index": False, "errors": "bad"}),
+        ]
+        with pytest.raises(ValueError):
+            await bexec._persist_many(items)
+        assert len(await Model.pk.values) == 0
+
+    def test_transactional_from_config(self, monkeypatch):
+        monkeypatch.setattr("config.PERSIST_TRANSACTIONAL", True)
+        assert BaseExecutor(HoleDirection.H).transactional is True
+        assert BaseExecutor(HoleDirection.H, transactional=False).transactional is False
+
 
 class TestProdExecutor:
     @pytest.fixture
@@ -116,7 +144,11 @@ class TestProdExecutor:
     def test_init_default(self):
         pexec = ProdExecutor(HoleDirection.H)
         assert pexec.metrics.empty is True
-        assert pexec.model_kwargs["stats"] == {"batch_size": 1000}
+        assert pexec.model_kwargs["stats"] == {
+            "method": "copy",
+            "skip_unchanged": True,
+            "delta": True,
+        }
 
     def test_init_model_kwargs(self):
         header_kwargs = {1: 1}
@@ -130,8 +162,38 @@ class TestProdExecutor:
         )
 
         assert pexec.model_kwargs["header"] == header_kwargs
-        assert pexec.model_kwargs["monthly"] == monthly_kwargs
-        assert pexec.model_kwargs["stats"] == {"batch_size": 1000, **stats_kwargs}
+        defaults = {"method": "copy", "skip_unchanged": True, "delta": True}
+        assert pexec.model_kwargs["monthly"] == {**defaults, **monthly_kwargs}
+        assert pexec.model_kwargs["stats"] == {**defaults, **stats_kwargs}
+
+    def test_refresh_summary_from_config(self, monkeypatch):
+        monkeypatch.setattr("config.REFRESH_WELL_SUMMARY", False)
+        assert ProdExecutor(HoleDirection.H).refresh_summary is False
+        assert ProdExecutor(HoleDirection.H, refresh_summary=True).refresh_summary
+
+    def test_persist_derived_from_config(self, monkeypatch):
+        monkeypatch.setattr("config.PERSIST_DERIVED_MONTHLY", False)
+        assert ProdExecutor(HoleDirection.H).persist_derived is False
+        assert ProdExecutor(HoleDirection.H, persist_derived=True).persist_derived
+
+    @pytest.mark.cionly
+    @pytest.mark.asyncio
+    async def test_persist_without_derived_columns(self, prod_df_h, bind):
+        prodset_h = prod_df_h.prodstats.to_prodset()
+        pexec = ProdExecutor(HoleDirection.H, persist_derived=False)
+        ps = await pexec.process(prodset_h)
+        await pexec.persist(ps)
+
+        stored = await ProdMonthly.query.gino.all()
+        assert len(stored) == ps.monthly.shape[0]
+        assert all(x.oil_per1k is None and x.boe_avg_daily is None for x in stored)
+
+        normalized = await ProdMonthly.normalized_df()
+        assert normalized.shape[0] == ps.monthly.shape[0]
+        for column in ["oil_per1k", "boe_avg_daily"]:
+            assert (
+                normalized[column].notnull().sum() == ps.monthly[column].notnull().sum()
+            )
 
     @pytest.mark.parametrize("hole_dir", HoleDirection.members())
     @pytest.mark.asyncio
@@ -379,7 +441,7 @@ class TestGeomExecutor:
 
         assert gexec.model_kwargs["locations"] == locations_kwargs
         assert gexec.model_kwargs["surveys"] == surveys_kwargs
-        assert gexec.model_kwargs["points"] == {"batch_size": 1000, **points_kwargs}
+        assert gexec.model_kwargs["points"] == {"delta": True, **points_kwargs}
 
     @pytest.mark.parametrize("hole_dir", HoleDirection.members())
     @pytest.mark.asyncio
@@ -420,6 +482,13 @@ class TestGeomExecutor:
         dataset: WellGeometrySet = await gexec.process(geomset)
         await gexec.persist(dataset)
 
+    @pytest.mark.asyncio
+    async def test_process_and_persist_transactional(self, geoms_h, bind):
+        geomset = pd.DataFrame.shapes.from_records(geoms_h[:3], create_index=True)
+        gexec = GeomExecutor(HoleDirection.H, transactional=True)
+        dataset: WellGeometrySet = await gexec.process(geomset)
+        assert await gexec.persist(dataset) > 0
+
     @pytest.mark.cionly
     @pytest.mark.asyncio
     async def test_process_and_persist_v_full(self, geomset_v, bind):
@@ -513,7 +582,7 @@ class TestWellExecutor:
         )
 
         assert ex.model_kwargs["wells"] == wells_kwargs
-        assert ex.model_kwargs["depths"] == depths_kwargs
+        assert ex.model_kwargs["depths"] == {"delta": True, **depths_kwargs}
         assert ex.model_kwargs["fracs"] == fracs_kwargs
         assert ex.model_kwargs["ips"] == ips_kwargs
         assert ex.model_kwargs["stats"] == stats_kwargs
@@ -557,6 +626,8 @@ class TestWellExecutor:
     async def test_process_and_persist_h_full(self, exh, wellset_h, bind):
         dataset: WellSet = await exh.process(wellset_h)
         await exh.persist(dataset)
+        assert await WellSummary.agg.count() == dataset.wells.shape[0]
+        assert exh.metrics.operation.eq("refresh").any()
 
     # @pytest.mark.asyncio
     # async def test_process_and_persist_h_small_batch(self, geoms_h, bind):
@@ -5,6 +5,7 @@ import pytest
 from alembic import command
 from alembic.config import Config
 from alembic.script import ScriptDirectory
+from click.testing import CliRunner
 
 import manage
 from db import db
@@ -59,6 +60,21 @@ class TestCLIFast:
     def test_run_task_execute(self):
         manage.task.callback("task_namespace.task_name")
 
+    def test_export_invalid_columns(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        result = CliRunner().invoke(
+            manage.cli,
+            [
+                "export",
+                "production_monthly",
+                str(tmp_path / "x.parquet"),
+                "--column",
+                "zaza",
+            ],
+        )
+        assert result.exit_code == 1
+        assert not (tmp_path / "x.parquet").exists()
+
     def test_run_task_catch_unqualified_name(self):
         manage.task.callback("task_name")
 
@@ -77,6 +93,13 @@ class TestCLISlow:
         captured = capfd.readouterr()
         assert "Uvicorn running" in captured.err
 
+    def test_run_standin(self, capfd):
+        autokill_subprocess(
+            "prodstats", "run", "standin", "--port", str(get_open_port())
+        )
+        captured = capfd.readouterr()
+        assert "Uvicorn running" in captured.err
+
     def test_run_cron(self, capfd):
         autokill_subprocess("prodstats", "run", "cron", "--pidfile=")
         captured = capfd.readouterr()
@@ -0,0 +1,39 @@
+import math
+
+import pytest
+
+from util.stats import Histogram
+
+
+@pytest.fixture
+def histogram():
+    h = Histogram(buckets=(0.1, 1, 10))
+    for x in [0.05, 0.2, 0.3, 0.4, 1.5, 3, 7, 12]:
+        h.observe(x)
+    yield h
+
+
+class TestHistogram:
+    def test_buckets_end_at_inf(self, histogram):
+        assert histogram.buckets == (0.1, 1, 10, math.inf)
+
+    def test_cumulative(self, histogram):
+        assert histogram.cumulative() == {"0.1": 1, "1": 4, "10": 7, "inf": 8}
+
+    def test_count_sum_max(self, histogram):
+        assert histogram.count == 8
+        assert histogram.sum == pytest.approx(24.45)
+        assert histogram.max == 12
+
+    @pytest.mark.parametrize("q,expected", [(50, 1), (75, 7), (100, 12)])
+    def test_percentile(self, histogram, q, expected):
+        assert histogram.percentile(q) == pytest.approx(expected)
+
+    def test_percentile_capped_to_max(self):
+        h = Histogram(buckets=(1, 10))
+        h.observe(2)
+        assert h.percentile(50) == pytest.approx(1.5)
+        assert h.percentile(1) <= 2
+
+    def test_percentile_empty(self):
+        assert Histogram(buckets=(1,)).percentile(50) is None